@@ -1,13 +1,15 @@
+from collections import Counter
 from datetime import datetime, timedelta
 import re
 import uuid
 from flask import Flask, logging, render_template, jsonify, request, session, redirect, url_for, flash
-from src.helper import download_hugging_face_embeddings, get_relevant_medical_info, get_who_data
-from langchain_pinecone import PineconeVectorStore
-from langchain.chat_models import init_chat_model
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
+from src.helper import (
+    download_hugging_face_embeddings,
+    get_relevant_medical_info,
+    load_vector_store,
+    describe_vector_index,
+    VECTOR_STORE_BACKEND
+)
 from langchain_core.documents import Document 
 from dotenv import load_dotenv
 from src.prompt import *
@@ -16,12 +18,20 @@ import requests
 import json
 from langchain_openai import ChatOpenAI
 from flask_sqlalchemy import SQLAlchemy
-from src.database import db, User, Conversation
+from src.database import db, User, Conversation, ConversationSummary
+from src.conversation_search import search_conversations
+from src.conversation_summary import get_session_summary, schedule_summary_update
+from src.session_history import session_history
+from src.startup import StartupManager
+from src.retrieval import retrieve
+from src.reranker import overfetch, rerank_groups, get_reranker, RERANK_ENABLED
+from src.embedding_registry import get_embedding_registry
+from src.vector_expiry import start_expiry_schedule
+from src.prompt_cache import PromptArtifactCache, canonical_preferences
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from sqlalchemy import text
 import urllib3
-from pinecone import Pinecone
 from urllib3.exceptions import InsecureRequestWarning
 
 app = Flask(__name__)
@@ -52,18 +62,25 @@ if not app.config['SECRET_KEY']:
     raise ValueError("No SECRET_KEY set in environment variables")
 db.init_app(app)
 
-# Create tables if they don't exist
-with app.app_context():
-    # Create schema if it doesn't exist
-    db.session.execute(text('CREATE SCHEMA IF NOT EXISTS medical'))
-    db.session.commit()
-    # Create all tables
-    db.create_all()
-    # Create missing columns
-    from src.database import create_missing_columns
-    create_missing_columns(app)
-    print("\n=== Application Startup ===")
-    print("Database initialized")
+# Expensive dependencies are created lazily or warmed in the background
+startup = StartupManager()
+
+def initialize_database():
+    """Create the schema, tables and missing columns if they don't exist"""
+    with app.app_context():
+        # Create schema if it doesn't exist
+        db.session.execute(text('CREATE SCHEMA IF NOT EXISTS medical'))
+        db.session.commit()
+        # Create all tables
+        db.create_all()
+        # Create missing columns
+        from src.database import create_missing_columns, create_conversation_search_index
+        create_missing_columns(app)
+        create_conversation_search_index(app)
+        print("Database initialized")
+    return True
+
+database_resource = startup.register("database", initialize_database)
 
 # Initialize Flask-Login
 login_manager = LoginManager()
@@ -120,6 +137,17 @@ def cleanup_orphaned_sessions():
 # Update the before_request handler
 @app.before_request
 def before_request():
+    # Health probes must not touch the database or the session
+    if request.path.startswith('/health/'):
+        return
+
+    # Requests wait for schema setup if the background warm-up hasn't finished it yet
+    if database_resource.get() is None:
+        return jsonify({
+            "success": False,
+            "error": "Service is starting up, please retry shortly"
+        }), 503
+
     print("\n=== Request Start ===")
     print("Current user:", current_user)
     print("Is authenticated:", current_user.is_authenticated if current_user else False)
@@ -162,9 +190,41 @@ print("Pinecone API Key loaded:", "Yes" if PINECONE_API_KEY else "No")
 os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-embeddings = download_hugging_face_embeddings()
-
 index_name = "sanocare"
+# Preference profiles whose cultural prompts are built during startup warm-up
+PROMPT_CACHE_WARM_PROFILES = int(os.getenv('PROMPT_CACHE_WARM_PROFILES', '20'))
+# Hours between runs of vector expiry inside the app; 0 leaves expiry to the CLI
+VECTOR_EXPIRY_INTERVAL_HOURS = float(os.getenv('VECTOR_EXPIRY_INTERVAL_HOURS', '0'))
+# Approximate tokens of recent turns sent with each prompt (about 4 characters per token)
+CONTEXT_HISTORY_MAX_TOKENS = int(os.getenv('CONTEXT_HISTORY_MAX_TOKENS', '1500'))
+
+def create_vector_store():
+    """Connect the vector store to the existing index"""
+    embeddings = get_embeddings()
+    if embeddings is None:
+        raise RuntimeError("Embeddings are not available")
+    if VECTOR_STORE_BACKEND == 'pinecone':
+        os.environ['REQUESTS_CA_BUNDLE'] = ''  # Disable SSL certificate verification
+        os.environ['SSL_CERT_FILE'] = ''  # Disable SSL certificate verification
+    print(f"Creating {VECTOR_STORE_BACKEND} vector store from index:", index_name)
+    return load_vector_store(index_name, embeddings)
+
+embeddings_resource = startup.register("embeddings", download_hugging_face_embeddings)
+docsearch_resource = startup.register("vector_store", create_vector_store)
+
+def get_embeddings():
+    """Shared embedding model, loaded on first use"""
+    return embeddings_resource.get()
+
+def get_docsearch():
+    """Shared vector store, or None while it is unavailable"""
+    docsearch = docsearch_resource.get()
+    # Reconnect once an embedding migration has switched reads to another namespace
+    if docsearch is not None and docsearch.registry_target != get_embedding_registry().active_target(index_name):
+        print("Active vector namespace changed, reconnecting vector store")
+        docsearch_resource.reset()
+        docsearch = docsearch_resource.get()
+    return docsearch
 
 # Initialize LLM first
 llm = ChatOpenAI(
@@ -173,94 +233,6 @@ llm = ChatOpenAI(
     max_tokens=500
 )
 
-# Initialize prompt template
-prompt = ChatPromptTemplate.from_messages([
-    ("system", system_prompt),
-    ("human", """Please provide a response based on the following context and question. 
-    
-Context: {context}
-Query: {input}
-
-Remember to:
-1. Use a warm, personal tone
-2. Reference local customs and practices
-3. Include culturally relevant examples
-4. Consider the user's background and preferences
-5. Make recommendations specific to their region and age
-6. Use familiar local terms and references""")
-])
-
-# Initialize Pinecone with error handling
-try:
-    print("\n=== Initializing Pinecone ===")
-    os.environ['REQUESTS_CA_BUNDLE'] = ''  # Disable SSL certificate verification
-    os.environ['SSL_CERT_FILE'] = ''  # Disable SSL certificate verification
-    
-    # Initialize Pinecone client
-    print("Creating Pinecone client...")
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    print("Pinecone client created successfully")
-    
-    # Create Pinecone vector store
-    print("Creating vector store from index:", index_name)
-    docsearch = PineconeVectorStore.from_existing_index(
-        index_name=index_name,
-        embedding=embeddings
-    )
-    print("Vector store created successfully")
-
-    # Test retrieval
-    print("\nTesting document retrieval...")
-    test_docs = docsearch.similarity_search("test", k=1)
-    print(f"Test retrieval returned {len(test_docs)} documents")
-    if test_docs:
-        print("Sample document content:", test_docs[0].page_content[:100])
-
-    # Create retriever
-    print("\nCreating retriever...")
-    retriever = docsearch.as_retriever(search_type="similarity", search_kwargs={"k":3})
-    print("Successfully initialized Pinecone and created retriever")
-
-    # Create the chain that combines the retrieved documents
-    question_answer_chain = create_stuff_documents_chain(
-        llm,
-        prompt,
-        document_variable_name="context",
-    )
-
-    # Create the retrieval chain
-    rag_chain = create_retrieval_chain(
-        retriever,
-        question_answer_chain
-    )
-    print("Successfully created RAG chain")
-
-except Exception as e:
-    print(f"\nError initializing Pinecone: {str(e)}")
-    print("Continuing without Pinecone integration...")
-    docsearch = None
-    retriever = None
-    rag_chain = None
-    
-    # Create a fallback chain that doesn't use retrieval
-    fallback_prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", """Have a friendly conversation about health and wellness. 
-Current question: {input}
-
-Respond naturally while maintaining medical accuracy:
-- Use a warm, conversational tone
-- Speak as if chatting with a friend
-- Base advice on current medical knowledge
-- Keep information accurate but approachable
-- End with encouragement and openness to more questions""")
-    ])
-    
-    fallback_chain = fallback_prompt | llm
-    rag_chain = fallback_chain
-    print("Created fallback chain without retrieval")
-
-value = get_who_data('India')
 
 def store_conversation(user_id, message, bot_response, session_id):
     """Store conversation in the database"""
@@ -509,6 +481,10 @@ def check_auth():
 @login_required
 def logout():
     try:
+        # Drop cached history for the session being closed
+        if 'session_id' in session:
+            session_history.discard(session['session_id'])
+
         # Clear all session data
         session.clear()
         session.pop('session_id', None)
@@ -538,6 +514,29 @@ def logout():
             'message': 'An error occurred during logout'
         }), 500
 
+@app.route('/health/live')
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({
+        "status": "alive",
+        "uptime_seconds": startup.report()["uptime_seconds"]
+    })
+
+@app.route('/health/ready')
+def readiness():
+    """Readiness probe: every required component has finished initializing"""
+    report = startup.report()
+    return jsonify(report), 200 if report["ready"] else 503
+
+@app.route('/health/caches')
+def cache_stats():
+    """Hit rates and sizes of the in-process caches"""
+    return jsonify({
+        "cultural_prompts": cultural_prompt_cache.stats(),
+        "session_history": session_history.stats(),
+        "reranker": get_reranker().stats() if RERANK_ENABLED else None
+    })
+
 @app.route('/')
 def index():
     return render_template('chat.html')
@@ -572,12 +571,16 @@ def chat_api():
 
         # Get user context if authenticated
         user_context = None
+        user_id = None
         if current_user and current_user.is_authenticated:
             user_context = generate_cultural_context(current_user)
-            conversation_context = get_conversation_context(
-                user_id=current_user.user_id,
-                session_id=session_id
-            )
+            user_id = current_user.user_id
+
+        # Recent history comes from memory for everyone, falling back to the DB for users
+        conversation_context = get_conversation_context(
+            user_id=user_id,
+            session_id=session_id
+        )
 
         direct_chat = ChatOpenAI(
             model='gpt-4',
@@ -604,7 +607,7 @@ def chat_api():
 
         try:
             if is_health_related:
-                if docsearch is None:
+                if get_docsearch() is None:
                     final_response = "I apologize, but I'm currently experiencing technical difficulties accessing my medical knowledge base."
                     return jsonify({
                         "success": True,
@@ -632,6 +635,9 @@ Respond to this message naturally, taking into account the previous conversation
                 chat_response = direct_chat.invoke(context_prompt)
                 final_response = str(chat_response.content)
 
+            # Keep the turn in the in-memory session history for the next request
+            session_history.append_turn(session_id, msg, final_response)
+
             # Store conversation if user is authenticated
             if current_user and current_user.is_authenticated:
                 try:
@@ -642,6 +648,14 @@ Respond to this message naturally, taking into account the previous conversation
                         session_id=session_id
                     )
                     print("Conversation stored:", store_success)
+                    if store_success:
+                        schedule_summary_update(
+                            app,
+                            session_id=session_id,
+                            user_id=current_user.user_id,
+                            message=msg,
+                            bot_response=final_response
+                        )
                 except Exception as e:
                     print("Error storing conversation:", str(e))
 
@@ -704,6 +718,44 @@ def get_conversations():
             "details": str(e)
         }), 500
 
+@app.route("/conversations/search", methods=["GET"])
+def search_conversation_history():
+    """Search the logged-in user's conversations with highlighted snippets"""
+    try:
+        if not current_user.is_authenticated:
+            return jsonify({
+                "success": True,
+                "results": [],
+                "total": 0
+            })
+
+        query = (request.args.get("q") or "").strip()
+        if not query:
+            return jsonify({"error": "Search query is required"}), 400
+
+        semantic = request.args.get("semantic", "false").lower() in ("1", "true", "yes")
+        search_results = search_conversations(
+            user_id=current_user.user_id,
+            query=query,
+            page=request.args.get("page", 1, type=int),
+            per_page=request.args.get("per_page", 10, type=int),
+            semantic=semantic,
+            embeddings=get_embeddings() if semantic else None
+        )
+
+        return jsonify({
+            "success": True,
+            **search_results
+        })
+
+    except Exception as e:
+        print("Error searching conversations:", str(e))
+        db.session.rollback()
+        return jsonify({
+            "error": "Failed to search conversations",
+            "details": str(e)
+        }), 500
+
 @app.route("/conversations/session", methods=["GET"])
 def get_session_conversations():
     """Retrieve conversations for a specific session"""
@@ -748,6 +800,10 @@ def delete_user_and_conversations(user_id):
         for conv in conversations:
             db.session.delete(conv)
         print(f"Deleted {len(conversations)} conversations")
+
+        # Delete the rolling summaries kept for the user's sessions
+        summaries_deleted = ConversationSummary.query.filter_by(user_id=user_id).delete()
+        print(f"Deleted {summaries_deleted} conversation summaries")
         
         # Then delete the user
         user = User.query.get(user_id)
@@ -778,6 +834,8 @@ def delete_user(user_id):
         success = delete_user_and_conversations(user_id)
         if success:
             # Logout the user after successful deletion
+            if 'session_id' in session:
+                session_history.discard(session['session_id'])
             logout_user()
             cleanup_session()
             return jsonify({
@@ -857,6 +915,10 @@ def cleanup_database():
         for conv in conversations:
             db.session.delete(conv)
         print(f"Deleted {len(conversations)} conversations")
+
+        # Delete all conversation summaries
+        summaries_deleted = ConversationSummary.query.delete()
+        print(f"Deleted {summaries_deleted} conversation summaries")
         
         # Delete all users
         users = User.query.all()
@@ -967,50 +1029,44 @@ def generate_cultural_context(user):
         print(f"Error generating cultural context: {str(e)}")
         return {}
 
-def get_cultural_prompt(user_context, category):
-    """Generate a culturally appropriate prompt based on user preferences from database"""
-    if not user_context:
-        return "Provide professional healthcare guidance based on modern medical evidence."
-        
-    try:
-        print("\n=== Generating Cultural Context ===")
-        print("User context:", user_context)
-        
-        # Get medical preferences from user context
-        medical_background = user_context.get("medical_background", {})
-        traditional_prefs = medical_background.get("traditional_medicine_preferences", {})
-        
-        print("Traditional medicine preferences:", traditional_prefs)
-        
-        # Build query based on user preferences
-        if traditional_prefs:
-            # User has traditional medicine preferences
-            query = f"healthcare recommendations incorporating "
-            if isinstance(traditional_prefs, dict):
-                practices = ", ".join(traditional_prefs.keys())
-                query += f"{practices} and modern medicine"
-            else:
-                query += f"{traditional_prefs} and modern medicine"
-        else:
-            # User prefers modern medicine only
-            query = "modern medical recommendations and evidence-based practices"
-            
-        print("Cultural query:", query)
+def get_index_version():
+    """Vector count of the knowledge base index, used to invalidate cached prompts"""
+    docsearch = get_docsearch()
+    if not docsearch:
+        return None
+    return describe_vector_index(docsearch, index_name).total_vector_count
+
+cultural_prompt_cache = PromptArtifactCache(version_fn=get_index_version)
+
+def build_cultural_prompt(practices):
+    """Build the cultural prompt for a canonical preference profile; None if the index is unavailable"""
+    # Build query based on user preferences
+    if practices:
+        # User has traditional medicine preferences
+        query = f"healthcare recommendations incorporating {', '.join(practices)} and modern medicine"
+    else:
+        # User prefers modern medicine only
+        query = "modern medical recommendations and evidence-based practices"
+        
+    print("Cultural query:", query)
+    
+    # Get relevant cultural and medical documents
+    docsearch = get_docsearch()
+    if not docsearch:
+        return None
         
-        # Get relevant cultural and medical documents
-        if docsearch:
-            cultural_docs = docsearch.similarity_search(query, k=2)
-            print(f"Retrieved {len(cultural_docs)} cultural context documents")
-            
-            cultural_info = [doc.page_content for doc in cultural_docs]
-            
-            # Build prompt based on user preferences
-            if traditional_prefs:
-                prompt = f"""Based on the following medical and traditional healthcare information:
+    cultural_docs = docsearch.similarity_search(query, k=2)
+    print(f"Retrieved {len(cultural_docs)} cultural context documents")
+    
+    cultural_info = [doc.page_content for doc in cultural_docs]
+    
+    # Build prompt based on user preferences
+    if practices:
+        return f"""Based on the following medical and traditional healthcare information:
 
 {cultural_info}
 
-Consider that this user has expressed interest in {practices if isinstance(traditional_prefs, dict) else traditional_prefs}.
+Consider that this user has expressed interest in {', '.join(practices)}.
 
 Provide healthcare guidance that:
 1. Integrates both modern medical evidence and traditional practices where appropriate
@@ -1023,8 +1079,7 @@ Remember to:
 - Include traditional practices only where they complement modern medical advice
 - Be clear about which recommendations come from modern medicine vs traditional practices
 - Maintain a balanced and professional tone"""
-            else:
-                prompt = f"""Based on the following modern medical information:
+    return f"""Based on the following modern medical information:
 
 {cultural_info}
 
@@ -1041,55 +1096,56 @@ Remember to:
 - Provide scientific context for advice
 - Use precise medical terminology
 - Maintain a professional and scientific tone"""
-            
+
+def get_cultural_prompt(user_context, category):
+    """Generate a culturally appropriate prompt based on user preferences from database"""
+    if not user_context:
+        return "Provide professional healthcare guidance based on modern medical evidence."
+        
+    try:
+        print("\n=== Generating Cultural Context ===")
+        print("User context:", user_context)
+        
+        # Get medical preferences from user context
+        medical_background = user_context.get("medical_background", {})
+        traditional_prefs = medical_background.get("traditional_medicine_preferences", {})
+        
+        # Users with the same set of practices share one cached prompt
+        practices = canonical_preferences(traditional_prefs)
+        print("Traditional medicine preferences:", practices)
+        
+        prompt = cultural_prompt_cache.get_or_build(practices, lambda: build_cultural_prompt(practices))
+        if prompt:
             return prompt
+            
+        print("Warning: docsearch not available, using fallback prompt")
+        if practices:
+            return "Provide healthcare guidance that respectfully balances modern medical evidence with traditional practices."
         else:
-            print("Warning: docsearch not available, using fallback prompt")
-            if traditional_prefs:
-                return "Provide healthcare guidance that respectfully balances modern medical evidence with traditional practices."
-            else:
-                return "Provide healthcare guidance based strictly on modern medical evidence."
+            return "Provide healthcare guidance based strictly on modern medical evidence."
             
     except Exception as e:
         print(f"Error generating cultural prompt: {str(e)}")
         return "Provide professional healthcare guidance based on modern medical evidence."
 
-def get_relevant_medical_info(msg, docsearch, user_context=None):
-    """Get relevant medical information with cultural and demographic context"""
+def warm_cultural_prompts():
+    """Pre-build cultural prompts for the most common preference profiles"""
+    profiles = Counter({(): 1})
     try:
-        print("\n=== Retrieving Medical Information ===")
-        print("Input message:", msg)
-        print("User context:", user_context)
-        
-        if docsearch is None:
-            print("Error: docsearch is None")
-            return []
-            
-        # Get base medical information
-        print("Performing similarity search...")
-        medical_info = docsearch.similarity_search(msg, k=3)
-        print(f"Retrieved {len(medical_info)} documents")
-        
-        for i, doc in enumerate(medical_info):
-            print(f"\nDocument {i+1}:")
-            print("Content:", doc.page_content[:200])
-            
-        if user_context:
-            # Add region-specific medical information
-            region = user_context.get("region", "general")
-            print(f"\nSearching for region-specific info ({region})...")
-            region_specific_info = docsearch.similarity_search(
-                f"medical information specific to {region} region",
-                k=2
-            )
-            print(f"Retrieved {len(region_specific_info)} region-specific documents")
-            medical_info.extend(region_specific_info)
-        
-        return medical_info
+        with app.app_context():
+            for (preferences,) in db.session.query(User.traditional_medicine_preferences).all():
+                profiles[canonical_preferences(preferences)] += 1
     except Exception as e:
-        print(f"\nError getting relevant medical information: {str(e)}")
-        print("Stack trace:", e.__traceback__)
-        return []
+        print(f"Error reading preference profiles: {str(e)}")
+        
+    warmed = 0
+    for practices, _ in profiles.most_common(PROMPT_CACHE_WARM_PROFILES):
+        if cultural_prompt_cache.get_or_build(practices, lambda: build_cultural_prompt(practices)):
+            warmed += 1
+    print(f"Warmed {warmed} cultural prompts")
+    return warmed
+
+startup.register("cultural_prompts", warm_cultural_prompts, required=False)
 
 def generate_lifestyle_response(user_context):
     """Generate personalized lifestyle recommendations based on user context"""
@@ -1205,22 +1261,58 @@ Message: """ + msg
         print(f"Error determining health category: {str(e)}")
         return "GENERAL_HEALTH"
 
-def get_conversation_context(user_id, session_id, limit=5):
-    """Get recent conversation history for context"""
+def _format_conversation_context(summary, turns):
+    """Build the chat history structure used in prompts"""
+    context = []
+    if summary:
+        context.append({"role": "summary", "content": summary})
+    for message, bot_response in turns:
+        context.append({"role": "user", "content": message})
+        context.append({"role": "assistant", "content": bot_response})
+    return context
+
+def _select_context_turns(summary, turns, max_tokens=CONTEXT_HISTORY_MAX_TOKENS):
+    """Most recent turns that fit the token budget; with a summary only the last turn is needed"""
+    if summary:
+        turns = turns[-1:]
+    budget = max_tokens * 4 - len(summary or "")
+    selected = []
+    for message, bot_response in reversed(turns):
+        budget -= len(message or "") + len(bot_response or "")
+        if budget < 0 and selected:
+            break
+        selected.append((message, bot_response))
+    selected.reverse()
+    return selected
+
+def get_conversation_context(user_id, session_id):
+    """Get the rolling session summary plus as many recent turns as the token budget allows
+
+    Anonymous sessions never get a summary, so they see every buffered turn that fits.
+    """
     try:
+        # Serve from the in-memory ring buffer when the session is warm
+        cached = session_history.get(session_id)
+        if cached is not None:
+            summary, turns = cached
+            return _format_conversation_context(summary, _select_context_turns(summary, turns))
+
+        # Anonymous conversations are never stored, so there is nothing to fall back to
+        if not user_id:
+            return []
+
+        summary = get_session_summary(session_id)
         recent_conversations = Conversation.query.filter_by(
             user_id=user_id,
             session_id=session_id
-        ).order_by(Conversation.timestamp.desc()).limit(limit).all()
+        ).order_by(Conversation.timestamp.desc()).limit(session_history.max_turns).all()
         
         # Reverse to get chronological order
         recent_conversations.reverse()
-        
-        context = []
-        for conv in recent_conversations:
-            context.append({"role": "user", "content": conv.message})
-            context.append({"role": "assistant", "content": conv.bot_response})
-        return context
+        turns = [(conv.message, conv.bot_response) for conv in recent_conversations]
+        session_history.fill(session_id, turns, summary)
+
+        return _format_conversation_context(summary, _select_context_turns(summary, turns))
     except Exception as e:
         print(f"Error getting conversation context: {str(e)}")
         return []
@@ -1256,16 +1348,16 @@ def generate_follow_up_question(focus, symptoms_collected):
     return general_questions.get(focus, "Could you tell me more about what you're experiencing?")
 
 def check_pinecone_index():
-    """Check Pinecone index status and content"""
+    """Check vector index status and content"""
     try:
-        print("\n=== Checking Pinecone Index ===")
-        if not pc or not docsearch:
-            print("Error: Pinecone client or vector store not initialized")
+        print("\n=== Checking Vector Index ===")
+        docsearch = get_docsearch()
+        if not docsearch:
+            print("Error: Vector store not initialized")
             return False
             
         # Get index statistics
-        index = pc.Index(index_name)
-        stats = index.describe_index_stats()
+        stats = describe_vector_index(docsearch, index_name)
         print("\nIndex Statistics:")
         print(f"Total vectors: {stats.total_vector_count}")
         print(f"Dimension: {stats.dimension}")
@@ -1292,6 +1384,7 @@ def get_medical_documents(query, user_context=None, k=3):
         print(f"Query: {query}")
         print(f"User context: {user_context}")
         
+        docsearch = get_docsearch()
         if not docsearch:
             print("Error: docsearch is None")
             return []
@@ -1321,15 +1414,11 @@ def get_medical_documents(query, user_context=None, k=3):
             
         print(f"Enhanced query: {enhanced_query}")
         
-        # Retrieve documents
-        docs = docsearch.similarity_search(enhanced_query, k=k)
-        print(f"Retrieved {len(docs)} documents")
-        
-        # Log document contents
-        for i, doc in enumerate(docs):
-            print(f"\nDocument {i+1}:")
-            print("Content:", doc.page_content[:200])
-            print("Source:", getattr(doc.metadata, 'source', 'Unknown'))
+        # Retrieve extra candidates (dense, BM25 or both fused, per RETRIEVAL_MODE)
+        # so the reranker can keep the best k
+        candidates = retrieve(docsearch, enhanced_query, k=overfetch(k), index_name=index_name)
+        print(f"Retrieved {len(candidates)} candidate documents")
+        rerank_requests = [(enhanced_query, candidates, k)]
             
         # If user has traditional medicine preferences, get additional relevant documents
         if user_context and user_context.get("medical_background", {}).get("traditional_medicine_preferences"):
@@ -1338,12 +1427,24 @@ def get_medical_documents(query, user_context=None, k=3):
                 for practice, enabled in trad_prefs.items():
                     if enabled:
                         print(f"\nRetrieving additional documents for {practice}...")
-                        practice_docs = docsearch.similarity_search(
-                            f"{practice} medicine {query}",
-                            k=2
+                        practice_query = f"{practice} medicine {query}"
+                        practice_docs = retrieve(
+                            docsearch,
+                            practice_query,
+                            k=overfetch(2),
+                            index_name=index_name
                         )
-                        docs.extend(practice_docs)
-                        print(f"Added {len(practice_docs)} documents for {practice}")
+                        rerank_requests.append((practice_query, practice_docs, 2))
+                        print(f"Found {len(practice_docs)} candidates for {practice}")
+        
+        # Score every (query, chunk) pair in one batched cross-encoder pass
+        docs = [doc for group in rerank_groups(rerank_requests) for doc in group]
+        
+        # Log document contents
+        for i, doc in enumerate(docs):
+            print(f"\nDocument {i+1}:")
+            print("Content:", doc.page_content[:200])
+            print("Source:", doc.metadata.get('source', 'Unknown'))
         
         return docs
     except Exception as e:
@@ -1362,9 +1463,11 @@ def generate_rag_response(query, docs, user_context=None, chat_history=None):
         # Format chat history if available
         history_context = ""
         if chat_history:
+            # History is the rolling summary plus the latest turn, so it stays small
+            role_labels = {"summary": "Conversation summary", "user": "User", "assistant": "Assistant"}
             history_context = "\n".join([
-                f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
-                for msg in chat_history[-3:]
+                f"{role_labels.get(msg['role'], 'Assistant')}: {msg['content']}"
+                for msg in chat_history
             ])
         
         # Build personalization context
@@ -1472,6 +1575,14 @@ def process_health_query(query, user_context=None, chat_history=None):
         print(f"Error processing health query: {str(e)}")
         return "I apologize, but something went wrong while processing your query. Please try again."
 
+# Started last so every component registered above is defined before warm-up runs
+if os.getenv('WARM_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes'):
+    startup.start_background_warmup()
+
+# Deletes go through the served vector store so expired vectors stop being returned at once
+if VECTOR_EXPIRY_INTERVAL_HOURS > 0:
+    start_expiry_schedule(VECTOR_EXPIRY_INTERVAL_HOURS, index_name, get_vectorstore=get_docsearch)
+
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5000, debug=True)
 
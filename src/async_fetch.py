@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlsplit
+import aiohttp
+from src.http_cache import get_http_cache, has_conditional_headers, request_key
+
+# Total open connections across every host in one fetcher
+FETCH_MAX_CONNECTIONS = int(os.getenv('FETCH_MAX_CONNECTIONS', '32'))
+# Requests in flight against a single host
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv('FETCH_PER_HOST_CONCURRENCY', '4'))
+# Sustained requests per second against a single host
+FETCH_DEFAULT_RATE = float(os.getenv('FETCH_DEFAULT_RATE', '10'))
+FETCH_RETRIES = int(os.getenv('FETCH_RETRIES', '3'))
+FETCH_TIMEOUT_SECONDS = float(os.getenv('FETCH_TIMEOUT_SECONDS', '30'))
+FETCH_BACKOFF_SECONDS = float(os.getenv('FETCH_BACKOFF_SECONDS', '0.5'))
+NCBI_API_KEY = os.getenv('NCBI_API_KEY')
+
+# NCBI E-utilities allow 3 requests per second without an API key and 10 with one
+HOST_RATE_LIMITS = {
+    "eutils.ncbi.nlm.nih.gov": 10.0 if NCBI_API_KEY else 3.0,
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PUBMED_ESUMMARY_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
+# esummary accepts up to a few hundred comma-joined ids per GET
+PUBMED_BATCH_SIZE = 200
+
+class FetchError(Exception):
+    """A request that still failed after every retry"""
+
+class FetchResponse:
+    """Fully read response body, detached from the connection it arrived on"""
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status_code = status
+        self.headers = headers
+        self.content = body
+
+    @property
+    def ok(self):
+        return self.status_code == 200
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncFetcher:
+    """Shared aiohttp session with pooling, per-host concurrency and rate limits, and retries"""
+
+    def __init__(self, max_connections=FETCH_MAX_CONNECTIONS, per_host=FETCH_PER_HOST_CONCURRENCY,
+                 rate_limits=None, default_rate=FETCH_DEFAULT_RATE, retries=FETCH_RETRIES,
+                 timeout=FETCH_TIMEOUT_SECONDS, backoff=FETCH_BACKOFF_SECONDS, http_cache=None):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.rate_limits = dict(HOST_RATE_LIMITS if rate_limits is None else rate_limits)
+        self.default_rate = default_rate
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.backoff = backoff
+        self.http_cache = http_cache or get_http_cache()
+        self.session = None
+        self._semaphores = {}
+        self._limiters = {}
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.bytes = 0
+        self.cache_hits = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host,
+                                         ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+
+    def _host_slot(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+            self._limiters[host] = RateLimiter(self.rate_limits.get(host, self.default_rate))
+        return self._semaphores[host], self._limiters[host]
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def _cached_response(self, cache, entry):
+        body = cache.body(entry)
+        if body is None:
+            return None
+        cache.hits += 1
+        self.cache_hits += 1
+        return FetchResponse(entry["url"], entry["status"], entry["headers"], body)
+
+    async def fetch(self, url, params=None, headers=None, method="GET", data=None):
+        """Fetch one URL through the HTTP cache; see src.http_cache for the cache modes"""
+        cache = self.http_cache
+        # Only plain GETs are cached; callers sending their own validators revalidate themselves
+        if method != "GET" or data is not None or not cache.enabled or (
+                cache.mode == "cache" and has_conditional_headers(headers)):
+            return await self._fetch_network(url, params, headers, method, data)
+
+        if cache.mode in ("record", "replay"):
+            # Recordings always hold full bodies, never a bare 304
+            headers = {k: v for k, v in (headers or {}).items() if not has_conditional_headers({k: v})}
+        key = request_key(method, url, params, headers)
+        entry = cache.lookup(key)
+        if cache.mode == "replay":
+            response = self._cached_response(cache, entry) if entry else None
+            if response is None:
+                cache.misses += 1
+                self.failures += 1
+                raise FetchError(f"No recorded response for {method} {url} in replay mode")
+            return response
+        if cache.mode == "cache" and entry and cache.is_fresh(entry):
+            response = self._cached_response(cache, entry)
+            if response is not None:
+                return response
+
+        cache.misses += 1
+        request_headers = headers
+        if cache.mode == "cache" and entry:
+            request_headers = dict(headers or {}, **cache.conditional_headers(entry))
+        response = await self._fetch_network(url, params, request_headers, method, data)
+        if response.status_code == 304 and entry:
+            cached = self._cached_response(cache, entry)
+            if cached is not None:
+                cache.touch(key)
+                return cached
+        if response.ok:
+            cache.store(key, method, response.url, response.status_code, response.headers, response.content)
+        return response
+
+    async def _fetch_network(self, url, params=None, headers=None, method="GET", data=None):
+        """Fetch one URL; retries 429, 5xx, timeouts and connection errors with backoff"""
+        semaphore, limiter = self._host_slot(urlsplit(url).netloc)
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                async with semaphore:
+                    await limiter.acquire()
+                    self.requests += 1
+                    async with self.session.request(method, url, params=params, headers=headers,
+                                                    data=data) as resp:
+                        body = await resp.read()
+                        self.bytes += len(body)
+                        response = FetchResponse(str(resp.url), resp.status, dict(resp.headers), body)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    self.failures += 1
+                    raise FetchError(f"{method} {url} failed after {attempt + 1} attempts: {e!r}") from e
+            self.retried += 1
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def fetch_all(self, specs):
+        """Fetch (url, kwargs) specs concurrently; results keep the spec order and failures come back as exceptions"""
+        return await asyncio.gather(
+            *(self.fetch(url, **kwargs) for url, kwargs in specs),
+            return_exceptions=True
+        )
+
+    async def pubmed_summaries(self, ids, batch_size=PUBMED_BATCH_SIZE):
+        """esummary results for PubMed ids, fetched in comma-joined batches instead of one request per id"""
+        ids = list(dict.fromkeys(str(id_) for id_ in ids))
+        specs = []
+        for start in range(0, len(ids), batch_size):
+            params = {'db': 'pubmed', 'id': ",".join(ids[start:start + batch_size]), 'retmode': 'json'}
+            if NCBI_API_KEY:
+                params['api_key'] = NCBI_API_KEY
+            specs.append((PUBMED_ESUMMARY_URL, {'params': params}))
+
+        summaries = {}
+        for response in await self.fetch_all(specs):
+            if isinstance(response, Exception):
+                print(f"Error fetching PubMed summaries: {str(response)}")
+            elif response.ok:
+                result = response.json().get('result', {})
+                summaries.update({id_: result[id_] for id_ in result.get('uids', []) if id_ in result})
+            else:
+                print(f"PubMed esummary returned status code: {response.status_code}")
+        return summaries
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "cache_hits": self.cache_hits
+        }
+
+def run_fetch(fn, **fetcher_kwargs):
+    """Run `await fn(fetcher)` on a fresh event loop from synchronous code"""
+    async def main():
+        async with AsyncFetcher(**fetcher_kwargs) as fetcher:
+            start = time.perf_counter()
+            result = await fn(fetcher)
+            stats = fetcher.stats()
+            print(f"Fetched {stats['requests']} requests ({stats['retried']} retried, "
+                  f"{stats['failures']} failed, {stats['cache_hits']} from the HTTP cache) "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return result
+    return asyncio.run(main())
+
+def fetch_many(specs, **fetcher_kwargs):
+    """Synchronous wrapper around AsyncFetcher.fetch_all"""
+    return run_fetch(lambda fetcher: fetcher.fetch_all(specs), **fetcher_kwargs)
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from langchain_core.documents import Document
+from src.local_vectorstore import matches_filter
+from src.cache_paths import CACHE_DIR
+
+BM25_INDEX_DIR = os.getenv('BM25_INDEX_DIR', os.path.join(CACHE_DIR, 'bm25'))
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Postings read per query term, highest term frequency first; very common terms
+# carry little weight and would otherwise pull most of the index into memory
+BM25_MAX_POSTINGS_PER_TERM = int(os.getenv('BM25_MAX_POSTINGS_PER_TERM', '2000'))
+
+# Metadata fields stored as columns so filtered deletes and searches run in SQL
+INDEXED_METADATA_FIELDS = ("source", "type", "namespace")
+
+# Keeps drug names and codes such as "co-amoxiclav", "e11.9" or "h1n1" as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have how i if in into is it its
+me my no not of on or so such that the their them then there these they this to
+was what when where which who why will with you your
+""".split())
+
+def tokenize(text):
+    """Lowercase word tokens; compound tokens also emit their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if any(sep in token for sep in ".-/"):
+            tokens.extend(part for part in re.split(r"[.\-/]", token) if part and part not in STOPWORDS)
+    return tokens
+
+def content_key(text):
+    """Stable chunk id derived from the chunk text"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _column_value(value):
+    """Metadata value as stored in an indexed column; lists and dicts are not indexed"""
+    return value if value is None or isinstance(value, (str, int, float)) else None
+
+def _filter_clauses(filter):
+    """SQL conditions for the equality and $in parts of a filter that touch indexed fields"""
+    clauses, params = [], []
+    for key, condition in filter.items():
+        if key not in INDEXED_METADATA_FIELDS:
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and _column_value(operand) is not None:
+                clauses.append(f"{key} = ?")
+                params.append(operand)
+            elif operator == "$in" and operand and all(_column_value(v) is not None for v in operand):
+                clauses.append(f"{key} IN ({', '.join('?' * len(operand))})")
+                params.extend(operand)
+    return clauses, params
+
+class BM25Index:
+    """SQLite-backed inverted index with BM25 scoring over knowledge base chunks"""
+
+    def __init__(self, index_name="sanocare", path=BM25_INDEX_DIR):
+        self.index_name = index_name
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, f"{index_name}.sqlite")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+        self._load_stats()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    length INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_postings_doc_id ON postings (doc_id);
+                CREATE INDEX IF NOT EXISTS ix_postings_term_tf ON postings (term, tf DESC);
+                CREATE TABLE IF NOT EXISTS stats (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            for field in INDEXED_METADATA_FIELDS:
+                if field not in columns:
+                    # Indexes built before the column existed are backfilled from the JSON metadata
+                    self._conn.execute(f"ALTER TABLE documents ADD COLUMN {field}")
+                    self._conn.execute(f"UPDATE documents SET {field} = json_extract(metadata, '$.{field}')")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_documents_{field} ON documents ({field})")
+
+    def _load_stats(self):
+        with self._lock, self._conn:
+            stats = dict(self._conn.execute("SELECT key, value FROM stats"))
+            if "document_count" not in stats:
+                # Counted once for indexes created before the totals were kept incrementally
+                count, total_length = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents"
+                ).fetchone()
+                stats = {"document_count": count, "total_length": total_length}
+                self._save_stats(count, total_length)
+        self.document_count = stats["document_count"]
+        self.total_length = stats["total_length"]
+
+    def _save_stats(self, document_count, total_length):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+            [("document_count", document_count), ("total_length", total_length)]
+        )
+        self.document_count = document_count
+        self.total_length = total_length
+
+    @property
+    def average_length(self):
+        return self.total_length / self.document_count if self.document_count else 0.0
+
+    def __len__(self):
+        return self.document_count
+
+    def _delete_rows(self, ids):
+        """Delete chunks and their postings; returns the number of chunks and tokens removed"""
+        removed = removed_length = 0
+        for id_ in ids:
+            row = self._conn.execute("SELECT length FROM documents WHERE id = ?", (id_,)).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (id_,))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (id_,))
+            removed += 1
+            removed_length += row[0]
+        return removed, removed_length
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        """Index chunks; re-adding an id replaces its postings"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [content_key(text) for text in texts]
+
+        documents = {}
+        postings = []
+        for id_, text, metadata in zip(ids, texts, metadatas):
+            counts = Counter(tokenize(text))
+            documents[id_] = (
+                (id_, text, json.dumps(metadata, default=str), sum(counts.values()))
+                + tuple(_column_value(metadata.get(field)) for field in INDEXED_METADATA_FIELDS)
+            )
+            postings.extend((term, id_, tf) for term, tf in counts.items())
+
+        columns = ", ".join(("id", "text", "metadata", "length") + INDEXED_METADATA_FIELDS)
+        placeholders = ", ".join("?" * (4 + len(INDEXED_METADATA_FIELDS)))
+        with self._lock, self._conn:
+            removed, removed_length = self._delete_rows(documents)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO documents ({columns}) VALUES ({placeholders})", documents.values()
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+            self._save_stats(
+                self.document_count - removed + len(documents),
+                self.total_length - removed_length + sum(row[3] for row in documents.values())
+            )
+        return ids
+
+    def add_documents(self, documents, ids=None):
+        documents = list(documents)
+        if ids is None:
+            ids = [doc.id or content_key(doc.page_content) for doc in documents]
+        return self.add_texts(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            ids=ids
+        )
+
+    def _filtered_ids(self, filter):
+        """Ids of chunks matching a filter; indexed fields are narrowed in SQL before the JSON check"""
+        clauses, params = _filter_clauses(filter)
+        query = "SELECT id, metadata FROM documents"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return [
+            id_ for id_, metadata in self._conn.execute(query, params)
+            if matches_filter(json.loads(metadata), filter)
+        ]
+
+    def delete(self, ids=None, filter=None):
+        """Delete by ids, or every chunk whose metadata matches a filter"""
+        if not ids and not filter:
+            return False
+        with self._lock, self._conn:
+            if filter:
+                ids = self._filtered_ids(filter)
+            removed, removed_length = self._delete_rows(ids)
+            self._save_stats(self.document_count - removed, self.total_length - removed_length)
+        return True
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM documents")
+            self._save_stats(0, 0)
+
+    def _score(self, query, max_postings=BM25_MAX_POSTINGS_PER_TERM):
+        """BM25 scores from each query term's highest-frequency postings"""
+        terms = sorted(set(tokenize(query)))
+        if not terms or not self.document_count:
+            return {}
+
+        placeholders = ", ".join("?" * len(terms))
+        with self._lock:
+            # Document frequencies are counted in SQLite; only capped postings reach Python
+            document_frequency = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+            ))
+            rows = []
+            for term in document_frequency:
+                rows.extend(self._conn.execute(
+                    "SELECT p.term, p.tf, d.id, d.length FROM postings p "
+                    "JOIN documents d ON d.id = p.doc_id WHERE p.term = ? ORDER BY p.tf DESC LIMIT ?",
+                    (term, max_postings)
+                ))
+
+        idf = {
+            term: math.log(1 + (self.document_count - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+        average_length = self.average_length or 1.0
+
+        scores = {}
+        for term, tf, doc_id, length in rows:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            scores[doc_id] = scores.get(doc_id, 0.0) + idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def _load_documents(self, ids):
+        placeholders = ", ".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, text, metadata FROM documents WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {
+            id_: Document(id=id_, page_content=text, metadata=json.loads(metadata))
+            for id_, text, metadata in rows
+        }
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        """Top-k chunks by BM25 score as (Document, score) pairs"""
+        scores = self._score(query)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+
+        results = []
+        # Filters are checked on stored metadata, loading candidates a page at a time
+        page_size = max(k, 16) if filter else k
+        for start in range(0, len(ranked), page_size):
+            page = ranked[start:start + page_size]
+            documents = self._load_documents(page)
+            for id_ in page:
+                doc = documents.get(id_)
+                if doc is None or (filter and not matches_filter(doc.metadata, filter)):
+                    continue
+                results.append((doc, scores[id_]))
+                if len(results) == k:
+                    return results
+        return results
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_bm25_index(index_name="sanocare"):
+    """Shared lexical index for a knowledge base index"""
+    with _indexes_lock:
+        if index_name not in _indexes:
+            _indexes[index_name] = BM25Index(index_name)
+        return _indexes[index_name]
+
+def rebuild_bm25_index(index_name="sanocare", vectorstore=None, batch_size=500):
+    """Rebuild the lexical index from every chunk in the active vector store namespace, not just the PDFs"""
+    from src.helper import iter_vector_store_documents, load_vector_store
+
+    vectorstore = vectorstore or load_vector_store(index_name)
+    index = get_bm25_index(index_name)
+    index.clear()
+    for documents in iter_vector_store_documents(vectorstore, batch_size):
+        index.add_documents(documents)
+    print(f"Indexed {len(index)} chunks for BM25 in {index.path}")
+    return index
+
+if __name__ == "__main__":
+    rebuild_bm25_index()
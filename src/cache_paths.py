@@ -0,0 +1,6 @@
+import os
+
+# Root directory of the on-disk caches, manifests and local indexes
+CACHE_DIR = os.getenv('SANOCARE_CACHE_DIR', 'cache')
+# SQLite limits the number of bound parameters per statement
+LOOKUP_CHUNK = 500
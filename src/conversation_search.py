@@ -0,0 +1,160 @@
+import html
+import numpy as np
+from sqlalchemy import bindparam, text
+from src.database import db, Conversation
+
+# Private-use characters mark matches in ts_headline output; they are swapped for
+# <mark> tags only after the stored text has been HTML-escaped
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_STOP = "\ue001"
+
+# Options passed to ts_headline when building highlighted snippets
+HEADLINE_OPTIONS = (f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30, MinWords=10, "
+                    "MaxFragments=2, FragmentDelimiter=\" ... \"")
+
+# Number of full-text candidates considered for semantic re-ranking
+SEMANTIC_CANDIDATE_POOL = 100
+
+# Weight of the semantic similarity when blending with the full-text rank
+SEMANTIC_WEIGHT = 0.6
+
+MAX_PER_PAGE = 50
+
+def _turn_text(message, bot_response):
+    """Text that represents a single conversation turn for embedding"""
+    return f"{message}\n{bot_response}"
+
+def _fetch_ranked_candidates(user_id, query, limit, offset):
+    """Return full-text matches for a user ordered by rank"""
+    result = db.session.execute(text("""
+        SELECT c.conversation_id, c.session_id, c.timestamp, c.message, c.bot_response,
+               c.embedding, ts_rank_cd(c.search_vector, q) AS rank
+        FROM medical.conversations c, websearch_to_tsquery('english', :query) q
+        WHERE c.user_id = :user_id AND c.search_vector @@ q
+        ORDER BY rank DESC, c.timestamp DESC
+        LIMIT :limit OFFSET :offset
+    """), {"query": query, "user_id": user_id, "limit": limit, "offset": offset})
+    return [dict(row._mapping) for row in result]
+
+def _count_matches(user_id, query):
+    """Count all full-text matches for a user"""
+    return db.session.execute(text("""
+        SELECT count(*)
+        FROM medical.conversations c, websearch_to_tsquery('english', :query) q
+        WHERE c.user_id = :user_id AND c.search_vector @@ q
+    """), {"query": query, "user_id": user_id}).scalar() or 0
+
+def _highlight(headline):
+    """Escape a ts_headline result and turn its match markers into <mark> tags"""
+    escaped = html.escape(headline or "")
+    return escaped.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+def _fetch_snippets(conversation_ids, query):
+    """Build highlighted snippets only for the conversations on the current page"""
+    if not conversation_ids:
+        return {}
+    # Stored text loses any marker characters so only ts_headline can open a <mark>
+    statement = text("""
+        SELECT c.conversation_id,
+               ts_headline('english', translate(c.message, :markers, ''), q,
+                           :options) AS message_snippet,
+               ts_headline('english', translate(c.bot_response, :markers, ''), q,
+                           :options) AS response_snippet
+        FROM medical.conversations c, websearch_to_tsquery('english', :query) q
+        WHERE c.conversation_id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    result = db.session.execute(statement, {
+        "query": query,
+        "ids": list(conversation_ids),
+        "markers": HIGHLIGHT_START + HIGHLIGHT_STOP,
+        "options": HEADLINE_OPTIONS
+    })
+    return {
+        row.conversation_id: (_highlight(row.message_snippet), _highlight(row.response_snippet))
+        for row in result
+    }
+
+def _backfill_embeddings(candidates, embeddings):
+    """Embed candidates that have no stored vector yet and persist them in one batch"""
+    missing = [c for c in candidates if not c["embedding"]]
+    if not missing:
+        return
+    vectors = embeddings.embed_documents([_turn_text(c["message"], c["bot_response"]) for c in missing])
+    for candidate, vector in zip(missing, vectors):
+        candidate["embedding"] = list(vector)
+    try:
+        db.session.bulk_update_mappings(Conversation, [
+            {"conversation_id": c["conversation_id"], "embedding": c["embedding"]}
+            for c in missing
+        ])
+        db.session.commit()
+        print(f"Stored embeddings for {len(missing)} conversation turns")
+    except Exception as e:
+        print(f"Error storing conversation embeddings: {str(e)}")
+        db.session.rollback()
+
+def _semantic_rerank(candidates, query, embeddings):
+    """Re-order full-text candidates by blending text rank with MiniLM similarity"""
+    _backfill_embeddings(candidates, embeddings)
+
+    query_vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+    matrix = np.asarray([c["embedding"] for c in candidates], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+    similarity = matrix @ query_vector / np.where(norms == 0, 1.0, norms)
+
+    ranks = np.asarray([c["rank"] for c in candidates], dtype=np.float32)
+    if ranks.max() > 0:
+        ranks = ranks / ranks.max()
+
+    scores = SEMANTIC_WEIGHT * similarity + (1 - SEMANTIC_WEIGHT) * ranks
+    for candidate, similarity_score, score in zip(candidates, similarity, scores):
+        candidate["similarity"] = float(similarity_score)
+        candidate["score"] = float(score)
+    candidates.sort(key=lambda c: c["score"], reverse=True)
+    return candidates
+
+def search_conversations(user_id, query, page=1, per_page=10, semantic=False, embeddings=None):
+    """Search a user's conversation history with highlighted, paginated results"""
+    page = max(int(page), 1)
+    per_page = min(max(int(per_page), 1), MAX_PER_PAGE)
+    offset = (page - 1) * per_page
+
+    total = _count_matches(user_id, query)
+
+    if semantic and embeddings is not None:
+        # Re-rank a bounded pool of the best full-text matches, then paginate within it
+        pool_size = max(SEMANTIC_CANDIDATE_POOL, offset + per_page)
+        candidates = _fetch_ranked_candidates(user_id, query, pool_size, 0)
+        if candidates:
+            candidates = _semantic_rerank(candidates, query, embeddings)
+        page_rows = candidates[offset:offset + per_page]
+    else:
+        page_rows = _fetch_ranked_candidates(user_id, query, per_page, offset)
+
+    snippets = _fetch_snippets([row["conversation_id"] for row in page_rows], query)
+
+    results = []
+    for row in page_rows:
+        message_snippet, response_snippet = snippets.get(row["conversation_id"], ("", ""))
+        result = {
+            "conversation_id": row["conversation_id"],
+            "session_id": row["session_id"],
+            "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None,
+            "message_snippet": message_snippet,
+            "response_snippet": response_snippet,
+            "rank": float(row["rank"])
+        }
+        if "score" in row:
+            result["similarity"] = row["similarity"]
+            result["score"] = row["score"]
+        results.append(result)
+
+    return {
+        "query": query,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "has_more": offset + len(results) < total,
+        "semantic": bool(semantic and embeddings is not None),
+        "results": results
+    }
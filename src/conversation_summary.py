@@ -0,0 +1,113 @@
+import os
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain_openai import ChatOpenAI
+from src.database import db, ConversationSummary
+from src.session_history import session_history
+
+# Upper bound on the rolling summary length so prompt size stays flat
+SUMMARY_MAX_WORDS = 150
+
+SUMMARY_PROMPT = """You maintain a compact running summary of a health conversation between a user and an AI health assistant.
+
+Current summary:
+{summary}
+
+Newest exchange:
+User: {message}
+Assistant: {bot_response}
+
+Rewrite the summary so it includes the newest exchange. Keep symptoms, durations, conditions, medications, advice already given and open questions. Drop greetings and repetition. Use at most {max_words} words and reply with the summary only."""
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+_summary_llm = None
+_session_locks = weakref.WeakValueDictionary()
+_session_locks_guard = threading.Lock()
+# Turns waiting to be folded, per session with a drain job running
+_pending_turns = {}
+_pending_turns_guard = threading.Lock()
+
+def _get_summary_llm():
+    """Create the summarization model on first use"""
+    global _summary_llm
+    if _summary_llm is None:
+        _summary_llm = ChatOpenAI(
+            model=os.getenv('SUMMARY_MODEL', 'gpt-4'),
+            temperature=0,
+            max_tokens=300
+        )
+    return _summary_llm
+
+def _get_session_lock(session_id):
+    """Serialize summary updates for the same session"""
+    with _session_locks_guard:
+        lock = _session_locks.get(session_id)
+        if lock is None:
+            lock = threading.Lock()
+            _session_locks[session_id] = lock
+        return lock
+
+def get_session_summary(session_id):
+    """Return the stored rolling summary for a session, or an empty string"""
+    try:
+        record = ConversationSummary.query.get(session_id)
+        return record.summary if record else ""
+    except Exception as e:
+        print(f"Error loading conversation summary: {str(e)}")
+        return ""
+
+def update_session_summary(session_id, user_id, message, bot_response):
+    """Fold the newest turn into the session's rolling summary and persist it"""
+    with _get_session_lock(session_id):
+        try:
+            record = ConversationSummary.query.get(session_id)
+            previous_summary = record.summary if record and record.summary else "(no summary yet)"
+
+            response = _get_summary_llm().invoke(SUMMARY_PROMPT.format(
+                summary=previous_summary,
+                message=message,
+                bot_response=bot_response,
+                max_words=SUMMARY_MAX_WORDS
+            ))
+            new_summary = str(response.content).strip()
+
+            if record is None:
+                record = ConversationSummary(session_id=session_id, user_id=user_id, turn_count=0)
+                db.session.add(record)
+            record.summary = new_summary
+            record.turn_count = (record.turn_count or 0) + 1
+            db.session.commit()
+            session_history.set_summary(session_id, new_summary)
+            print(f"Updated conversation summary for session {session_id} ({record.turn_count} turns)")
+            return new_summary
+        except Exception as e:
+            print(f"Error updating conversation summary: {str(e)}")
+            db.session.rollback()
+            return None
+
+def schedule_summary_update(app, session_id, user_id, message, bot_response):
+    """Update the rolling summary in the background so the response is not delayed
+
+    Turns of one session are folded by a single drain job in the order they
+    were scheduled; different sessions still update in parallel.
+    """
+    turn = (user_id, message, bot_response)
+    with _pending_turns_guard:
+        if session_id in _pending_turns:
+            _pending_turns[session_id].append(turn)
+            return None
+        _pending_turns[session_id] = deque([turn])
+
+    def drain():
+        with app.app_context():
+            while True:
+                with _pending_turns_guard:
+                    if not _pending_turns[session_id]:
+                        del _pending_turns[session_id]
+                        return
+                    user_id, message, bot_response = _pending_turns[session_id].popleft()
+                update_session_summary(session_id, user_id, message, bot_response)
+
+    return _summary_executor.submit(drain)
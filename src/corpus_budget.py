@@ -0,0 +1,173 @@
+import json
+import os
+import re
+from collections import Counter
+from datetime import datetime
+import numpy as np
+
+# Vectors the index may hold in total, leaving headroom under the plan limit
+DEFAULT_MAX_VECTORS = 1_900_000
+EMBEDDING_DIMENSION = 384
+# Rough per-vector metadata overhead on top of the stored chunk text
+METADATA_OVERHEAD_BYTES = 200
+# JSON object capping sources at a fraction of each ingestion's selection, e.g. {"PubMed": 0.2}
+CORPUS_SOURCE_QUOTAS = json.loads(os.getenv('CORPUS_SOURCE_QUOTAS', '{}'))
+
+SOURCE_SCORES = {
+    'WHO': 10,
+    'SNOMED': 9,
+    'ICD10': 8,
+    'DrugBank': 7,
+    'Clinical Guidelines': 6,
+    'CDC': 5,
+    'PubMed': 4
+}
+QUALITY_KEYWORDS = re.compile(r"treatment|diagnosis|symptoms|prevention", re.IGNORECASE)
+
+def _text_and_metadata(item):
+    # Handle Document objects and {'text', 'metadata'} dicts
+    if hasattr(item, 'page_content'):
+        return item.page_content, item.metadata
+    return item.get('text', ''), item.get('metadata', {})
+
+def _ages_in_days(dates, now):
+    """Days since each ISO date, NaN where missing or unparseable"""
+    ages = np.full(len(dates), np.nan)
+    present = np.array([bool(d) for d in dates], dtype=bool)
+    if not present.any():
+        return ages
+    values = [d for d in dates if d]
+    try:
+        parsed = np.array(values, dtype="datetime64[us]")
+    except ValueError:
+        # Mixed formats: fall back to parsing one by one
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(datetime.fromisoformat(str(value)).replace(tzinfo=None), "us"))
+            except (TypeError, ValueError):
+                parsed.append(np.datetime64("NaT"))
+        parsed = np.array(parsed, dtype="datetime64[us]")
+    ages[present] = (np.datetime64(now, "us") - parsed) / np.timedelta64(1, "D")
+    return ages
+
+class CandidateColumns:
+    """Columnar scoring features of candidate chunks, extracted in one pass"""
+
+    def __init__(self, items, now=None):
+        self.items = items
+        texts = []
+        sources = []
+        dates = []
+        for item in items:
+            text, metadata = _text_and_metadata(item)
+            texts.append(text)
+            sources.append(str(metadata.get('source', '')))
+            dates.append(metadata.get('date'))
+        self.sources = np.array(sources, dtype=object)
+        self.lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        self.has_keyword = np.fromiter((QUALITY_KEYWORDS.search(text) is not None for text in texts),
+                                       dtype=bool, count=len(texts))
+        self.age_days = _ages_in_days(dates, now or datetime.now())
+
+    def __len__(self):
+        return len(self.items)
+
+    def scores(self):
+        """Source reliability + recency + length + keyword score, as in the original per-item loop"""
+        unique_sources, source_codes = np.unique(self.sources.astype(str), return_inverse=True)
+        source_scores = np.array([SOURCE_SCORES.get(source, 0) for source in unique_sources], dtype=np.int32)
+        scores = source_scores[source_codes] if len(self) else np.zeros(0, dtype=np.int32)
+        with np.errstate(invalid="ignore"):
+            scores = scores + np.where(self.age_days < 30, 5, np.where(self.age_days < 90, 3, 0))
+        scores = scores + 2 * (self.lengths > 100) + 3 * self.has_keyword
+        return scores.astype(np.int32)
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores, ties broken by input order, without a full sort"""
+    n = len(scores)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        candidates = np.arange(n)
+    else:
+        # Partial selection finds the k-th highest score in linear time; everything
+        # above it is in, and ties at the boundary go to the earliest items
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        candidates = np.concatenate([above, ties])
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+class BudgetPlan:
+    """Selected candidates and the projected effect on the index"""
+
+    def __init__(self, items, selected, scores, columns, current_vectors, max_vectors, dimension,
+                 source_quotas=None):
+        self.items = items
+        self.source_quotas = source_quotas or {}
+        self.selected = selected
+        self.scores = scores
+        self.columns = columns
+        self.current_vectors = current_vectors
+        self.max_vectors = max_vectors
+        self.dimension = dimension
+
+    def selected_items(self):
+        return [self.items[i] for i in self.selected]
+
+    def report(self):
+        candidates = Counter(self.columns.sources.tolist())
+        chosen = Counter(self.columns.sources[self.selected].tolist())
+        text_bytes = int(self.columns.lengths[self.selected].sum())
+        projected_bytes = len(self.selected) * (self.dimension * 4 + METADATA_OVERHEAD_BYTES) + text_bytes
+        return {
+            "candidates": len(self.columns),
+            "selected": len(self.selected),
+            "current_vectors": self.current_vectors,
+            "projected_vectors": self.current_vectors + len(self.selected),
+            "max_vectors": self.max_vectors,
+            "projected_added_bytes": projected_bytes,
+            "min_selected_score": int(self.scores[self.selected].min()) if len(self.selected) else None,
+            "sources": {
+                source: {"candidates": count, "selected": chosen.get(source, 0),
+                         "quota": self.source_quotas.get(source)}
+                for source, count in candidates.most_common()
+            }
+        }
+
+    def print_report(self):
+        report = self.report()
+        print("\n=== Corpus Budget Plan ===")
+        print(f"Selected {report['selected']} of {report['candidates']} candidates "
+              f"(min score {report['min_selected_score']})")
+        print(f"Projected vectors: {report['projected_vectors']} / {report['max_vectors']}, "
+              f"about {report['projected_added_bytes'] / (1024 * 1024):.1f} MB added")
+        for source, counts in report["sources"].items():
+            quota = f" (quota {counts['quota']:.0%})" if counts["quota"] is not None else ""
+            print(f"  {source or '(no source)'}: {counts['selected']} / {counts['candidates']}{quota}")
+
+def plan_corpus_budget(items, current_vectors=0, max_vectors=DEFAULT_MAX_VECTORS, source_quotas=None,
+                       dimension=EMBEDDING_DIMENSION, now=None):
+    """Choose the highest-scoring candidates that fit the remaining vector budget
+
+    source_quotas optionally caps a source at a fraction of the selection,
+    for example {"PubMed": 0.2}. Nothing is written; the plan reports what
+    would be.
+    """
+    columns = CandidateColumns(items, now=now)
+    scores = columns.scores()
+    budget = max(0, min(max_vectors - current_vectors, len(items)))
+
+    eligible = np.ones(len(items), dtype=bool)
+    for source, fraction in (source_quotas or {}).items():
+        in_source = np.flatnonzero(columns.sources == source)
+        quota = int(budget * fraction)
+        if len(in_source) > quota:
+            eligible[in_source] = False
+            eligible[in_source[top_k_indices(scores[in_source], quota)]] = True
+
+    eligible_indices = np.flatnonzero(eligible)
+    selected = eligible_indices[top_k_indices(scores[eligible_indices], budget)]
+    return BudgetPlan(items, selected, scores, columns, current_vectors, max_vectors, dimension, source_quotas)
@@ -4,6 +4,13 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+
+# Expression backing the full-text search column on conversations
+CONVERSATION_SEARCH_EXPRESSION = (
+    "setweight(to_tsvector('english', coalesce(message, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(bot_response, '')), 'B')"
+)
 
 db = SQLAlchemy()  # Shared database instance
 
@@ -57,6 +64,29 @@ def create_missing_columns(app):
             print(f"Error updating users table schema: {str(e)}")
             db.session.rollback()
 
+def create_conversation_search_index(app):
+    """Add the full-text search column, GIN index and embedding column to conversations"""
+    with app.app_context():
+        try:
+            db.session.execute(text(f"""
+                ALTER TABLE medical.conversations
+                ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS ({CONVERSATION_SEARCH_EXPRESSION}) STORED;
+            """))
+            db.session.execute(text("""
+                ALTER TABLE medical.conversations
+                ADD COLUMN IF NOT EXISTS embedding JSONB;
+            """))
+            db.session.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_conversations_search_vector
+                ON medical.conversations USING GIN (search_vector);
+            """))
+            db.session.commit()
+            print("Successfully updated conversations search index")
+        except Exception as e:
+            print(f"Error updating conversations search index: {str(e)}")
+            db.session.rollback()
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     __table_args__ = {'schema': 'medical'}
@@ -137,7 +167,10 @@ class User(UserMixin, db.Model):
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'  # Fixed: Double underscores
-    __table_args__ = {'schema': 'medical'}
+    __table_args__ = (
+        db.Index('ix_conversations_search_vector', 'search_vector', postgresql_using='gin'),
+        {'schema': 'medical'}
+    )
     
     conversation_id = db.Column(db.Integer, primary_key=True)
     # Include schema in foreign key
@@ -146,10 +179,28 @@ class Conversation(db.Model):
     bot_response = db.Column(db.Text, nullable=False)
     session_id = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.now)  # Added timestamp
+    # Full-text search vector maintained by Postgres, never written by the app
+    search_vector = db.Column(TSVECTOR, db.Computed(CONVERSATION_SEARCH_EXPRESSION, persisted=True))
+    # MiniLM embedding of the turn, filled lazily for semantic re-ranking
+    embedding = db.Column(JSONB)
 
     def __repr__(self):
         return f'<Conversation {self.conversation_id}>'
 
+class ConversationSummary(db.Model):
+    __tablename__ = 'conversation_summaries'
+    __table_args__ = {'schema': 'medical'}
+
+    # One rolling summary per chat session
+    session_id = db.Column(db.String(50), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('medical.users.user_id'), nullable=True)
+    summary = db.Column(db.Text, nullable=False, default='')
+    turn_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<ConversationSummary {self.session_id}>'
+
 class MedicalRecord(db.Model):
     __tablename__ = 'medical_records'
     __table_args__ = {'schema': 'medical'}
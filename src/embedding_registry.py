@@ -0,0 +1,372 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from src.cache_paths import CACHE_DIR
+
+EMBEDDING_REGISTRY_PATH = os.getenv('EMBEDDING_REGISTRY_PATH', os.path.join(CACHE_DIR, 'embedding_registry.sqlite'))
+# How long a resolved active namespace is reused before the registry is read again
+ACTIVE_TARGET_CACHE_SECONDS = float(os.getenv('ACTIVE_TARGET_CACHE_SECONDS', '30'))
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '100'))
+# Pause between migration batches so re-embedding does not starve the app of CPU or API quota
+MIGRATION_PAUSE_SECONDS = float(os.getenv('MIGRATION_PAUSE_SECONDS', '0.5'))
+
+class EmbeddingMismatchError(ValueError):
+    """Raised when an embedding model does not match the one registered for an index namespace"""
+
+def embedding_model_name(embeddings):
+    """Model identifier of a LangChain embeddings object"""
+    return (getattr(embeddings, "model_name", None)
+            or getattr(embeddings, "model", None)
+            or type(embeddings).__name__)
+
+class EmbeddingRegistry:
+    """Records which embedding model, dimension and version each index namespace holds"""
+
+    def __init__(self, path=EMBEDDING_REGISTRY_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._dimensions = {}
+        self._active_cache = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS spaces (
+                    index_name TEXT NOT NULL,
+                    namespace TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (index_name, namespace)
+                );
+                CREATE TABLE IF NOT EXISTS active (
+                    name TEXT PRIMARY KEY,
+                    index_name TEXT NOT NULL,
+                    namespace TEXT NOT NULL,
+                    switched_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS migrations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    source_index TEXT NOT NULL,
+                    source_namespace TEXT NOT NULL,
+                    target_index TEXT NOT NULL,
+                    target_namespace TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    copied INTEGER NOT NULL DEFAULT 0,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    error TEXT
+                );
+            """)
+
+    def describe_embeddings(self, embeddings):
+        """Model name and output dimension, probing the model once per model name"""
+        model_name = embedding_model_name(embeddings)
+        if model_name not in self._dimensions:
+            self._dimensions[model_name] = len(embeddings.embed_query("dimension probe"))
+        return {"model_name": model_name, "dimension": self._dimensions[model_name]}
+
+    def get_space(self, index_name, namespace=""):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model_name, dimension, version, created_at FROM spaces WHERE index_name = ? AND namespace = ?",
+                (index_name, namespace or "")
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "index_name": index_name,
+            "namespace": namespace or "",
+            "model_name": row[0],
+            "dimension": row[1],
+            "version": row[2],
+            "created_at": row[3]
+        }
+
+    def spaces(self, index_name=None):
+        query = "SELECT index_name, namespace FROM spaces"
+        params = ()
+        if index_name:
+            query += " WHERE index_name = ?"
+            params = (index_name,)
+        with self._lock:
+            keys = self._conn.execute(query + " ORDER BY index_name, version", params).fetchall()
+        return [self.get_space(index, namespace) for index, namespace in keys]
+
+    def verify(self, index_name, namespace, embeddings, index_dimension=None):
+        """Register the namespace on first use, otherwise raise if the embeddings do not match it"""
+        spec = self.describe_embeddings(embeddings)
+        space = self.get_space(index_name, namespace)
+        if space is not None:
+            if (space["model_name"], space["dimension"]) != (spec["model_name"], spec["dimension"]):
+                raise EmbeddingMismatchError(
+                    f"Index {index_name} namespace '{namespace or ''}' holds {space['model_name']} "
+                    f"({space['dimension']} dims, version {space['version']}), "
+                    f"not {spec['model_name']} ({spec['dimension']} dims)"
+                )
+            return space
+
+        # The physical index dimension is only checked the first time a namespace is seen
+        if index_dimension is not None:
+            dimension = index_dimension() if callable(index_dimension) else index_dimension
+            if dimension and dimension != spec["dimension"]:
+                raise EmbeddingMismatchError(
+                    f"Index {index_name} has {dimension} dims but {spec['model_name']} produces {spec['dimension']}"
+                )
+
+        with self._lock, self._conn:
+            version = self._conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM spaces WHERE index_name = ?", (index_name,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR IGNORE INTO spaces (index_name, namespace, model_name, dimension, version, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (index_name, namespace or "", spec["model_name"], spec["dimension"], version,
+                 datetime.now().isoformat())
+            )
+        print(f"Registered {spec['model_name']} ({spec['dimension']} dims) for {index_name} "
+              f"namespace '{namespace or ''}'")
+        return self.get_space(index_name, namespace)
+
+    def active_target(self, name, refresh=False):
+        """(index_name, namespace) that reads for a logical index go to"""
+        cached = self._active_cache.get(name)
+        if cached and not refresh and time.monotonic() - cached[1] < ACTIVE_TARGET_CACHE_SECONDS:
+            return cached[0]
+        with self._lock:
+            row = self._conn.execute("SELECT index_name, namespace FROM active WHERE name = ?", (name,)).fetchone()
+        target = (row[0], row[1]) if row else (name, "")
+        self._active_cache[name] = (target, time.monotonic())
+        return target
+
+    def activate(self, name, index_name, namespace):
+        """Atomically point reads for a logical index at a registered namespace"""
+        if self.get_space(index_name, namespace) is None:
+            raise ValueError(f"Namespace '{namespace}' of {index_name} is not registered")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO active (name, index_name, namespace, switched_at) VALUES (?, ?, ?, ?)",
+                (name, index_name, namespace, datetime.now().isoformat())
+            )
+        self._active_cache.pop(name, None)
+        print(f"Reads for {name} now use {index_name} namespace '{namespace}'")
+
+    def start_migration(self, name, source, target, model_name):
+        """Record a running migration and return its id"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO migrations (name, source_index, source_namespace, target_index, target_namespace, "
+                "model_name, state, started_at) VALUES (?, ?, ?, ?, ?, ?, 'running', ?)",
+                (name, source[0], source[1], target[0], target[1], model_name, datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+    def update_migration(self, migration_id, **fields):
+        """Update progress columns of a migration; finished states get a finish time"""
+        if fields.get("state") in ("completed", "failed"):
+            fields["finished_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE migrations SET {assignments} WHERE id = ?", (*fields.values(), migration_id))
+
+    def migrations(self, name=None):
+        query = ("SELECT id, name, source_index, source_namespace, target_index, target_namespace, model_name, "
+                 "state, copied, started_at, finished_at, error FROM migrations")
+        params = ()
+        if name:
+            query += " WHERE name = ?"
+            params = (name,)
+        columns = ["id", "name", "source_index", "source_namespace", "target_index", "target_namespace",
+                   "model_name", "state", "copied", "started_at", "finished_at", "error"]
+        with self._lock:
+            return [dict(zip(columns, row)) for row in self._conn.execute(query + " ORDER BY id", params)]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_embedding_registry():
+    """Shared embedding registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = EmbeddingRegistry()
+        return _registry
+
+def migration_namespace(model_name):
+    """Fresh namespace name for a re-embedding run"""
+    slug = re.sub(r"[^a-z0-9]+", "-", model_name.split("/")[-1].lower()).strip("-")
+    return f"{slug}-{datetime.now():%Y%m%d%H%M%S}"
+
+def _copy_batch(documents, target_store, source_manifest, target_manifest):
+    """Re-embed documents into the target and carry their manifest records across"""
+    target_store.add_texts(
+        [doc.page_content for doc in documents],
+        metadatas=[doc.metadata for doc in documents],
+        ids=[doc.id for doc in documents]
+    )
+    # Keep the original ingestion dates so retention still counts from the first write
+    records = source_manifest.records(doc.id for doc in documents)
+    now = datetime.now().isoformat()
+    target_manifest.mark_indexed(
+        [doc.id for doc in documents],
+        [records.get(doc.id, (doc.metadata.get("source"), now))[0] for doc in documents],
+        [records.get(doc.id, (None, now))[1] for doc in documents]
+    )
+
+def _replay_writes(open_source, target_store, source_manifest, target_manifest, since, batch_size):
+    """Copy chunks written to the source namespace since `since` that the target does not hold yet"""
+    from src.helper import fetch_vector_store_documents
+
+    # Reopened so a local store sees what other processes appended since it was loaded
+    source_store = open_source()
+    replayed = 0
+    handled = set()
+    while True:
+        missing = [id_ for id_ in target_manifest.missing(source_manifest.indexed_since(since))
+                   if id_ not in handled]
+        if not missing:
+            return replayed
+        for start in range(0, len(missing), batch_size):
+            ids = missing[start:start + batch_size]
+            # Ids already deleted from the source are skipped, not retried forever
+            handled.update(ids)
+            documents = fetch_vector_store_documents(source_store, ids)
+            if documents:
+                _copy_batch(documents, target_store, source_manifest, target_manifest)
+            replayed += len(documents)
+        print(f"Replayed {replayed} chunks written to the source namespace during the migration")
+
+def migrate_embeddings(new_embeddings, name="sanocare", target_index=None, target_namespace=None,
+                       batch_size=MIGRATION_BATCH_SIZE, pause_seconds=MIGRATION_PAUSE_SECONDS, switch=True,
+                       dimension=None, settle_seconds=None):
+    """Re-embed every chunk of the active namespace into a fresh namespace, then switch reads to it
+
+    Chunks that ingestion writes to the old namespace while the copy runs are
+    found through its ingest manifest and replayed before the switch and again
+    after settle_seconds (default ACTIVE_TARGET_CACHE_SECONDS), once writers'
+    cached targets have expired. Pass 0 when no other process caches the target.
+    """
+    from src.helper import iter_vector_store_documents, open_vector_store
+    from src.ingest_manifest import IngestManifest
+
+    registry = get_embedding_registry()
+    source = registry.active_target(name, refresh=True)
+    model_name = embedding_model_name(new_embeddings)
+    target = (target_index or source[0], target_namespace or migration_namespace(model_name))
+    if target == source:
+        raise ValueError("Migration target must differ from the active namespace")
+
+    migration_id = registry.start_migration(name, source, target, model_name)
+    started_at = datetime.now().isoformat()
+    copied = 0
+    try:
+        spec = registry.describe_embeddings(new_embeddings)
+        if dimension and spec["dimension"] != dimension:
+            raise EmbeddingMismatchError(f"{model_name} produces {spec['dimension']} dims, not {dimension}")
+
+        # The source is only read, so the new model is passed just to satisfy the store constructor
+        def open_source():
+            return open_vector_store(source[0], new_embeddings, source[1], verify=False)
+
+        source_store = open_source()
+        target_store = open_vector_store(target[0], new_embeddings, target[1])
+        source_manifest = IngestManifest(*source)
+        target_manifest = IngestManifest(*target)
+
+        print(f"Migrating {name} from {source[0]}/'{source[1]}' to {target[0]}/'{target[1]}' "
+              f"with {model_name} ({spec['dimension']} dims)...")
+        for batch in iter_vector_store_documents(source_store, batch_size):
+            _copy_batch(batch, target_store, source_manifest, target_manifest)
+            copied += len(batch)
+            registry.update_migration(migration_id, copied=copied)
+            print(f"Re-embedded {copied} chunks")
+            time.sleep(pause_seconds)
+
+        copied += _replay_writes(open_source, target_store, source_manifest, target_manifest, started_at,
+                                 batch_size)
+        if switch:
+            registry.activate(name, *target)
+            # Writers resolve the active namespace from a cache, so some may still
+            # write to the old one until their cached target expires
+            settle_seconds = ACTIVE_TARGET_CACHE_SECONDS if settle_seconds is None else settle_seconds
+            if settle_seconds > 0:
+                time.sleep(settle_seconds)
+                copied += _replay_writes(open_source, target_store, source_manifest, target_manifest,
+                                         started_at, batch_size)
+    except Exception as e:
+        registry.update_migration(migration_id, state="failed", copied=copied, error=str(e))
+        print(f"Embedding migration failed after {copied} chunks: {str(e)}")
+        raise
+
+    registry.update_migration(migration_id, state="completed", copied=copied)
+    return {"migration_id": migration_id, "target_index": target[0], "target_namespace": target[1],
+            "copied": copied}
+
+def start_background_migration(new_embeddings, **kwargs):
+    """Run migrate_embeddings on a daemon thread"""
+    def run():
+        try:
+            migrate_embeddings(new_embeddings, **kwargs)
+        except Exception as e:
+            # migrate_embeddings has marked the migration failed in the migrations table
+            print(f"Error in background embedding migration: {str(e)}")
+    thread = threading.Thread(target=run, name="embedding-migration", daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the embedding registry or re-embed an index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    status = subparsers.add_parser("status", help="Show registered namespaces, active targets and migrations")
+    status.add_argument("--name", default="sanocare")
+    migrate = subparsers.add_parser("migrate", help="Re-embed the active namespace with a new model")
+    migrate.add_argument("--name", default="sanocare")
+    migrate.add_argument("--backend", help="Embedding backend for the new vectors (torch, onnx, onnx-int8)")
+    migrate.add_argument("--model", help="sentence-transformers model for the new vectors (default: MiniLM)")
+    migrate.add_argument("--dimension", type=int, help="Expected output dimension of the new model")
+    migrate.add_argument("--target-index", help="Physical index for the new vectors (default: same index)")
+    migrate.add_argument("--target-namespace", help="Namespace for the new vectors (default: generated)")
+    migrate.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    migrate.add_argument("--pause", type=float, default=MIGRATION_PAUSE_SECONDS)
+    migrate.add_argument("--no-switch", action="store_true", help="Leave reads on the current namespace")
+    migrate.add_argument("--settle", type=float, default=None,
+                         help="Seconds to wait after the switch before the final replay "
+                              "(default: ACTIVE_TARGET_CACHE_SECONDS; 0 skips it)")
+    args = parser.parse_args()
+
+    registry = get_embedding_registry()
+    if args.command == "status":
+        print("Active target:", registry.active_target(args.name, refresh=True))
+        for space in registry.spaces():
+            print(f"{space['index_name']}/'{space['namespace']}': {space['model_name']} "
+                  f"{space['dimension']} dims, version {space['version']}")
+        for migration in registry.migrations(args.name):
+            print(f"Migration {migration['id']}: {migration['state']}, {migration['copied']} chunks "
+                  f"-> {migration['target_index']}/'{migration['target_namespace']}'")
+        return
+
+    from src.embeddings import create_embeddings
+    migrate_embeddings(
+        create_embeddings(args.backend, args.model),
+        name=args.name,
+        target_index=args.target_index,
+        target_namespace=args.target_namespace,
+        batch_size=args.batch_size,
+        pause_seconds=args.pause,
+        switch=not args.no_switch,
+        dimension=args.dimension,
+        settle_seconds=args.settle
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.memory_usage import current_rss_mb
+from src.cache_paths import CACHE_DIR
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# torch (sentence-transformers), onnx (fp32 export) or onnx-int8 (dynamically quantized export)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join(CACHE_DIR, 'onnx', 'all-MiniLM-L6-v2'))
+# all-MiniLM-L6-v2 truncates inputs at 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+
+def export_onnx_model(output_dir=ONNX_MODEL_DIR, model_name=EMBEDDING_MODEL_NAME, quantize=True):
+    """Export the MiniLM encoder to ONNX, plus a dynamically int8-quantized copy"""
+    from optimum.exporters.onnx import main_export
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"Exporting {model_name} to ONNX in {output_dir}...")
+    main_export(model_name, output=output_dir, task="feature-extraction")
+
+    if quantize:
+        print("Quantizing ONNX model to int8...")
+        quantize_dynamic(
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            os.path.join(output_dir, ONNX_INT8_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+    print("ONNX export completed")
+    return output_dir
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 sentence embeddings computed with ONNX Runtime on CPU"""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=False, batch_size=32,
+                 max_length=MAX_SEQ_LENGTH, num_threads=None, model_name=EMBEDDING_MODEL_NAME):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantized = quantized
+        self.batch_size = batch_size
+
+        model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            export_onnx_model(model_dir, model_name, quantize=quantized)
+
+        # Tokenizer and session are loaded once and shared by every call
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+
+    def _embed_batch(self, texts):
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self._session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens followed by L2 normalization, as in the
+        # sentence-transformers pipeline for this model
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_array(self, texts):
+        """Embed texts into a float32 matrix"""
+        texts = [text.replace("\n", " ") for text in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Sorting by length keeps padding per batch small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            vectors = self._embed_batch([texts[i] for i in batch_indices])
+            for index, vector in zip(batch_indices, vectors):
+                result[index] = vector
+        return np.asarray(result, dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+def create_embeddings(backend=None, model_name=None):
+    """Build the embedding model for the configured backend, MiniLM unless another sentence-transformers model is named"""
+    backend = backend or EMBEDDING_BACKEND
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    if backend in ("onnx", "onnx-int8"):
+        # Each model gets its own export directory
+        model_dir = (ONNX_MODEL_DIR if model_name == EMBEDDING_MODEL_NAME
+                     else os.path.join(CACHE_DIR, 'onnx', model_name.split("/")[-1]))
+        return OnnxMiniLMEmbeddings(model_dir=model_dir, quantized=backend == "onnx-int8", model_name=model_name)
+    if backend != "torch":
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+def _benchmark_backend(backend, texts, queue):
+    start_rss = current_rss_mb()
+    start = time.perf_counter()
+    model = create_embeddings(backend)
+    load_seconds = time.perf_counter() - start
+    loaded_rss = current_rss_mb()
+
+    model.embed_documents(texts[:8])  # warm-up
+    start = time.perf_counter()
+    model.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    queue.put({
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "texts_per_second": round(len(texts) / elapsed, 1),
+        "rss_after_load_mb": round(loaded_rss, 1),
+        "model_rss_mb": round(loaded_rss - start_rss, 1),
+        "rss_after_run_mb": round(current_rss_mb(), 1)
+    })
+
+def benchmark_embedding_backends(texts, backends=("torch", "onnx", "onnx-int8")):
+    """Compare throughput and memory of each backend, each in a fresh process"""
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        queue = context.Queue()
+        process = context.Process(target=_benchmark_backend, args=(backend, texts, queue))
+        process.start()
+        process.join()
+        if process.exitcode == 0:
+            results.append(queue.get())
+        else:
+            print(f"Benchmark for {backend} failed with exit code {process.exitcode}")
+    return results
+
+if __name__ == "__main__":
+    sample_texts = [
+        f"Patient reports {symptom} lasting {days} days with mild fever and fatigue."
+        for symptom in ["headache", "cough", "back pain", "nausea", "dizziness", "chest tightness"]
+        for days in range(1, 101)
+    ]
+    print(f"Benchmarking embedding backends on {len(sample_texts)} texts...")
+    for row in benchmark_embedding_backends(sample_texts):
+        print(f"{row['backend']:>10}: {row['texts_per_second']:>8} texts/s, "
+              f"load {row['load_seconds']}s, model RSS {row['model_rss_mb']} MB, "
+              f"RSS after run {row['rss_after_run_mb']} MB")
@@ -1,25 +1,66 @@
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader, TextLoader, Docx2txtLoader
+from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from langchain_core.documents import Document
+from contextlib import nullcontext
 from datetime import datetime
+import asyncio
+import glob
 import os
-import requests
+import threading
+import time
 import json
 from dotenv import load_dotenv
 from src.database import db, Conversation, User
 from flask_login import current_user
-from langchain_huggingface import HuggingFaceEmbeddings
 from pinecone import Pinecone
 from typing import List, Dict
+from src.embeddings import create_embeddings
+from src.local_vectorstore import LocalVectorStore
+from src.bm25_index import get_bm25_index
+from src.reranker import overfetch, rerank
+from src.retrieval import multi_query_search, merge_unique
+from src.embedding_registry import get_embedding_registry
+from src.ingest_manifest import IngestManifest, document_id
+from src.run_manifest import RunManifest
+from src.parallel_loader import LoadReport, iter_directory_chunks
+from src.ingestion_pipeline import IngestionPipeline
+from src.parse_cache import PARSE_CACHE_ENABLED, get_parse_cache
+from src.near_dedup import NEAR_DEDUP_ENABLED, NearDuplicateIndex
+from src.corpus_budget import CORPUS_SOURCE_QUOTAS, DEFAULT_MAX_VECTORS, EMBEDDING_DIMENSION, plan_corpus_budget
+from src.vector_expiry import RETENTION_POLICY, expire_vectors, print_report as print_expiry_report
+from src.static_knowledge import (all_static_knowledge_documents, get_regional_knowledge, get_age_group_knowledge,
+                                    match_static_knowledge)
+from src.who_cache import get_who_cache, to_country_code, DEFAULT_WHO_INDICATORS
+from src.async_fetch import FetchError, run_fetch
+
+# Vector store used for retrieval and ingestion: pinecone or local
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'pinecone')
+
+# Metadata of the templated knowledge that used to be embedded into the index
+STATIC_KNOWLEDGE_FILTER = {
+    "source": "medical_knowledge_base",
+    "type": {"$in": ["regional", "age_specific"]}
+}
 
 #Extract Data From the PDF File
 def load_pdf_file(data):
-    loader = DirectoryLoader(data,
-                           glob="*.pdf",
-                           loader_cls=PyPDFLoader)
-    documents = loader.load()
+    """Load PDF pages, reusing the parse cache for files that have not changed"""
+    if not PARSE_CACHE_ENABLED:
+        return DirectoryLoader(data, glob="*.pdf", loader_cls=PyPDFLoader).load()
+    
+    cache = get_parse_cache()
+    documents = []
+    for path in sorted(glob.glob(os.path.join(data, "*.pdf"))):
+        entry = cache.get(path)
+        if entry is not None:
+            documents.extend(entry[0])
+            continue
+        pages = PyPDFLoader(path).load()
+        cache.put(path, pages)
+        documents.extend(pages)
+    cache.prune(data)
     return documents
 
 #Split the Data into Text Chunks
@@ -29,9 +70,84 @@ def text_split(extracted_data):
     return text_chunks
 
 #Download the Embeddings from HuggingFace 
-def download_hugging_face_embeddings():
-    """Download and return HuggingFace embeddings"""
-    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+def download_hugging_face_embeddings(backend=None):
+    """Download and return MiniLM embeddings for the configured backend (torch, onnx, onnx-int8)"""
+    return create_embeddings(backend)
+
+def open_vector_store(index_name, embeddings, namespace="", verify=True):
+    """Open one physical index namespace on the configured backend, checking the embedding registry"""
+    if verify:
+        # Refuses to mix vectors from different embedding models in one namespace
+        get_embedding_registry().verify(
+            index_name, namespace, embeddings,
+            index_dimension=lambda: _physical_index_dimension(index_name)
+        )
+    if VECTOR_STORE_BACKEND == 'local':
+        vectorstore = LocalVectorStore.from_existing_index(
+            index_name=index_name,
+            embedding=embeddings,
+            namespace=namespace or None
+        )
+    else:
+        vectorstore = PineconeVectorStore.from_existing_index(
+            index_name=index_name,
+            embedding=embeddings,
+            namespace=namespace or None
+        )
+    vectorstore.registry_target = (index_name, namespace or "")
+    return vectorstore
+
+def load_vector_store(index_name="sanocare", embeddings=None, namespace=None):
+    """Connect to the configured vector store backend (VECTOR_STORE_BACKEND=pinecone or local)"""
+    if embeddings is None:
+        embeddings = download_hugging_face_embeddings()
+    physical_index = index_name
+    if namespace is None:
+        # Reads and writes follow the namespace the embedding registry marks active
+        physical_index, namespace = get_embedding_registry().active_target(index_name)
+    return open_vector_store(physical_index, embeddings, namespace)
+
+def _physical_index_dimension(index_name):
+    """Dimension of an existing Pinecone index; local indexes take the first vector's dimension"""
+    if VECTOR_STORE_BACKEND == 'local':
+        return None
+    pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+    return pc.describe_index(index_name).dimension
+
+def _fetched_documents(response):
+    """Documents from a Pinecone fetch response, with the chunk text taken out of the metadata"""
+    documents = []
+    for vector_id, vector in response.vectors.items():
+        metadata = dict(vector.metadata or {})
+        text = metadata.pop("text", "")
+        documents.append(Document(id=vector_id, page_content=text, metadata=metadata))
+    return documents
+
+def iter_vector_store_documents(vectorstore, batch_size=100):
+    """Yield every stored chunk of a vector store namespace in batches"""
+    if isinstance(vectorstore, LocalVectorStore):
+        yield from vectorstore.iter_documents(batch_size)
+        return
+    index_name, namespace = vectorstore.registry_target
+    index = Pinecone(api_key=os.getenv('PINECONE_API_KEY')).Index(index_name)
+    for ids in index.list(namespace=namespace, limit=batch_size):
+        yield _fetched_documents(index.fetch(ids=list(ids), namespace=namespace))
+
+def fetch_vector_store_documents(vectorstore, ids):
+    """Stored chunks for the given ids, on either backend; unknown ids are left out"""
+    if isinstance(vectorstore, LocalVectorStore):
+        return vectorstore.get_by_ids(ids)
+    index_name, namespace = vectorstore.registry_target
+    index = Pinecone(api_key=os.getenv('PINECONE_API_KEY')).Index(index_name)
+    return _fetched_documents(index.fetch(ids=list(ids), namespace=namespace))
+
+def describe_vector_index(vectorstore, index_name="sanocare"):
+    """Get index statistics (total_vector_count, dimension, namespaces) for either backend"""
+    if isinstance(vectorstore, LocalVectorStore):
+        return vectorstore.describe_index_stats()
+    index_name = getattr(vectorstore, "registry_target", (index_name, ""))[0]
+    pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+    return pc.Index(index_name).describe_index_stats()
 
 def log_conversation(session_id, user_ip, user_message, bot_response):
     """Log conversation to database for authenticated users"""
@@ -82,7 +198,7 @@ def log_conversation(session_id, user_ip, user_message, bot_response):
         print(f"Database logging failed: {str(e)}")
         print("Stack trace:", e.__traceback__)
 
-def load_snomed_data() -> List[Dict]:
+async def _load_snomed_data(fetcher) -> List[Dict]:
     """Load SNOMED CT clinical terminology focusing on symptoms and their relationships"""
     try:
         # SNOMED CT API endpoint (requires authentication)
@@ -113,18 +229,23 @@ def load_snomed_data() -> List[Dict]:
         
         processed_data = []
         
-        # Get concepts for each symptom category
-        for category, root_id in symptom_categories.items():
-            params = {
+        # Get concepts for every symptom category concurrently
+        specs = [(snomed_url, {
+            'headers': headers,
+            'params': {
                 'ecl': f'< {root_id}',  # Get all descendants
                 'limit': 100,  # Limit per category
-                'active': True,  # Only active concepts
+                'active': 'true',  # Only active concepts
                 'form': 'inferred'  # Include inferred relationships
             }
-            
-            response = requests.get(snomed_url, headers=headers, params=params, timeout=30)
-            
-            if response.status_code == 401:
+        }) for root_id in symptom_categories.values()]
+        responses = await fetcher.fetch_all(specs)
+        
+        for category, response in zip(symptom_categories, responses):
+            if isinstance(response, Exception):
+                print(f"Error loading SNOMED category {category}: {str(response)}")
+                continue
+            elif response.status_code == 401:
                 print("Unauthorized: Invalid SNOMED API key")
                 continue
             elif response.status_code != 200:
@@ -179,17 +300,11 @@ def load_snomed_data() -> List[Dict]:
         print(f"Total loaded symptom concepts: {len(processed_data)}")
         return processed_data
             
-    except requests.exceptions.Timeout:
-        print("Timeout while fetching SNOMED data")
-        return []
-    except requests.exceptions.RequestException as e:
-        print(f"Error loading SNOMED data: {str(e)}")
-        return []
     except Exception as e:
         print(f"Unexpected error loading SNOMED data: {str(e)}")
         return []
 
-def load_icd10_data() -> List[Dict]:
+async def _load_icd10_data(fetcher) -> List[Dict]:
     """Load ICD-10 disease classification data"""
     try:
         # WHO ICD-10 API endpoint
@@ -197,7 +312,7 @@ def load_icd10_data() -> List[Dict]:
         headers = {
             'Accept': 'application/json'
         }
-        response = requests.get(icd10_url, headers=headers, timeout=30)
+        response = await fetcher.fetch(icd10_url, headers=headers)
         if response.status_code == 200:
             icd10_data = response.json()
             return [{
@@ -209,13 +324,11 @@ def load_icd10_data() -> List[Dict]:
         else:
             print(f"ICD-10 API returned status code: {response.status_code}")
             print(f"Response content: {response.text}")
-    except requests.exceptions.Timeout:
-        print("Timeout while fetching ICD-10 data")
-    except requests.exceptions.RequestException as e:
+    except (FetchError, ValueError) as e:
         print(f"Error loading ICD-10 data: {str(e)}")
     return []
 
-def load_drugbank_data() -> List[Dict]:
+async def _load_drugbank_data(fetcher) -> List[Dict]:
     """Load DrugBank medication information"""
     try:
         # DrugBank API endpoint (requires authentication)
@@ -224,7 +337,7 @@ def load_drugbank_data() -> List[Dict]:
             'Authorization': f"Bearer {os.getenv('DRUGBANK_API_KEY')}",
             'Accept': 'application/json'
         }
-        response = requests.get(drugbank_url, headers=headers, timeout=30)
+        response = await fetcher.fetch(drugbank_url, headers=headers)
         if response.status_code == 200:
             drug_data = response.json()
             return [{
@@ -239,13 +352,11 @@ def load_drugbank_data() -> List[Dict]:
         else:
             print(f"DrugBank API returned status code: {response.status_code}")
             print(f"Response content: {response.text}")
-    except requests.exceptions.Timeout:
-        print("Timeout while fetching DrugBank data")
-    except requests.exceptions.RequestException as e:
+    except (FetchError, ValueError) as e:
         print(f"Error loading DrugBank data: {str(e)}")
     return []
 
-def load_clinical_guidelines() -> List[Dict]:
+async def _load_clinical_guidelines(fetcher) -> List[Dict]:
     """Load clinical guidelines from various sources"""
     guidelines = []
     
@@ -255,8 +366,13 @@ def load_clinical_guidelines() -> List[Dict]:
         headers = {
             'Accept': 'application/json'
         }
-        who_response = requests.get(who_url, headers=headers, timeout=30)
-        if who_response.status_code == 200:
+        # CDC Guidelines (using RSS feed)
+        cdc_url = "https://www.cdc.gov/guidelines/rss/guidelines.xml"
+        who_response, cdc_response = await fetcher.fetch_all([(who_url, {'headers': headers}), (cdc_url, {})])
+        
+        if isinstance(who_response, Exception):
+            print(f"Error loading WHO guidelines: {str(who_response)}")
+        elif who_response.status_code == 200:
             who_data = who_response.json()
             guidelines.extend([{
                 'title': doc.get('title', ''),
@@ -269,10 +385,9 @@ def load_clinical_guidelines() -> List[Dict]:
             print(f"WHO API returned status code: {who_response.status_code}")
             print(f"Response content: {who_response.text}")
         
-        # CDC Guidelines (using RSS feed)
-        cdc_url = "https://www.cdc.gov/guidelines/rss/guidelines.xml"
-        cdc_response = requests.get(cdc_url, timeout=30)
-        if cdc_response.status_code == 200:
+        if isinstance(cdc_response, Exception):
+            print(f"Error loading CDC guidelines: {str(cdc_response)}")
+        elif cdc_response.status_code == 200:
             # Parse XML response
             from xml.etree import ElementTree
             root = ElementTree.fromstring(cdc_response.content)
@@ -287,10 +402,6 @@ def load_clinical_guidelines() -> List[Dict]:
         else:
             print(f"CDC RSS feed returned status code: {cdc_response.status_code}")
             
-    except requests.exceptions.Timeout:
-        print("Timeout while fetching clinical guidelines")
-    except requests.exceptions.RequestException as e:
-        print(f"Error loading clinical guidelines: {str(e)}")
     except Exception as e:
         print(f"Unexpected error loading clinical guidelines: {str(e)}")
     
@@ -349,176 +460,135 @@ def process_medical_data(data: List[Dict], source: str) -> List[Dict]:
         processed_data.append(processed_item)
     return processed_data
 
-def get_pinecone_stats():
-    """Get current Pinecone index statistics"""
+def get_pinecone_stats(index_name="sanocare"):
+    """Get current vector index statistics for the active embedding namespace"""
     try:
-        index = pinecone.Index("sanocare")
-        stats = index.describe_index_stats()
+        index_name, namespace = get_embedding_registry().active_target(index_name)
+        if VECTOR_STORE_BACKEND == 'local':
+            stats = LocalVectorStore(None, index_name=index_name, namespace=namespace).describe_index_stats()
+        else:
+            stats = Pinecone(api_key=os.getenv('PINECONE_API_KEY')).Index(index_name).describe_index_stats()
         return {
             'total_vectors': stats.total_vector_count,
+            'dimension': stats.dimension,
             'namespaces': stats.namespaces
         }
     except Exception as e:
         print(f"Error getting Pinecone stats: {str(e)}")
         return None
 
-def optimize_data_for_pinecone(data: List[Dict], max_vectors: int = 1_900_000) -> List[Dict]:
+def optimize_data_for_pinecone(data: List[Dict], max_vectors: int = DEFAULT_MAX_VECTORS,
+                               source_quotas: Dict[str, float] = None, current_vectors: int = None,
+                               dimension: int = None) -> List[Dict]:
     """Optimize data to stay within Pinecone limits and minimize costs"""
     try:
-        # Get current stats
-        stats = get_pinecone_stats()
-        if not stats:
-            print("Warning: Could not get Pinecone stats. Proceeding with default limits.")
-            current_vectors = 0
-        else:
-            current_vectors = stats['total_vectors']
-        
-        # Calculate how many vectors we can add
-        available_space = max_vectors - current_vectors
+        # Get current stats unless the caller already has them
+        stats = None
+        if current_vectors is None:
+            stats = get_pinecone_stats()
+            if not stats:
+                print("Warning: Could not get Pinecone stats. Proceeding with default limits.")
+                current_vectors = 0
+            else:
+                current_vectors = stats['total_vectors']
         
-        if available_space <= 0:
+        if max_vectors - current_vectors <= 0:
             print("Warning: Pinecone index is full. Consider upgrading or cleaning up old data.")
             return []
         
-        # Score and filter data based on relevance and recency
-        scored_data = []
-        current_time = datetime.now()
-        
-        for item in data:
-            score = 0
-            
-            # Handle Document objects
-            if hasattr(item, 'page_content'):
-                text = item.page_content
-                metadata = item.metadata
-            else:
-                text = item.get('text', '')
-                metadata = item.get('metadata', {})
-            
-            # Score based on source reliability
-            source_scores = {
-                'WHO': 10,
-                'SNOMED': 9,
-                'ICD10': 8,
-                'DrugBank': 7,
-                'Clinical Guidelines': 6,
-                'CDC': 5,
-                'PubMed': 4
-            }
-            score += source_scores.get(metadata.get('source', ''), 0)
-            
-            # Score based on recency (if date available)
-            if 'date' in metadata:
-                try:
-                    item_date = datetime.fromisoformat(metadata['date'])
-                    days_old = (current_time - item_date).days
-                    if days_old < 30:  # Recent content gets higher score
-                        score += 5
-                    elif days_old < 90:  # Moderately recent content
-                        score += 3
-                except:
-                    pass
-            
-            # Score based on content quality
-            if len(text) > 100:  # Longer content might be more detailed
-                score += 2
-            if any(keyword in text.lower() for keyword in ['treatment', 'diagnosis', 'symptoms', 'prevention']):
-                score += 3
-            
-            scored_data.append((score, item))
-        
-        # Sort by score and take top items
-        scored_data.sort(reverse=True)
-        return [item for _, item in scored_data[:available_space]]
+        # Score every candidate column-wise and keep the top of the remaining budget
+        plan = plan_corpus_budget(data, current_vectors=current_vectors, max_vectors=max_vectors,
+                                  source_quotas=source_quotas,
+                                  dimension=dimension or (stats or {}).get('dimension') or EMBEDDING_DIMENSION)
+        plan.print_report()
+        return plan.selected_items()
         
     except Exception as e:
         print(f"Error optimizing data for Pinecone: {str(e)}")
         return []
 
 def load_medical_documents(directory_path):
-    """Load medical documents from various formats"""
+    """Load and chunk PDF, text and Word documents, parsing files in parallel worker processes"""
     try:
         if not os.path.exists(directory_path):
             print(f"Directory not found: {directory_path}")
             return []
         
-        documents = []
-        
-        # Load PDF files
-        pdf_loader = DirectoryLoader(
-            directory_path,
-            glob="**/*.pdf",
-            loader_cls=PyPDFLoader
-        )
-        try:
-            pdf_docs = pdf_loader.load()
-            documents.extend(pdf_docs)
-        except Exception as e:
-            print(f"Error loading PDF files: {str(e)}")
-        
-        # Load text files
-        text_loader = DirectoryLoader(
-            directory_path,
-            glob="**/*.txt",
-            loader_cls=TextLoader
-        )
-        try:
-            text_docs = text_loader.load()
-            documents.extend(text_docs)
-        except Exception as e:
-            print(f"Error loading text files: {str(e)}")
-        
-        # Load Word documents
-        docx_loader = DirectoryLoader(
-            directory_path,
-            glob="**/*.docx",
-            loader_cls=Docx2txtLoader
-        )
-        try:
-            docx_docs = docx_loader.load()
-            documents.extend(docx_docs)
-        except Exception as e:
-            print(f"Error loading Word documents: {str(e)}")
-        
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        
-        split_docs = text_splitter.split_documents(documents)
-        return split_docs
+        return list(stream_medical_documents(directory_path))
         
     except Exception as e:
         print(f"Error loading medical documents: {str(e)}")
         return []
 
+def stream_medical_documents(directory_path):
+    """Yield document chunks as worker processes finish each file, then print the load report"""
+    report = LoadReport()
+    yield from iter_directory_chunks(directory_path, report=report)
+    report.finish()
+    report.print_summary()
+
+def _who_documents(country='India'):
+    """One readable document per cached WHO indicator value for a country"""
+    return [Document(
+        page_content=(
+            f"WHO {value['name']} in {value['country']} "
+            f"({value['year']}, {value['sex']}): {value['value']}"
+        ),
+        metadata={
+            "source": "WHO",
+            "type": "health_data",
+            "indicator": value['indicator'],
+            "country": value['country'],
+            "year": value['year']
+        }
+    ) for value in get_who_cache().get_country_values(country, DEFAULT_WHO_INDICATORS)]
+
+def _realtime_documents(external):
+    """WHO values plus the CDC alerts and PubMed articles of an external fetch"""
+    data = _who_documents()
+    for alert in external.get("CDC", []):
+        data.append(Document(
+            page_content=f"CDC Alert: {alert['title'] or ''} - {alert['description'] or ''}",
+            metadata={"source": "CDC", "type": "alert", "published": alert['date']}
+        ))
+    for article in external.get("PubMed", []):
+        text = f"PubMed Article: {article['title']}"
+        if article.get('abstract'):
+            text += f" - {article['abstract']}"
+        data.append(Document(
+            page_content=text,
+            metadata={"source": "PubMed", "type": "article", "published": article['date']}
+        ))
+    return data
+
 def fetch_realtime_medical_data():
     """Fetch real-time medical data from various sources"""
     try:
-        data = []
-        
-        # WHO data
-        who_data = get_who_data('India')
-        if who_data:
-            data.append(Document(
-                page_content=str(who_data),
-                metadata={"source": "WHO", "type": "health_data"}
-            ))
-        
-        # Add more data sources as needed
-        
-        return data
+        return _realtime_documents(fetch_external_medical_data(REALTIME_SOURCES))
     except Exception as e:
         print(f"Error fetching real-time medical data: {str(e)}")
         return []
 
-def fetch_cdc_alerts():
+def fetch_medical_source_documents():
+    """Real-time and structured source documents, fetched together over one pooled session"""
+    try:
+        external = fetch_external_medical_data()
+        documents = _prepare_realtime_documents(_realtime_documents(external))
+        for source in STRUCTURED_SOURCES:
+            documents.extend(
+                Document(page_content=item['text'], metadata=item['metadata'])
+                for item in process_medical_data(external.get(source, []), source)
+            )
+        return documents
+    except Exception as e:
+        print(f"Error fetching medical source documents: {str(e)}")
+        return []
+
+async def _fetch_cdc_alerts(fetcher):
     """Fetch CDC health alerts and updates"""
     try:
         cdc_url = "https://emergency.cdc.gov/han/feed.asp"
-        response = requests.get(cdc_url, timeout=30)
+        response = await fetcher.fetch(cdc_url)
         if response.status_code == 200:
             # Parse RSS feed
             from xml.etree import ElementTree
@@ -536,7 +606,7 @@ def fetch_cdc_alerts():
         print(f"Error fetching CDC alerts: {str(e)}")
     return []
 
-def fetch_pubmed_articles():
+async def _fetch_pubmed_articles(fetcher):
     """Fetch recent medical articles from PubMed"""
     try:
         pubmed_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
@@ -546,156 +616,314 @@ def fetch_pubmed_articles():
             'retmode': 'json',
             'retmax': 100
         }
-        response = requests.get(pubmed_url, params=params, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            articles = []
-            for id in data.get('esearchresult', {}).get('idlist', []):
-                # Get article details
-                article_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-                article_params = {
-                    'db': 'pubmed',
-                    'id': id,
-                    'retmode': 'json'
-                }
-                article_response = requests.get(article_url, params=article_params, timeout=30)
-                if article_response.status_code == 200:
-                    article_data = article_response.json()
-                    article = article_data.get('result', {}).get(id, {})
-                    articles.append({
-                        'title': article.get('title', ''),
-                        'abstract': article.get('abstract', ''),
-                        'date': article.get('pubdate', ''),
-                        'type': 'PubMed Article'
-                    })
-            return articles
+        response = await fetcher.fetch(pubmed_url, params=params)
+        if response.status_code != 200:
+            return []
+        ids = response.json().get('esearchresult', {}).get('idlist', [])
+        # One comma-joined esummary request per batch instead of one per article
+        summaries = await fetcher.pubmed_summaries(ids)
+        return [{
+            'title': summaries[id].get('title', ''),
+            'abstract': summaries[id].get('abstract', ''),
+            'date': summaries[id].get('pubdate', ''),
+            'type': 'PubMed Article'
+        } for id in ids if id in summaries]
     except Exception as e:
         print(f"Error fetching PubMed articles: {str(e)}")
     return []
 
-def update_knowledge_base():
-    """Update the knowledge base with all medical data, optimized for cost and with duplicate checking"""
+# Async loaders by the source name their documents are tagged with
+EXTERNAL_LOADERS = {
+    "CDC": _fetch_cdc_alerts,
+    "PubMed": _fetch_pubmed_articles,
+    "SNOMED": _load_snomed_data,
+    "ICD10": _load_icd10_data,
+    "DrugBank": _load_drugbank_data,
+    "Clinical Guidelines": _load_clinical_guidelines
+}
+REALTIME_SOURCES = ("CDC", "PubMed")
+STRUCTURED_SOURCES = ("SNOMED", "ICD10", "DrugBank", "Clinical Guidelines")
+
+def fetch_external_medical_data(sources=None, who_indicators=None):
+    """Refresh the WHO cache and run the external loaders concurrently over one pooled session"""
+    sources = list(sources or EXTERNAL_LOADERS)
+
+    async def fetch(fetcher):
+        return await asyncio.gather(
+            get_who_cache().refresh_with(fetcher, who_indicators),
+            *(EXTERNAL_LOADERS[source](fetcher) for source in sources),
+            return_exceptions=True
+        )
+
     try:
-        # Initialize Pinecone client
-        pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+        who_result, *results = run_fetch(fetch)
+    except Exception as e:
+        print(f"Error fetching external medical data: {str(e)}")
+        return {}
+    if isinstance(who_result, Exception):
+        print(f"Error refreshing WHO data: {str(who_result)}")
+
+    data = {}
+    for source, result in zip(sources, results):
+        if isinstance(result, Exception):
+            print(f"Error loading {source} data: {str(result)}")
+            result = []
+        data[source] = result
+    return data
+
+def _run_loader(source):
+    """Run a single external loader over its own session"""
+    return fetch_external_medical_data([source]).get(source, [])
+
+def load_snomed_data() -> List[Dict]:
+    """SNOMED CT symptom concepts, fetched on their own"""
+    return _run_loader("SNOMED")
+
+def load_icd10_data() -> List[Dict]:
+    """ICD-10 disease categories, fetched on their own"""
+    return _run_loader("ICD10")
+
+def load_drugbank_data() -> List[Dict]:
+    """DrugBank medications, fetched on their own"""
+    return _run_loader("DrugBank")
+
+def load_clinical_guidelines() -> List[Dict]:
+    """WHO and CDC clinical guidelines, fetched on their own"""
+    return _run_loader("Clinical Guidelines")
+
+def fetch_cdc_alerts():
+    """CDC health alerts, fetched on their own"""
+    return _run_loader("CDC")
+
+def fetch_pubmed_articles():
+    """PubMed articles from the last 7 days, fetched on their own"""
+    return _run_loader("PubMed")
+
+def update_knowledge_base(resume=False, run=None):
+    """Update the knowledge base with all medical data, checkpointed per source and batch in a run manifest"""
+    own_run = run is None
+    try:
+        # Create embeddings
+        embeddings = download_hugging_face_embeddings()
+        
+        # Create vector store
+        vectorstore = load_vector_store("sanocare", embeddings)
         
         # Get current stats
-        index = pc.Index("sanocare")
-        stats = index.describe_index_stats()
+        stats = describe_vector_index(vectorstore, "sanocare")
         if not stats:
-            print("Failed to get Pinecone stats. Aborting update.")
+            print("Failed to get index stats. Aborting update.")
             return None
             
         current_vectors = stats.total_vector_count
         print(f"Current vector count: {current_vectors}")
         
-        # Load documents
-        print("Loading medical documents...")
-        documents = load_medical_documents("Data")
-        
-        # Fetch real-time data
-        print("Fetching real-time medical data...")
-        realtime_data = fetch_realtime_medical_data()
-        
-        # Create structured knowledge documents
-        print("Creating structured knowledge documents...")
-        structured_docs = create_medical_knowledge_documents()
-        
-        # Process real-time data with better organization
-        processed_realtime_docs = []
-        for doc in realtime_data:
-            # Add more detailed metadata for better retrieval
-            doc.metadata.update({
-                "data_type": "realtime",
-                "timestamp": datetime.now().isoformat(),
-                "priority": "high",  # Real-time data gets higher priority
-                "source": doc.metadata.get("source", "WHO"),
-                "category": "current_health_data"
-            })
-            processed_realtime_docs.append(doc)
-        
-        # Combine all documents with priority ordering
-        all_documents = processed_realtime_docs + documents + structured_docs
-        
-        # Create embeddings
-        embeddings = download_hugging_face_embeddings()
-        
-        # Create vector store
-        vectorstore = PineconeVectorStore.from_existing_index(
-            index_name="sanocare",
-            embedding=embeddings
+        if own_run:
+            run = RunManifest(*vectorstore.registry_target).start(resume)
+        
+        # Regional and age-group knowledge is served from memory, not the index
+        if not run.stage_completed("remove_static_knowledge"):
+            with run.stage("remove_static_knowledge"):
+                remove_static_knowledge_vectors(vectorstore)
+        
+        # Idempotent upsert by content-hash id; unchanged documents are skipped locally
+        manifest = get_ingest_manifest(vectorstore)
+        near_duplicates = get_near_duplicate_index(vectorstore)
+        if current_vectors == 0 and len(manifest) and not run.resumed:
+            print("Index is empty, clearing stale ingestion manifest")
+            manifest.clear()
+            if near_duplicates is not None:
+                near_duplicates.clear()
+        if near_duplicates is not None:
+            near_duplicates.reset_report()
+        
+        def source_documents():
+            # Fetched sources are budgeted as a whole, with per-source quotas, before any is written
+            return optimize_data_for_pinecone(fetch_medical_source_documents(), source_quotas=CORPUS_SOURCE_QUOTAS,
+                                              current_vectors=current_vectors,
+                                              dimension=getattr(stats, "dimension", None))
+        
+        # Sources stream through load, embed and upsert stages instead of being
+        # collected in memory first; the run manifest stages what they yield so
+        # a resumed run does not reload them
+        sources = [
+            # External source data first so it is indexed even if a later batch fails
+            ("realtime", run.stream_documents("realtime", source_documents)),
+            ("documents", run.stream_documents("documents", lambda: stream_medical_documents("Data")))
+        ]
+        pipeline = IngestionPipeline(
+            embed=vectorstore.embeddings.embed_documents,
+            write=embedding_writer(vectorstore),
+            keep=manifest.missing,
+            dedup=near_duplicates,
+            on_commit=batch_committer(manifest, near_duplicates, run)
         )
-        
-        # Track progress
-        total_docs = len(all_documents)
-        processed_docs = 0
-        skipped_docs = 0
-        failed_docs = 0
-        
-        # Process documents in batches with duplicate checking
-        batch_size = 100
-        for i in range(0, total_docs, batch_size):
-            batch = all_documents[i:i + batch_size]
-            batch_texts = []
-            batch_metadatas = []
-            
-            for doc in batch:
-                try:
-                    # Check if document already exists
-                    existing_docs = vectorstore.similarity_search(
-                        doc.page_content,
-                        k=1,
-                        filter={
-                            "source": doc.metadata.get("source", ""),
-                            "type": doc.metadata.get("type", ""),
-                            "data_type": doc.metadata.get("data_type", ""),
-                            "timestamp": doc.metadata.get("timestamp", "")
-                        }
-                    )
-                    
-                    if existing_docs:
-                        # Check if content is similar enough to be considered a duplicate
-                        if existing_docs[0].page_content == doc.page_content:
-                            print(f"Skipping duplicate document: {doc.metadata.get('source', 'Unknown')}")
-                            skipped_docs += 1
-                            continue
-                    
-                    batch_texts.append(doc.page_content)
-                    batch_metadatas.append(doc.metadata)
-                    processed_docs += 1
-                    
-                except Exception as e:
-                    print(f"Error processing document: {str(e)}")
-                    failed_docs += 1
-                    continue
-            
-            if batch_texts:
-                try:
-                    vectorstore.add_texts(batch_texts, metadatas=batch_metadatas)
-                    print(f"Added batch {i//batch_size + 1} of {(total_docs + batch_size - 1)//batch_size}")
-                    print(f"Progress: {processed_docs}/{total_docs} documents processed")
-                except Exception as e:
-                    print(f"Error adding batch to Pinecone: {str(e)}")
-                    failed_docs += len(batch_texts)
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            added, skipped, failed = pipeline.run(sources)
+            status = "failed" if failed else "completed"
+        finally:
+            summary = pipeline.summary()
+            if near_duplicates is not None:
+                summary["near_duplicates_by_source"] = near_duplicates.report()
+                near_duplicates.print_report()
+            run.record_stage("pipeline", status, time.perf_counter() - start,
+                             summary["stages"]["upsert"]["items"], summary)
+            pipeline.print_summary()
         
         # Get updated stats
-        new_stats = index.describe_index_stats()
+        new_stats = describe_vector_index(vectorstore, "sanocare")
         if new_stats:
-            print("\n=== Update Summary ===")
-            print(f"Total documents processed: {total_docs}")
-            print(f"Successfully added: {processed_docs}")
-            print(f"Skipped duplicates: {skipped_docs}")
-            print(f"Failed to process: {failed_docs}")
-            print(f"Updated vector count: {new_stats.total_vector_count}")
-            print(f"Added {new_stats.total_vector_count - current_vectors} new vectors")
-            print(f"Real-time documents added: {len(processed_realtime_docs)}")
+            print(f"Updated vector count: {new_stats.total_vector_count} "
+                  f"({new_stats.total_vector_count - current_vectors:+d})")
         
+        if own_run:
+            run.finish()
+            run.print_summary()
         return vectorstore
         
     except Exception as e:
         print(f"Error updating knowledge base: {str(e)}")
+        if own_run and run is not None and run.run_id:
+            run.finish("failed")
+            run.print_summary()
         return None
 
+def _prepare_realtime_documents(realtime_data):
+    """Tag real-time documents with the metadata retrieval uses to prioritize them"""
+    processed_realtime_docs = []
+    for doc in realtime_data:
+        # Add more detailed metadata for better retrieval
+        doc.metadata.update({
+            "data_type": "realtime",
+            "timestamp": datetime.now().isoformat(),
+            "priority": "high",  # Real-time data gets higher priority
+            "source": doc.metadata.get("source", "WHO"),
+            "category": "current_health_data"
+        })
+        processed_realtime_docs.append(doc)
+    return processed_realtime_docs
+
+def embedding_writer(vectorstore):
+    """Function writing precomputed vectors to the store, used by the streaming ingestion pipeline"""
+    if isinstance(vectorstore, LocalVectorStore):
+        return lambda ids, docs, vectors: vectorstore.add_embeddings(
+            [doc.page_content for doc in docs], vectors, metadatas=[doc.metadata for doc in docs], ids=ids
+        )
+    
+    index_name, namespace = vectorstore.registry_target
+    index = Pinecone(api_key=os.getenv('PINECONE_API_KEY')).Index(index_name)
+    
+    def write(ids, docs, vectors):
+        # PineconeVectorStore keeps the chunk text under the "text" metadata key
+        index.upsert(vectors=[
+            {"id": id_, "values": list(vector), "metadata": {**doc.metadata, "text": doc.page_content}}
+            for id_, doc, vector in zip(ids, docs, vectors)
+        ], namespace=namespace)
+    return write
+
+_ingest_manifests = {}
+_near_duplicate_indexes = {}
+_namespace_indexes_lock = threading.Lock()
+
+def get_near_duplicate_index(vectorstore):
+    """Shared MinHash-LSH index of the chunks in the vector store's index namespace, or None when disabled"""
+    if not NEAR_DEDUP_ENABLED:
+        return None
+    target = vectorstore.registry_target
+    manifest = get_ingest_manifest(vectorstore)
+    with _namespace_indexes_lock:
+        if target not in _near_duplicate_indexes:
+            _near_duplicate_indexes[target] = NearDuplicateIndex(*target, manifest=manifest)
+        return _near_duplicate_indexes[target]
+
+def get_ingest_manifest(vectorstore):
+    """Shared manifest of ids already written to the vector store's index namespace"""
+    target = vectorstore.registry_target
+    with _namespace_indexes_lock:
+        if target not in _ingest_manifests:
+            _ingest_manifests[target] = IngestManifest(*target)
+        return _ingest_manifests[target]
+
+def batch_committer(manifest, near_duplicates=None, run=None, index_name="sanocare"):
+    """commit(source, ids, docs, batch_number=None) recording a batch already written to the vector store
+
+    The batch goes into the BM25 index, ingest manifest and near-duplicate index,
+    then is checkpointed in the run by planned batch number, or as a streamed batch.
+    """
+    bm25_index = get_bm25_index(index_name)
+
+    def commit(source, ids, docs, batch_number=None):
+        # Keep the lexical index in step with the vector index
+        bm25_index.add_texts([doc.page_content for doc in docs], [doc.metadata for doc in docs], ids=ids)
+        manifest.mark_indexed(ids, [doc.metadata.get("source") for doc in docs])
+        if near_duplicates is not None:
+            near_duplicates.add(ids, docs, source)
+        if run is None:
+            return
+        if batch_number is None:
+            run.record_batch(source, ids)
+        else:
+            run.commit_batch(source, batch_number)
+    return commit
+
+def upsert_documents(vectorstore, documents, manifest=None, batch_size=100, index_name="sanocare",
+                     run=None, source="documents"):
+    """Upsert documents under deterministic ids, skipping ids already in the manifest; returns (added, skipped, failed)
+
+    With a run manifest the batch plan is stored per source and every committed
+    batch is checkpointed, so a resumed run continues after the last one.
+    """
+    manifest = manifest or get_ingest_manifest(vectorstore)
+    
+    # Deterministic ids also collapse duplicates within this run
+    by_id = {}
+    for doc in documents:
+        doc_id = document_id(doc.page_content, doc.metadata.get("source", ""))
+        by_id.setdefault(doc_id, doc)
+    
+    near_duplicates = get_near_duplicate_index(vectorstore)
+    batches = run.planned_batches(source) if run else None
+    if batches is None:
+        new_ids = manifest.missing(by_id)
+        if near_duplicates is not None:
+            near_duplicates.reset_report()
+            new_ids = near_duplicates.filter(source, new_ids, [by_id[doc_id] for doc_id in new_ids])
+            near_duplicates.print_report()
+        if run:
+            batches = run.plan_batches(source, new_ids, batch_size)
+        else:
+            batches = [(i // batch_size, new_ids[i:i + batch_size], False) for i in range(0, len(new_ids), batch_size)]
+    pending = [(number, batch_ids) for number, batch_ids, committed in batches if not committed]
+    skipped = len(documents) - sum(len(batch_ids) for _, batch_ids in pending)
+    print(f"{sum(len(batch_ids) for _, batch_ids in pending)} new {source} documents, "
+          f"{skipped} already indexed, committed or (near) duplicated")
+    
+    added = 0
+    failed = 0
+    commit = batch_committer(manifest, near_duplicates, run, index_name)
+    stage = run.stage(f"upsert:{source}") if run else nullcontext()
+    with stage as record:
+        for number, batch_ids in pending:
+            batch_ids = [doc_id for doc_id in batch_ids if doc_id in by_id]
+            batch_texts = [by_id[doc_id].page_content for doc_id in batch_ids]
+            batch_metadatas = [by_id[doc_id].metadata for doc_id in batch_ids]
+            try:
+                vectorstore.add_texts(batch_texts, metadatas=batch_metadatas, ids=batch_ids)
+                commit(source, batch_ids, [by_id[doc_id] for doc_id in batch_ids], number)
+                added += len(batch_ids)
+                print(f"Added {source} batch {number + 1} of {len(batches)}")
+            except Exception as e:
+                print(f"Error adding batch to vector store: {str(e)}")
+                failed += len(batch_ids)
+                if near_duplicates is not None:
+                    near_duplicates.discard(batch_ids)
+        if record is not None:
+            record.count = added
+            record.details = {"skipped": skipped, "failed": failed}
+    return added, skipped, failed
+
 def is_high_relevance(item):
     """Check if an item is highly relevant for storage"""
     # Define relevance criteria
@@ -714,36 +942,13 @@ def is_high_relevance(item):
     
     return has_keywords and (is_recent or is_reliable_source)
 
-def cleanup_old_data(max_age_days: int = 30):
-    """Clean up old data from Pinecone to free up space"""
+def cleanup_old_data(max_age_days: int = 30, dry_run: bool = False, vectorstore=None):
+    """Expire vectors of dated sources older than max_age_days, using the local ingestion manifest"""
     try:
-        index = pinecone.Index("sanocare")
-        stats = index.describe_index_stats()
-        
-        # Get all vectors with metadata
-        query_response = index.query(
-            vector=[0] * 384,  # dummy vector
-            top_k=10000,
-            include_metadata=True
-        )
-        
-        # Filter vectors older than max_age_days
-        current_time = datetime.now()
-        old_vectors = []
-        
-        for match in query_response.matches:
-            metadata = match.metadata
-            if 'date' in metadata:
-                vector_date = datetime.fromisoformat(metadata['date'])
-                if (current_time - vector_date).days > max_age_days:
-                    old_vectors.append(match.id)
-        
-        if old_vectors:
-            # Delete old vectors
-            index.delete(ids=old_vectors)
-            print(f"Deleted {len(old_vectors)} old vectors")
-            
-        return len(old_vectors)
+        policy = {source: (max_age_days if days is not None else None) for source, days in RETENTION_POLICY.items()}
+        report = expire_vectors("sanocare", policy=policy, dry_run=dry_run, vectorstore=vectorstore)
+        print_expiry_report(report)
+        return report["expired"]
         
     except Exception as e:
         print(f"Error cleaning up old data: {str(e)}")
@@ -751,298 +956,18 @@ def cleanup_old_data(max_age_days: int = 30):
 
 def create_medical_knowledge_documents():
     """Create structured medical knowledge documents for different regions and demographics"""
-    documents = []
-    
-    # Region-specific medical information
-    regions = {
-        "India": {
-            "traditional_medicine": [
-                "Ayurveda principles and practices",
-                "Traditional Chinese Medicine (TCM) in India",
-                "Homeopathy in Indian context",
-                "Yoga and meditation practices",
-                "Siddha medicine",
-                "Unani medicine"
-            ],
-            "common_conditions": [
-                "Tropical diseases",
-                "Dengue fever",
-                "Malaria",
-                "Tuberculosis",
-                "Diabetes in Indian population",
-                "Cardiovascular diseases",
-                "Respiratory infections"
-            ],
-            "cultural_practices": [
-                "Dietary restrictions and preferences",
-                "Family-centric healthcare decisions",
-                "Religious considerations in treatment",
-                "Traditional healing methods",
-                "Fasting practices",
-                "Herbal remedies"
-            ]
-        },
-        "China": {
-            "traditional_medicine": [
-                "Traditional Chinese Medicine (TCM)",
-                "Acupuncture",
-                "Herbal medicine",
-                "Qigong",
-                "Tai Chi",
-                "Cupping therapy"
-            ],
-            "common_conditions": [
-                "Respiratory conditions",
-                "Digestive disorders",
-                "Traditional medicine syndromes",
-                "Chronic conditions",
-                "Mental health patterns"
-            ],
-            "cultural_practices": [
-                "Yin-Yang balance",
-                "Five elements theory",
-                "Seasonal health practices",
-                "Family-based care",
-                "Traditional dietary therapy"
-            ]
-        },
-        "Japan": {
-            "traditional_medicine": [
-                "Kampo medicine",
-                "Shiatsu massage",
-                "Reiki healing",
-                "Traditional herbal medicine",
-                "Zen medicine practices"
-            ],
-            "common_conditions": [
-                "Stress-related conditions",
-                "Longevity practices",
-                "Preventive medicine",
-                "Mental health approaches",
-                "Lifestyle diseases"
-            ],
-            "cultural_practices": [
-                "Mind-body connection",
-                "Preventive healthcare",
-                "Work-life balance",
-                "Traditional dietary practices",
-                "Community health practices"
-            ]
-        },
-        "Europe": {
-            "traditional_medicine": [
-                "Western herbal medicine",
-                "Homeopathy",
-                "Naturopathy",
-                "Traditional European medicine",
-                "Aromatherapy"
-            ],
-            "common_conditions": [
-                "Chronic diseases",
-                "Mental health conditions",
-                "Lifestyle-related diseases",
-                "Age-related conditions",
-                "Environmental health issues"
-            ],
-            "cultural_practices": [
-                "Evidence-based medicine",
-                "Preventive healthcare",
-                "Social healthcare systems",
-                "Holistic approaches",
-                "Traditional healing methods"
-            ]
-        },
-        "Hispanic": {
-            "traditional_medicine": [
-                "Curanderismo practices",
-                "Traditional herbal remedies",
-                "Folk medicine traditions",
-                "Spiritual healing practices",
-                "Traditional massage"
-            ],
-            "common_conditions": [
-                "Diabetes in Hispanic population",
-                "Hypertension patterns",
-                "Genetic conditions",
-                "Cultural health beliefs",
-                "Mental health patterns"
-            ],
-            "cultural_practices": [
-                "Family involvement in healthcare",
-                "Traditional dietary practices",
-                "Religious healing traditions",
-                "Language considerations",
-                "Community health practices"
-            ]
-        },
-        "American": {
-            "traditional_medicine": [
-                "Western medicine practices",
-                "Alternative medicine approaches",
-                "Evidence-based treatments",
-                "Modern healthcare systems",
-                "Integrative medicine"
-            ],
-            "common_conditions": [
-                "Chronic conditions",
-                "Mental health patterns",
-                "Lifestyle-related diseases",
-                "Insurance considerations",
-                "Preventive health"
-            ],
-            "cultural_practices": [
-                "Individual healthcare decisions",
-                "Modern dietary trends",
-                "Healthcare system navigation",
-                "Preventive care practices",
-                "Technology-based health"
-            ]
-        }
-    }
-    
-    # Age-specific medical information
-    age_groups = {
-        "child": {
-            "developmental_stages": [
-                "Infant development",
-                "Toddler health",
-                "School-age health",
-                "Growth and development",
-                "Early childhood nutrition",
-                "Physical activity needs"
-            ],
-            "common_conditions": [
-                "Childhood illnesses",
-                "Vaccination schedules",
-                "Nutritional needs",
-                "Physical development",
-                "Behavioral health",
-                "Learning disabilities"
-            ],
-            "care_approaches": [
-                "Child-friendly communication",
-                "Parent involvement",
-                "Play-based interventions",
-                "Safety considerations",
-                "Educational support",
-                "Family-centered care"
-            ]
-        },
-        "adolescent": {
-            "developmental_stages": [
-                "Puberty changes",
-                "Emotional development",
-                "Social development",
-                "Identity formation",
-                "Cognitive development",
-                "Physical growth"
-            ],
-            "common_conditions": [
-                "Acne",
-                "Mental health concerns",
-                "Nutritional needs",
-                "Physical development",
-                "Substance use",
-                "Reproductive health"
-            ],
-            "care_approaches": [
-                "Privacy considerations",
-                "Peer influence",
-                "Risk-taking behaviors",
-                "Future planning",
-                "Educational support",
-                "Mental health support"
-            ]
-        },
-        "adult": {
-            "health_concerns": [
-                "Work-life balance",
-                "Stress management",
-                "Preventive care",
-                "Chronic conditions",
-                "Reproductive health",
-                "Career health"
-            ],
-            "common_conditions": [
-                "Cardiovascular health",
-                "Mental health",
-                "Reproductive health",
-                "Lifestyle diseases",
-                "Occupational health",
-                "Family health"
-            ],
-            "care_approaches": [
-                "Evidence-based treatments",
-                "Lifestyle modifications",
-                "Preventive measures",
-                "Health maintenance",
-                "Workplace wellness",
-                "Family health management"
-            ]
-        },
-        "elderly": {
-            "health_concerns": [
-                "Age-related conditions",
-                "Mobility issues",
-                "Cognitive health",
-                "Social isolation",
-                "Nutritional needs",
-                "Medication management"
-            ],
-            "common_conditions": [
-                "Arthritis",
-                "Heart disease",
-                "Diabetes",
-                "Memory concerns",
-                "Vision problems",
-                "Hearing loss"
-            ],
-            "care_approaches": [
-                "Gentle communication",
-                "Fall prevention",
-                "Medication management",
-                "Quality of life",
-                "Social support",
-                "End-of-life care"
-            ]
-        }
-    }
-    
-    # Create documents for each region
-    for region, categories in regions.items():
-        for category, topics in categories.items():
-            for topic in topics:
-                doc = Document(
-                    page_content=f"Medical information for {region} region regarding {category}: {topic}",
-                    metadata={
-                        "region": region,
-                        "category": category,
-                        "type": "regional",
-                        "topic": topic,
-                        "source": "medical_knowledge_base",
-                        "timestamp": datetime.now().isoformat()
-                    }
-                )
-                documents.append(doc)
-    
-    # Create documents for each age group
-    for age_group, categories in age_groups.items():
-        for category, topics in categories.items():
-            for topic in topics:
-                doc = Document(
-                    page_content=f"Medical information for {age_group} age group regarding {category}: {topic}",
-                    metadata={
-                        "age_group": age_group,
-                        "category": category,
-                        "type": "age_specific",
-                        "topic": topic,
-                        "source": "medical_knowledge_base",
-                        "timestamp": datetime.now().isoformat()
-                    }
-                )
-                documents.append(doc)
-    
-    return documents
+    return all_static_knowledge_documents()
+
+def remove_static_knowledge_vectors(vectorstore):
+    """Delete templated regional and age-group vectors; they are served from static_knowledge"""
+    try:
+        vectorstore.delete(filter=STATIC_KNOWLEDGE_FILTER)
+        get_bm25_index().delete(filter=STATIC_KNOWLEDGE_FILTER)
+        print("Removed templated regional and age-group vectors from the index")
+        return True
+    except Exception as e:
+        print(f"Error removing templated knowledge vectors: {str(e)}")
+        return False
 
 def get_relevant_medical_info(msg, docsearch, user_context=None):
     """Get relevant medical information with cultural and demographic context, optimized for cost"""
@@ -1050,92 +975,39 @@ def get_relevant_medical_info(msg, docsearch, user_context=None):
         # Extract key terms from the message
         key_terms = extract_key_terms(msg)
         
-        # First, try to get real-time data that matches the query
-        realtime_info = docsearch.similarity_search(
-            msg,
-            k=1,
-            filter={
-                "data_type": "realtime",
-                "priority": "high"
-            }
-        )
+        # All searches share one batched embedding call and run concurrently
+        specs = [
+            # Real-time data that matches the query
+            ("realtime", msg, {"data_type": "realtime", "priority": "high"}, overfetch(1)),
+            # Base medical information with limited results
+            ("medical", msg, {"type": {"$in": ["symptom", "disease", "treatment", "guideline"]}}, overfetch(2)),
+        ]
         
-        # Get base medical information with limited results
-        medical_info = docsearch.similarity_search(
-            msg,
-            k=2,
-            filter={
-                "type": {"$in": ["symptom", "disease", "treatment", "guideline"]}
-            }
-        )
+        # Cultural-specific information if available
+        if user_context and user_context.get("cultural_preferences"):
+            specs.append(("cultural",
+                          f"cultural preferences {user_context['cultural_preferences']} medical information",
+                          {"type": "cultural"}, 1))
         
-        # Combine real-time and medical info
-        combined_info = realtime_info + medical_info
+        labeled_info = multi_query_search(docsearch, specs)
         
         if user_context:
-            # Get region-specific information
-            region = user_context.get("region", "general")
-            region_info = docsearch.similarity_search(
-                f"{region} region medical information",
-                k=1,
-                filter={
-                    "type": "regional",
-                    "region": region
-                }
-            )
-            combined_info.extend(region_info)
-            
-            # Get age-specific information
-            age_group = user_context.get("age_group", "adult")
-            age_info = docsearch.similarity_search(
-                f"{age_group} age group medical information",
-                k=1,
-                filter={
-                    "type": "age_specific",
-                    "age_group": age_group
-                }
-            )
-            combined_info.extend(age_info)
-            
-            # Add cultural-specific information if available
-            if user_context.get("cultural_preferences"):
-                cultural_info = docsearch.similarity_search(
-                    f"cultural preferences {user_context['cultural_preferences']} medical information",
-                    k=1,
-                    filter={
-                        "type": "cultural"
-                    }
-                )
-                combined_info.extend(cultural_info)
-        
-        # Remove duplicates and prioritize real-time data
-        unique_info = []
-        seen_texts = set()
-        
-        # First add real-time data
-        for info in combined_info:
-            if info.metadata.get("data_type") == "realtime":
-                text = info.page_content
-                if text not in seen_texts:
-                    seen_texts.add(text)
-                    unique_info.append(info)
-        
-        # Then add other information
-        for info in combined_info:
-            if info.metadata.get("data_type") != "realtime":
-                text = info.page_content
-                if text not in seen_texts:
-                    seen_texts.add(text)
-                    unique_info.append(info)
-        
-        # Sort by relevance and recency
-        unique_info.sort(key=lambda x: (
-            x.metadata.get("priority", "low") == "high",  # Real-time data first
-            x.metadata.get("timestamp", ""),  # Most recent next
-            len(x.page_content)  # Longer content last
-        ), reverse=True)
-        
-        return unique_info[:3]  # Return top 3 most relevant results
+            # Region and age-group knowledge is static, so it is looked up in memory
+            # instead of searched; only the entry closest to the message reaches the reranker
+            match_text = " ".join([msg] + key_terms)
+            labeled_info["region"] = match_static_knowledge(
+                get_regional_knowledge(user_context.get("region")), match_text)
+            labeled_info["age_group"] = match_static_knowledge(
+                get_age_group_knowledge(user_context.get("age_group", "adult")), match_text)
+        
+        # Remove duplicates and put real-time data first in a single pass
+        unique_info = merge_unique(
+            labeled_info,
+            prioritize=lambda info: info.metadata.get("data_type") == "realtime"
+        )
+        
+        # Keep the 3 chunks the cross-encoder scores as most relevant to the message
+        return rerank(msg, unique_info, 3)
         
     except Exception as e:
         print(f"Error getting relevant medical information: {str(e)}")
@@ -1165,28 +1037,25 @@ def update_pinecone_index(docsearch, documents):
     """Update Pinecone index with new medical knowledge documents"""
     try:
         # Add documents to the index
-        docsearch.add_documents(documents)
-        print(f"Successfully added {len(documents)} documents to Pinecone index")
-        return True
+        added, skipped, failed = upsert_documents(docsearch, documents)
+        print(f"Successfully added {added} documents to Pinecone index ({skipped} unchanged)")
+        return failed == 0
     except Exception as e:
         print(f"Error updating Pinecone index: {str(e)}")
         return False
 
-def get_who_data(country):
-    """Get WHO data for a specific country"""
+def get_who_data(country, indicators=None):
+    """Get WHO data for a specific country from the local GHO cache"""
     try:
-        # WHO API endpoint
-        url = "https://ghoapi.azureedge.net/api/Indicator"
-        
-        # Make request
-        response = requests.get(url)
+        who_cache = get_who_cache()
+        # Revalidates with ETag/If-Modified-Since only when the local copy is stale
+        who_cache.refresh(indicators)
         
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"WHO API returned status code: {response.status_code}")
-            print(f"Response content: {response.text}")
-            return None
+        values = who_cache.get_country_values(country, indicators or DEFAULT_WHO_INDICATORS)
+        return {
+            'country': to_country_code(country),
+            'indicators': values
+        }
     except Exception as e:
         print(f"Error getting WHO data: {str(e)}")
         return None
@@ -1389,70 +1258,73 @@ def update_medical_history(user_id, condition, treatment, cultural_context):
         db.session.rollback()
         return False
 
-def fetch_region_specific_health_data(region):
-    """Fetch region-specific health data from various sources"""
-    try:
-        region_data = {}
-        
+async def _fetch_region_health_data(fetcher, region):
+    """Fetch the WHO, CDC and PubMed data for one region concurrently"""
+    who_response, cdc_response, pubmed_response = await fetcher.fetch_all([
         # WHO Regional Data
-        who_url = f"https://apps.who.int/gho/data/node.main.{region}"
-        who_response = requests.get(who_url, timeout=30)
-        if who_response.status_code == 200:
-            region_data['who'] = who_response.json()
-        
+        (f"https://apps.who.int/gho/data/node.main.{region}", {}),
         # CDC Regional Data
-        cdc_url = f"https://www.cdc.gov/healthdata/{region.lower()}/index.html"
-        cdc_response = requests.get(cdc_url, timeout=30)
-        if cdc_response.status_code == 200:
-            region_data['cdc'] = cdc_response.text
-        
+        (f"https://www.cdc.gov/healthdata/{region.lower()}/index.html", {}),
         # PubMed Regional Research
-        pubmed_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        pubmed_params = {
+        ("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi", {'params': {
             'db': 'pubmed',
             'term': f'({region} AND health AND culture)',
             'retmode': 'json',
             'retmax': 100
-        }
-        pubmed_response = requests.get(pubmed_url, params=pubmed_params, timeout=30)
-        if pubmed_response.status_code == 200:
-            region_data['pubmed'] = pubmed_response.json()
-        
-        return region_data
-        
+        }})
+    ])
+
+    region_data = {}
+    for key, response in (('who', who_response), ('cdc', cdc_response), ('pubmed', pubmed_response)):
+        if isinstance(response, Exception):
+            print(f"Error fetching {key} data for {region}: {str(response)}")
+        elif response.status_code == 200:
+            try:
+                region_data[key] = response.text if key == 'cdc' else response.json()
+            except ValueError as e:
+                print(f"Error parsing {key} data for {region}: {str(e)}")
+    return region_data
+
+def fetch_region_specific_health_data(region):
+    """Fetch region-specific health data from various sources"""
+    try:
+        return run_fetch(lambda fetcher: _fetch_region_health_data(fetcher, region))
     except Exception as e:
         print(f"Error fetching region-specific health data: {str(e)}")
         return None
 
-def fetch_cultural_health_practices(region, ethnicity):
-    """Fetch cultural health practices and traditional medicine information"""
-    try:
-        cultural_data = {}
-        
+async def _fetch_cultural_health_practices(fetcher, region, ethnicity):
+    """Fetch the WHO traditional medicine and PubMed data for one ethnicity concurrently"""
+    who_tm_response, pubmed_response = await fetcher.fetch_all([
         # WHO Traditional Medicine Database
-        who_tm_url = "https://apps.who.int/iris/rest/search"
-        who_tm_params = {
+        ("https://apps.who.int/iris/rest/search", {'params': {
             'query': f'traditional medicine {region} {ethnicity}',
             'format': 'json'
-        }
-        who_tm_response = requests.get(who_tm_url, params=who_tm_params, timeout=30)
-        if who_tm_response.status_code == 200:
-            cultural_data['traditional_medicine'] = who_tm_response.json()
-        
+        }}),
         # PubMed Cultural Medicine Research
-        pubmed_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-        pubmed_params = {
+        ("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi", {'params': {
             'db': 'pubmed',
             'term': f'cultural medicine {region} {ethnicity}',
             'retmode': 'json',
             'retmax': 100
-        }
-        pubmed_response = requests.get(pubmed_url, params=pubmed_params, timeout=30)
-        if pubmed_response.status_code == 200:
-            cultural_data['research'] = pubmed_response.json()
-        
-        return cultural_data
-        
+        }})
+    ])
+
+    cultural_data = {}
+    for key, response in (('traditional_medicine', who_tm_response), ('research', pubmed_response)):
+        if isinstance(response, Exception):
+            print(f"Error fetching {key} data for {region}/{ethnicity}: {str(response)}")
+        elif response.status_code == 200:
+            try:
+                cultural_data[key] = response.json()
+            except ValueError as e:
+                print(f"Error parsing {key} data for {region}/{ethnicity}: {str(e)}")
+    return cultural_data
+
+def fetch_cultural_health_practices(region, ethnicity):
+    """Fetch cultural health practices and traditional medicine information"""
+    try:
+        return run_fetch(lambda fetcher: _fetch_cultural_health_practices(fetcher, region, ethnicity))
     except Exception as e:
         print(f"Error fetching cultural health practices: {str(e)}")
         return None
@@ -1533,7 +1405,7 @@ def create_region_specific_documents(region_data, cultural_data):
         print(f"Error creating region-specific documents: {str(e)}")
         return []
 
-def update_region_specific_knowledge():
+def update_region_specific_knowledge(run=None):
     """Update the knowledge base with region-specific and cultural medical information"""
     try:
         # Define regions and ethnicities
@@ -1547,28 +1419,33 @@ def update_region_specific_knowledge():
             'American': ['African American', 'Asian American', 'Native American']
         }
         
-        all_documents = []
+        pairs = [(region, ethnicity) for region in regions for ethnicity in ethnicities.get(region, [])]
         
-        for region in regions:
-            # Fetch region-specific data
-            region_data = fetch_region_specific_health_data(region)
+        def fetch_documents():
+            # Fetch every region and ethnicity over one pooled session
+            async def fetch(fetcher):
+                return await asyncio.gather(
+                    asyncio.gather(*(_fetch_region_health_data(fetcher, region) for region in regions)),
+                    asyncio.gather(*(_fetch_cultural_health_practices(fetcher, region, ethnicity)
+                                     for region, ethnicity in pairs))
+                )
             
-            # Fetch cultural data for each ethnicity in the region
-            for ethnicity in ethnicities.get(region, []):
-                cultural_data = fetch_cultural_health_practices(region, ethnicity)
-                
-                # Create documents
-                documents = create_region_specific_documents(region_data, cultural_data)
-                all_documents.extend(documents)
+            region_results, cultural_results = run_fetch(fetch)
+            region_data = dict(zip(regions, region_results))
+            
+            documents = []
+            for (region, ethnicity), cultural_data in zip(pairs, cultural_results):
+                documents.extend(create_region_specific_documents(region_data[region], cultural_data))
+            return documents
+        
+        # A resumed run reuses the documents it already fetched
+        all_documents = run.staged_documents("regional", fetch_documents) if run else fetch_documents()
         
         # Update Pinecone index
         if all_documents:
-            vectorstore = PineconeVectorStore.from_existing_index(
-                index_name="sanocare",
-                embedding=download_hugging_face_embeddings()
-            )
-            vectorstore.add_documents(all_documents)
-            print(f"Successfully added {len(all_documents)} region-specific documents")
+            vectorstore = load_vector_store("sanocare")
+            added, skipped, failed = upsert_documents(vectorstore, all_documents, run=run, source="regional")
+            print(f"Successfully added {added} region-specific documents ({skipped} unchanged)")
         
         return all_documents
         
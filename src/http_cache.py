@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from src.cache_paths import CACHE_DIR
+
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', os.path.join(CACHE_DIR, 'http'))
+# off:    always go to the network
+# cache:  serve entries younger than their TTL, revalidate older ones
+# record: always fetch and store, overwriting earlier recordings
+# replay: serve recorded responses only and never touch the network
+HTTP_CACHE_MODES = ("off", "cache", "record", "replay")
+HTTP_CACHE_MODE = os.getenv('HTTP_CACHE_MODE', 'cache').lower()
+
+DAY = 24 * 60 * 60
+HTTP_CACHE_DEFAULT_TTL = DAY
+# Seconds a response is served without revalidation, by host
+HTTP_CACHE_TTL = {
+    "eutils.ncbi.nlm.nih.gov": DAY,          # PubMed
+    "emergency.cdc.gov": 6 * 60 * 60,        # CDC health alerts
+    "www.cdc.gov": 7 * DAY,
+    "apps.who.int": 7 * DAY,
+    "ghoapi.azureedge.net": DAY,             # WHO GHO indicators
+    "icd.who.int": 30 * DAY,                 # ICD-10
+    "browser.ihtsdotools.org": 30 * DAY,     # SNOMED CT
+    "api.drugbank.com": 7 * DAY
+}
+# JSON object overriding entries of HTTP_CACHE_TTL, e.g. {"eutils.ncbi.nlm.nih.gov": 3600}
+HTTP_CACHE_TTL.update(json.loads(os.getenv('HTTP_CACHE_TTL', '{}')))
+
+# Credentials identify the caller, not the resource, and stay out of the cache key
+IGNORED_PARAMS = {"api_key"}
+# Request headers that change the representation returned and so belong in the key
+KEY_HEADERS = ("accept", "accept-language")
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+def canonical_url(url, params=None):
+    """URL with query string and extra params merged and sorted, credentials removed"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.extend((str(k), str(v)) for k, v in (params or {}).items())
+    query = sorted((k, v) for k, v in query if k not in IGNORED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+def request_key(method, url, params=None, headers=None):
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    payload = [method.upper(), canonical_url(url, params), [[h, headers.get(h)] for h in KEY_HEADERS]]
+    return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+def has_conditional_headers(headers):
+    return any(k.lower() in CONDITIONAL_HEADERS for k in (headers or {}))
+
+class HTTPCache:
+    """On-disk store of external API responses: an SQLite index over content-addressed body blobs"""
+
+    def __init__(self, path=HTTP_CACHE_DIR, mode=HTTP_CACHE_MODE, ttl=None, default_ttl=HTTP_CACHE_DEFAULT_TTL):
+        if mode not in HTTP_CACHE_MODES:
+            raise ValueError(f"Unknown HTTP cache mode {mode!r}; expected one of {', '.join(HTTP_CACHE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.ttl = dict(HTTP_CACHE_TTL if ttl is None else ttl)
+        self.default_ttl = default_ttl
+        self.blob_dir = os.path.join(path, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    method TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    body_sha256 TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def lookup(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, host, status, headers, body_sha256, etag, last_modified, fetched_at "
+                "FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        url, host, status, headers, body_sha256, etag, last_modified, fetched_at = row
+        return {
+            "key": key,
+            "url": url,
+            "host": host,
+            "status": status,
+            "headers": json.loads(headers),
+            "body_sha256": body_sha256,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at
+        }
+
+    def body(self, entry):
+        """Stored body of an entry, or None when its blob has gone missing"""
+        try:
+            with open(self._blob_path(entry["body_sha256"]), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def ttl_for(self, host):
+        return self.ttl.get(host, self.default_ttl)
+
+    def is_fresh(self, entry, now=None):
+        return (now or time.time()) - entry["fetched_at"] < self.ttl_for(entry["host"])
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key, method, url, status, headers, body):
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            # Write then rename so a crash never leaves a truncated blob under its digest
+            tmp_path = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, blob_path)
+        lowered = {k.lower(): v for k, v in headers.items()}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, method, url, host, status, headers, body_sha256, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, method.upper(), url, urlsplit(url).netloc.lower(), status, json.dumps(headers), digest,
+                 lowered.get("etag"), lowered.get("last-modified"), time.time())
+            )
+        self.stored += 1
+
+    def touch(self, key):
+        """Mark an entry fresh again after the server answered 304 Not Modified"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+        self.revalidated += 1
+
+    def prune_blobs(self):
+        """Delete body blobs no longer referenced by any entry"""
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute("SELECT DISTINCT body_sha256 FROM responses")}
+        removed = 0
+        for directory, _, files in os.walk(self.blob_dir):
+            for name in files:
+                if name not in referenced:
+                    os.remove(os.path.join(directory, name))
+                    removed += 1
+        if removed:
+            print(f"Pruned {removed} unreferenced HTTP cache blobs")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries, blobs = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT body_sha256) FROM responses"
+            ).fetchone()
+        return {
+            "mode": self.mode,
+            "entries": entries,
+            "blobs": blobs,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "stored": self.stored
+        }
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache():
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HTTPCache()
+        return _http_cache
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from src.cache_paths import CACHE_DIR, LOOKUP_CHUNK
+
+INGEST_MANIFEST_DIR = os.getenv('INGEST_MANIFEST_DIR', os.path.join(CACHE_DIR, 'manifests'))
+
+def normalize_content(text):
+    """Unicode- and whitespace-normalized chunk text used for hashing"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def document_id(text, source=""):
+    """Deterministic vector id from the normalized content and its source"""
+    digest = hashlib.sha256(f"{source}\x00{normalize_content(text)}".encode("utf-8")).hexdigest()
+    return digest[:32]
+
+class IngestManifest:
+    """Local record of the document ids already written to one index namespace"""
+
+    def __init__(self, index_name="sanocare", namespace="", path=INGEST_MANIFEST_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, f"{index_name}.{namespace or 'default'}.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexed (
+                    id TEXT PRIMARY KEY,
+                    source TEXT,
+                    indexed_at TEXT NOT NULL
+                ) WITHOUT ROWID
+            """)
+            # Serves the expiry scans by source and age
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_indexed_source_age ON indexed (source, indexed_at)")
+            # Chunks dropped as near duplicates of an indexed chunk, so later runs skip them unhashed
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS duplicates (
+                    id TEXT PRIMARY KEY,
+                    duplicate_of TEXT NOT NULL,
+                    source TEXT,
+                    recorded_at TEXT NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_duplicates_of ON duplicates (duplicate_of)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM indexed").fetchone()[0]
+
+    def missing(self, ids):
+        """The subset of ids neither recorded as indexed nor as a near duplicate"""
+        ids = list(dict.fromkeys(ids))
+        present = set()
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                for table in ("indexed", "duplicates"):
+                    present.update(row[0] for row in self._conn.execute(
+                        f"SELECT id FROM {table} WHERE id IN ({placeholders})", chunk
+                    ))
+        return [id_ for id_ in ids if id_ not in present]
+
+    def mark_indexed(self, ids, sources=None, indexed_at=None):
+        sources = sources or [None] * len(ids)
+        indexed_at = indexed_at or [datetime.now().isoformat()] * len(ids)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO indexed (id, source, indexed_at) VALUES (?, ?, ?)",
+                list(zip(ids, sources, indexed_at))
+            )
+
+    def mark_duplicates(self, pairs, source=None):
+        """Record (id, duplicate_of) pairs of chunks dropped as near duplicates"""
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO duplicates (id, duplicate_of, source, recorded_at) VALUES (?, ?, ?, ?)",
+                [(id_, duplicate_of, source, now) for id_, duplicate_of in pairs]
+            )
+
+    def remove_duplicates_of(self, ids):
+        """Forget near duplicates of chunks that are gone, so their copies can be indexed again"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM duplicates WHERE duplicate_of = ?", [(id_,) for id_ in ids])
+
+    def duplicate_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM duplicates").fetchone()[0]
+
+    def records(self, ids):
+        """{id: (source, indexed_at)} for the recorded ids among `ids`"""
+        ids = list(ids)
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                for id_, source, indexed_at in self._conn.execute(
+                    f"SELECT id, source, indexed_at FROM indexed WHERE id IN ({placeholders})", chunk
+                ):
+                    found[id_] = (source, indexed_at)
+        return found
+
+    def indexed_since(self, since):
+        """Ids recorded at or after an ISO timestamp"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT id FROM indexed WHERE indexed_at >= ? ORDER BY indexed_at", (since,)
+            )]
+
+    def source_counts(self):
+        """{source: (count, oldest indexed_at)} over every recorded id"""
+        with self._lock:
+            return {source: (count, oldest) for source, count, oldest in self._conn.execute(
+                "SELECT source, COUNT(*), MIN(indexed_at) FROM indexed GROUP BY source"
+            )}
+
+    def count_indexed_before(self, source, cutoff):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM indexed WHERE source IS ? AND indexed_at < ?", (source, cutoff)
+            ).fetchone()[0]
+
+    def indexed_before(self, source, cutoff, limit=1000):
+        """Up to limit ids of one source indexed before an ISO timestamp, oldest first"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT id FROM indexed WHERE source IS ? AND indexed_at < ? ORDER BY indexed_at LIMIT ?",
+                (source, cutoff, limit)
+            )]
+
+    def remove(self, ids):
+        rows = [(id_,) for id_ in ids]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM indexed WHERE id = ?", rows)
+            self._conn.executemany("DELETE FROM duplicates WHERE duplicate_of = ?", rows)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM indexed")
+            self._conn.execute("DELETE FROM duplicates")
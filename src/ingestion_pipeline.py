@@ -0,0 +1,246 @@
+import gc
+import os
+import queue
+import threading
+import time
+from src.memory_usage import current_rss_mb
+from src.ingest_manifest import document_id
+
+# Chunks per embedding call
+PIPELINE_EMBED_BATCH = int(os.getenv('PIPELINE_EMBED_BATCH', '64'))
+# Vectors per vector store write
+PIPELINE_UPSERT_BATCH = int(os.getenv('PIPELINE_UPSERT_BATCH', '100'))
+# Micro-batches buffered between two stages
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '4'))
+# Resident memory above which the loader stops reading ahead; 0 disables the ceiling
+PIPELINE_MEMORY_CEILING_MB = float(os.getenv('PIPELINE_MEMORY_CEILING_MB', '0'))
+
+_DONE = object()
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+class StageStats:
+    """Items, batches and busy/waiting time of one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else None
+        }
+
+class IngestionPipeline:
+    """Load, embed and upsert stages in their own threads, joined by bounded queues
+
+    Sources are (name, iterable of Documents) pairs and are read lazily, so only
+    the batches held in the queues are in memory at once. `keep` filters ids
+    before they are embedded (for example against the ingest manifest), `dedup`
+    drops near duplicates of kept chunks, `write` stores one batch and
+    `on_commit` runs after each successful write.
+    """
+
+    def __init__(self, embed, write, keep=None, dedup=None, on_commit=None, embed_batch=PIPELINE_EMBED_BATCH,
+                 upsert_batch=PIPELINE_UPSERT_BATCH, queue_size=PIPELINE_QUEUE_SIZE,
+                 memory_ceiling_mb=PIPELINE_MEMORY_CEILING_MB):
+        self.embed = embed
+        self.write = write
+        self.keep = keep
+        self.dedup = dedup
+        self.on_commit = on_commit
+        self.embed_batch = embed_batch
+        self.upsert_batch = upsert_batch
+        self.queue_size = queue_size
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.stats = {name: StageStats(name) for name in ("load", "embed", "upsert")}
+        self.skipped = 0
+        self.near_duplicates = 0
+        self.failed = 0
+        self.throttled_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, q, item, stats):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stats.wait_seconds += time.perf_counter() - start
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def _get(self, q, stats):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                stats.wait_seconds += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                continue
+        raise PipelineStopped()
+
+    def _wait_for_memory(self, downstream):
+        """Hold the loader while resident memory is above the ceiling and work is still queued"""
+        rss = current_rss_mb()
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        if not self.memory_ceiling_mb or rss <= self.memory_ceiling_mb:
+            return
+        start = time.perf_counter()
+        while rss > self.memory_ceiling_mb and not downstream.empty() and not self._stop.is_set():
+            time.sleep(0.05)
+            gc.collect()
+            rss = current_rss_mb()
+        self.throttled_seconds += time.perf_counter() - start
+
+    def _run_stage(self, name, target, *args):
+        try:
+            target(*args)
+        except PipelineStopped:
+            pass
+        except Exception as e:
+            print(f"Error in {name} stage: {str(e)}")
+            self._errors.append(e)
+            self._stop.set()
+
+    def _load(self, sources, out):
+        stats = self.stats["load"]
+        for source, documents in sources:
+            batch = []
+            start = time.perf_counter()
+            for doc in documents:
+                batch.append((document_id(doc.page_content, doc.metadata.get("source", "")), doc))
+                if len(batch) >= self.embed_batch:
+                    self._emit(source, batch, out, stats, start)
+                    batch = []
+                    start = time.perf_counter()
+            if batch:
+                self._emit(source, batch, out, stats, start)
+        self._put(out, _DONE, stats)
+
+    def _emit(self, source, batch, out, stats, start):
+        # Collapse repeats within the batch, then drop ids that are already indexed
+        unique = dict(batch)
+        ids = self.keep(list(unique)) if self.keep else list(unique)
+        self.skipped += len(batch) - len(ids)
+        if self.dedup is not None and ids:
+            kept = self.dedup.filter(source, ids, [unique[id_] for id_ in ids])
+            self.near_duplicates += len(ids) - len(kept)
+            ids = kept
+        stats.busy_seconds += time.perf_counter() - start
+        stats.items += len(batch)
+        if ids:
+            self._wait_for_memory(out)
+            stats.batches += 1
+            self._put(out, (source, ids, [unique[id_] for id_ in ids]), stats)
+
+    def _embed(self, inbox, out):
+        stats = self.stats["embed"]
+        while True:
+            item = self._get(inbox, stats)
+            if item is _DONE:
+                self._put(out, _DONE, stats)
+                return
+            source, ids, docs = item
+            start = time.perf_counter()
+            vectors = self.embed([doc.page_content for doc in docs])
+            stats.busy_seconds += time.perf_counter() - start
+            stats.items += len(ids)
+            stats.batches += 1
+            self._put(out, (source, ids, docs, vectors), stats)
+
+    def _upsert(self, inbox):
+        stats = self.stats["upsert"]
+        pending = []
+        pending_source = None
+        while True:
+            item = self._get(inbox, stats)
+            if item is _DONE:
+                self._flush(pending_source, pending)
+                return
+            source, ids, docs, vectors = item
+            # Batches never mix sources so each checkpoint belongs to one source
+            if pending and source != pending_source:
+                self._flush(pending_source, pending)
+                pending = []
+            pending_source = source
+            pending.extend(zip(ids, docs, vectors))
+            while len(pending) >= self.upsert_batch:
+                self._flush(source, pending[:self.upsert_batch])
+                pending = pending[self.upsert_batch:]
+
+    def _flush(self, source, rows):
+        if not rows:
+            return
+        stats = self.stats["upsert"]
+        ids = [row[0] for row in rows]
+        docs = [row[1] for row in rows]
+        start = time.perf_counter()
+        try:
+            self.write(ids, docs, [row[2] for row in rows])
+            if self.on_commit:
+                self.on_commit(source, ids, docs)
+            stats.items += len(ids)
+            stats.batches += 1
+            print(f"Upserted {source} batch of {len(ids)} ({stats.items} total)")
+        except Exception as e:
+            print(f"Error adding batch to vector store: {str(e)}")
+            self.failed += len(ids)
+            if self.dedup is not None:
+                # Uncommitted chunks must not shadow their near duplicates later in the run
+                self.dedup.discard(ids)
+        stats.busy_seconds += time.perf_counter() - start
+
+    def run(self, sources):
+        """Drain every source through the stages; returns (added, skipped, failed)"""
+        to_embed = queue.Queue(maxsize=self.queue_size)
+        to_upsert = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._run_stage, args=("load", self._load, sources, to_embed),
+                             name="ingest-load", daemon=True),
+            threading.Thread(target=self._run_stage, args=("embed", self._embed, to_embed, to_upsert),
+                             name="ingest-embed", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        self._run_stage("upsert", self._upsert, to_upsert)
+        self._stop.set()
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+        return self.stats["upsert"].items, self.skipped, self.failed
+
+    def summary(self):
+        return {
+            "stages": {name: stats.as_dict() for name, stats in self.stats.items()},
+            "skipped": self.skipped,
+            "near_duplicates": self.near_duplicates,
+            "failed": self.failed,
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "memory_ceiling_mb": self.memory_ceiling_mb or None
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        print("\n=== Ingestion Pipeline ===")
+        for name, stats in summary["stages"].items():
+            print(f"{name:<7} {stats['items']:>7} items  {stats['batches']:>5} batches  "
+                  f"busy {stats['busy_seconds']:.2f}s  waiting {stats['wait_seconds']:.2f}s  "
+                  f"{stats['items_per_second'] or 0} items/s")
+        print(f"Skipped {summary['skipped']}, near duplicates {summary['near_duplicates']}, "
+              f"failed {summary['failed']}, peak RSS {summary['peak_rss_mb']} MB"
+              f"{', throttled ' + str(summary['throttled_seconds']) + 's' if summary['throttled_seconds'] else ''}")
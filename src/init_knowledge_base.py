@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
@@ -6,7 +7,10 @@ from helper import (
     fetch_realtime_medical_data,
     create_medical_knowledge_documents,
     update_knowledge_base,
-    update_region_specific_knowledge
+    update_region_specific_knowledge,
+    get_embedding_registry,
+    RunManifest,
+    VECTOR_STORE_BACKEND
 )
 from pinecone import Pinecone
 
@@ -16,36 +20,53 @@ sys.path.append(project_root)
 
 def main():
     """Initialize the medical knowledge base"""
+    parser = argparse.ArgumentParser(description="Initialize the medical knowledge base")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last unfinished run from its last committed batch")
+    args = parser.parse_args()
+    run = None
     try:
         print("Starting knowledge base initialization...")
         
         # Load environment variables
         load_dotenv()
         
-        # Initialize Pinecone client
-        pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+        if VECTOR_STORE_BACKEND == 'pinecone':
+            # Initialize Pinecone client
+            pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+            
+            # Get existing index
+            index = pc.Index("sanocare")
+            print("Connected to existing Pinecone index: sanocare")
+        else:
+            print(f"Using {VECTOR_STORE_BACKEND} vector store for index: sanocare")
         
-        # Get existing index
-        index = pc.Index("sanocare")
-        print("Connected to existing Pinecone index: sanocare")
+        # One run manifest checkpoints every source so --resume can pick up where a failure stopped
+        run = RunManifest(*get_embedding_registry().active_target("sanocare")).start(args.resume)
         
         # Update knowledge base
         print("\nUpdating medical knowledge base...")
-        vectorstore = update_knowledge_base()
+        vectorstore = update_knowledge_base(run=run)
         
         if vectorstore:
             print("\nUpdating region-specific knowledge...")
-            region_docs = update_region_specific_knowledge()
+            region_docs = update_region_specific_knowledge(run=run)
             
             if region_docs:
                 print(f"Successfully added {len(region_docs)} region-specific documents")
             else:
                 print("No region-specific documents were added")
+            run.finish()
         else:
             print("Failed to update knowledge base")
+            run.finish("failed")
+        run.print_summary()
             
     except Exception as e:
         print(f"Error initializing knowledge base: {str(e)}")
+        if run is not None:
+            run.finish("failed")
+            run.print_summary()
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,8 +1,6 @@
 import os
 from dotenv import load_dotenv
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings
-from helper import create_medical_knowledge_documents, update_pinecone_index
+from helper import remove_static_knowledge_vectors, load_vector_store, download_hugging_face_embeddings
 
 def init_pinecone_index():
     """Initialize Pinecone index with medical knowledge"""
@@ -10,28 +8,22 @@ def init_pinecone_index():
         # Load environment variables
         load_dotenv()
         
-        # Initialize embeddings
-        embeddings = OpenAIEmbeddings()
+        # Initialize embeddings; must match the model registered for the index
+        embeddings = download_hugging_face_embeddings()
         
-        # Initialize Pinecone
+        # Initialize the configured vector store (Pinecone or local)
         index_name = "sanocare"
-        docsearch = PineconeVectorStore.from_existing_index(
-            index_name=index_name,
-            embedding=embeddings
-        )
+        docsearch = load_vector_store(index_name, embeddings)
         
-        # Create medical knowledge documents
-        print("Creating medical knowledge documents...")
-        documents = create_medical_knowledge_documents()
-        
-        # Update Pinecone index
-        print(f"Updating Pinecone index with {len(documents)} documents...")
-        success = update_pinecone_index(docsearch, documents)
+        # Regional and age-group knowledge is now served from src/static_knowledge.py,
+        # so only vectors left over from earlier runs need removing
+        print("Removing templated medical knowledge vectors...")
+        success = remove_static_knowledge_vectors(docsearch)
         
         if success:
-            print("Successfully initialized Pinecone index with medical knowledge")
+            print("Pinecone index no longer stores templated medical knowledge")
         else:
-            print("Failed to initialize Pinecone index")
+            print("Failed to clean up Pinecone index")
             
     except Exception as e:
         print(f"Error initializing Pinecone index: {str(e)}")
@@ -0,0 +1,616 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from types import SimpleNamespace
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from src.cache_paths import CACHE_DIR
+
+LOCAL_VECTOR_STORE_DIR = os.getenv('LOCAL_VECTOR_STORE_DIR', os.path.join(CACHE_DIR, 'vectorstore'))
+DEFAULT_NAMESPACE = "_default"
+
+# Below this many rows an exact scan is faster than probing an IVF index
+IVF_MIN_TRAIN_ROWS = 4096
+# Retrain the coarse quantizer once the index has grown this much since training
+IVF_RETRAIN_GROWTH = 4.0
+# Inverted lists scanned per query
+IVF_NPROBE = 8
+
+# Resident vector format: none (float32), int8 (scalar quantized) or binary (sign bits)
+LOCAL_VECTOR_QUANTIZATION = os.getenv('LOCAL_VECTOR_QUANTIZATION', 'none')
+QUANTIZATION_MODES = ("none", "int8", "binary")
+# Candidates rescored with full-precision vectors per requested result
+RESCORE_FACTORS = {"int8": 4, "binary": 16}
+# Rows scored per block so quantized scans never materialize a full float32 copy
+SCORE_BLOCK_ROWS = 65536
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def matches_filter(metadata, filter):
+    """Evaluate a Pinecone-style metadata filter against one document's metadata"""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+            if operator == "$exists" and (key in metadata) != bool(operand):
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                try:
+                    if operator == "$gt" and not value > operand:
+                        return False
+                    if operator == "$gte" and not value >= operand:
+                        return False
+                    if operator == "$lt" and not value < operand:
+                        return False
+                    if operator == "$lte" and not value <= operand:
+                        return False
+                except TypeError:
+                    return False
+    return True
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+def _int8_scales(vectors):
+    """Per-dimension scales mapping the observed value range onto [-127, 127]"""
+    max_abs = np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+    return (127.0 / np.clip(max_abs, 1e-3, None)).astype(np.float32)
+
+def quantize(vectors, mode, scales=None):
+    """Encode normalized float32 vectors as int8 codes or packed sign bits"""
+    if mode == "int8":
+        return np.clip(np.rint(vectors * scales), -127, 127).astype(np.int8)
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+def quantized_scores(codes, query, mode, scales=None):
+    """Approximate similarity of every code to a normalized query, scanned in blocks"""
+    scores = np.empty(len(codes), dtype=np.float32)
+    if mode == "int8":
+        scaled_query = (query / scales).astype(np.float32)
+    else:
+        query_bits = np.packbits(query > 0)
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS]
+        if mode == "int8":
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        else:
+            # Fewer differing sign bits means a smaller angle
+            scores[start:start + len(block)] = -_POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1, dtype=np.int32)
+    return scores
+
+def _train_centroids(sample, nlist, iterations=10, seed=0):
+    """Spherical k-means over a sample of normalized vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(nlist):
+            members = sample[assignments == list_id]
+            if len(members):
+                centroids[list_id] = members.mean(axis=0)
+            else:
+                centroids[list_id] = sample[rng.integers(len(sample))]
+        centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+class LocalVectorStore(VectorStore):
+    """On-disk vector store with an IVF index over memory-mapped float32 vectors
+
+    Vectors live in an append-only file that is memory-mapped for search, and
+    texts and metadata live in a SQLite side-table. Search is exact for small
+    collections and probes the nearest inverted lists once the index is large.
+    Scores are cosine similarities, matching the Pinecone index.
+    """
+
+    def __init__(self, embedding, index_name="sanocare", namespace=None, path=LOCAL_VECTOR_STORE_DIR,
+                 nprobe=IVF_NPROBE, quantization=LOCAL_VECTOR_QUANTIZATION):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        self._embedding = embedding
+        self.quantization = quantization
+        self.index_name = index_name
+        self.namespace = namespace or DEFAULT_NAMESPACE
+        self.nprobe = nprobe
+        self.directory = os.path.join(path, index_name, self.namespace)
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "meta.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_documents_id ON documents (id);
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._ivf_path = os.path.join(self.directory, "ivf.npz")
+        self._codes_path = os.path.join(self.directory, f"codes.{quantization}")
+        self._quantizer_path = os.path.join(self.directory, f"quantizer.{quantization}.npz")
+        self._load()
+
+    # ------------------------------------------------------------------ state
+
+    def _load(self):
+        settings = dict(self._conn.execute("SELECT key, value FROM settings"))
+        self.dimension = int(settings["dimension"]) if "dimension" in settings else None
+
+        rows = self._conn.execute("SELECT row, id, metadata, deleted FROM documents ORDER BY row").fetchall()
+        self._ids = [row[1] for row in rows]
+        self._metadatas = [json.loads(row[2]) for row in rows]
+        self._deleted = np.asarray([bool(row[3]) for row in rows], dtype=bool)
+        self._row_by_id = {row[1]: row[0] for row in rows if not row[3]}
+        self._count = len(rows)
+        self._filter_masks = {}
+
+        self._vectors = None
+        if self.dimension and self._count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self._count, self.dimension))
+
+        self._centroids = None
+        self._assignments = None
+        self._trained_rows = 0
+        self._lists = None
+        if os.path.exists(self._ivf_path):
+            ivf = np.load(self._ivf_path)
+            self._centroids = ivf["centroids"]
+            self._assignments = ivf["assignments"]
+            self._trained_rows = int(ivf["trained_rows"])
+
+        self._codes = None
+        self._scales = None
+        self._quantized_rows = 0
+        if self.quantization != "none" and self._count:
+            self._load_codes()
+
+    def _load_codes(self):
+        """Load resident codes, re-encoding from the float32 file if they are missing or stale"""
+        code_width = self.dimension if self.quantization == "int8" else (self.dimension + 7) // 8
+        code_dtype = np.int8 if self.quantization == "int8" else np.uint8
+        if os.path.exists(self._quantizer_path) and os.path.exists(self._codes_path):
+            quantizer = np.load(self._quantizer_path)
+            codes = np.fromfile(self._codes_path, dtype=code_dtype)
+            if len(codes) == self._count * code_width:
+                self._codes = codes.reshape(self._count, code_width)
+                self._scales = quantizer["scales"] if self.quantization == "int8" else None
+                self._quantized_rows = int(quantizer["trained_rows"])
+                return
+        self._train_quantizer()
+
+    def _train_quantizer(self):
+        """Fit int8 scales on the stored vectors and re-encode every row"""
+        print(f"Encoding {self._count} vectors as {self.quantization} codes...")
+        if self.quantization == "int8":
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(self._count, size=min(self._count, 100_000), replace=False))
+            self._scales = _int8_scales(np.asarray(self._vectors[sample]))
+        blocks = [
+            quantize(np.asarray(self._vectors[start:start + SCORE_BLOCK_ROWS]), self.quantization, self._scales)
+            for start in range(0, self._count, SCORE_BLOCK_ROWS)
+        ]
+        self._codes = np.concatenate(blocks)
+        self._codes.tofile(self._codes_path)
+        self._quantized_rows = self._count
+        np.savez(self._quantizer_path, scales=self._scales if self._scales is not None else np.zeros(0),
+                 trained_rows=np.asarray(self._quantized_rows))
+
+    def _append_codes(self, vectors):
+        if self.quantization == "none":
+            return
+        if self._codes is None or self._count >= self._quantized_rows * IVF_RETRAIN_GROWTH:
+            # Scales fitted on a small collection are refitted as it grows
+            self._train_quantizer()
+            return
+        codes = quantize(vectors, self.quantization, self._scales)
+        with open(self._codes_path, "ab") as codes_file:
+            codes_file.write(codes.tobytes())
+        self._codes = np.concatenate([self._codes, codes])
+
+    def _set_setting(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _remap_vectors(self):
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                  shape=(self._count, self.dimension)) if self._count else None
+
+    def _invalidate(self):
+        self._filter_masks = {}
+        self._lists = None
+
+    # ------------------------------------------------------------------ IVF
+
+    def _maybe_train_ivf(self):
+        alive = self._count - int(self._deleted.sum())
+        if alive < IVF_MIN_TRAIN_ROWS:
+            return
+        if self._centroids is not None and self._count < self._trained_rows * IVF_RETRAIN_GROWTH:
+            return
+        nlist = int(np.clip(np.sqrt(alive), 16, 4096))
+        rng = np.random.default_rng(0)
+        live_rows = np.flatnonzero(~self._deleted)
+        sample_rows = np.sort(rng.choice(live_rows, size=min(len(live_rows), nlist * 64), replace=False))
+        print(f"Training IVF index with {nlist} lists on {len(sample_rows)} vectors...")
+        self._centroids = _train_centroids(np.asarray(self._vectors[sample_rows]), nlist)
+        self._assignments = self._assign(0, self._count)
+        self._trained_rows = self._count
+        self._save_ivf()
+
+    def _assign(self, start, stop, chunk_size=65536):
+        assignments = np.empty(stop - start, dtype=np.int32)
+        for offset in range(start, stop, chunk_size):
+            end = min(offset + chunk_size, stop)
+            block = np.asarray(self._vectors[offset:end])
+            assignments[offset - start:end - start] = np.argmax(block @ self._centroids.T, axis=1)
+        return assignments
+
+    def _save_ivf(self):
+        np.savez(self._ivf_path, centroids=self._centroids, assignments=self._assignments,
+                 trained_rows=np.asarray(self._trained_rows))
+        self._lists = None
+
+    def _inverted_lists(self):
+        """Rows grouped by list, built lazily from the assignment array"""
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind="stable")
+            bounds = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = (order, bounds)
+        return self._lists
+
+    # ------------------------------------------------------------------ writes
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """Upsert precomputed vectors; existing ids are replaced"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._set_setting("dimension", self.dimension)
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+            # Upserts tombstone the previous row for the same id
+            replaced = [self._row_by_id[id_] for id_ in ids if id_ in self._row_by_id]
+            if replaced:
+                self._conn.executemany("UPDATE documents SET deleted = 1 WHERE row = ?", [(r,) for r in replaced])
+                self._deleted[replaced] = True
+
+            start = self._count
+            with open(self._vectors_path, "ab") as vector_file:
+                vector_file.write(vectors.tobytes())
+            self._conn.executemany(
+                "INSERT INTO documents (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, id_, text, json.dumps(metadata))
+                 for i, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas))]
+            )
+            self._conn.commit()
+
+            self._ids.extend(ids)
+            self._metadatas.extend(dict(metadata) for metadata in metadatas)
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(texts), dtype=bool)])
+            for i, id_ in enumerate(ids):
+                self._row_by_id[id_] = start + i
+            self._count += len(texts)
+            self._remap_vectors()
+            self._append_codes(vectors)
+            self._invalidate()
+
+            if self._centroids is not None:
+                self._assignments = np.concatenate([self._assignments, self._assign(start, self._count)])
+                self._save_ivf()
+            self._maybe_train_ivf()
+        return ids
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids=None, filter=None, **kwargs):
+        """Delete by ids, or every live row matching a metadata filter"""
+        if not ids and not filter:
+            return False
+        with self._lock:
+            if filter:
+                matched = np.flatnonzero(self._filter_mask(filter) & ~self._deleted)
+                ids = [self._ids[row] for row in matched]
+            rows = [self._row_by_id.pop(id_) for id_ in ids if id_ in self._row_by_id]
+            if rows:
+                self._conn.executemany("UPDATE documents SET deleted = 1 WHERE row = ?", [(r,) for r in rows])
+                self._conn.commit()
+                self._deleted[rows] = True
+                self._invalidate()
+        return True
+
+    # ------------------------------------------------------------------ reads
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def _filter_mask(self, filter):
+        """Boolean mask of rows matching a filter, cached until the next write"""
+        key = json.dumps(filter, sort_keys=True, default=str)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(m, filter) for m in self._metadatas), dtype=bool, count=self._count)
+            self._filter_masks[key] = mask
+        return mask
+
+    def _candidate_rows(self, query):
+        """Rows in the inverted lists nearest to the query, or None for an exact scan"""
+        if self._centroids is None:
+            return None
+        order, bounds = self._inverted_lists()
+        nprobe = min(self.nprobe, len(self._centroids))
+        nearest = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([order[bounds[i]:bounds[i + 1]] for i in nearest])
+
+    def _score_rows(self, query, rows=None):
+        """Scores against the query for the given sorted rows, or for every row
+
+        Cosine similarity for float32 storage; an approximation from the resident
+        codes when quantized, which _search then rescores at full precision.
+        """
+        if self.quantization != "none":
+            codes = self._codes if rows is None else self._codes[rows]
+            return quantized_scores(codes, query, self.quantization, self._scales)
+        vectors = self._vectors if rows is None else self._vectors[rows]
+        return np.asarray(vectors @ query)
+
+    def _rescore(self, query, rows, scores, k):
+        """Re-rank the best quantized candidates with the float32 vectors on disk"""
+        candidates = min(len(scores), k * RESCORE_FACTORS[self.quantization])
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.isfinite(scores[top])]
+        candidate_rows = np.sort(rows[top])
+        return candidate_rows, np.asarray(self._vectors[candidate_rows] @ query)
+
+    def _search(self, query, k, filter=None):
+        with self._lock:
+            if not self._count:
+                return []
+            query = np.asarray(query, dtype=np.float32)
+            query = query / max(np.linalg.norm(query), 1e-12)
+            mask = ~self._deleted
+            if filter:
+                mask = mask & self._filter_mask(filter)
+
+            rows = self._candidate_rows(query)
+            if rows is not None:
+                rows = rows[mask[rows]]
+                if len(rows) < k:
+                    rows = None  # Too selective for the probed lists, fall back to an exact scan
+
+            if rows is None:
+                scores = np.where(mask, self._score_rows(query), -np.inf)
+                rows = np.arange(self._count)
+            else:
+                rows = np.sort(rows)
+                scores = self._score_rows(query, rows)
+
+            k = min(k, int(np.isfinite(scores).sum()))
+            if k <= 0:
+                return []
+            if self.quantization != "none":
+                rows, scores = self._rescore(query, rows, scores, k)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def _documents(self, scored_rows):
+        if not scored_rows:
+            return []
+        placeholders = ", ".join("?" * len(scored_rows))
+        texts = dict(self._conn.execute(
+            f"SELECT row, text FROM documents WHERE row IN ({placeholders})",
+            [row for row, _ in scored_rows]
+        ))
+        return [
+            (Document(id=self._ids[row], page_content=texts[row], metadata=dict(self._metadatas[row])), score)
+            for row, score in scored_rows
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, **kwargs):
+        return self._documents(self._search(embedding, k, filter))
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def iter_documents(self, batch_size=500):
+        """Yield every live document in batches, in insertion order"""
+        last_row = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row, id, text, metadata FROM documents WHERE deleted = 0 AND row > ? "
+                    "ORDER BY row LIMIT ?", (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_row = rows[-1][0]
+            yield [Document(id=id_, page_content=text, metadata=json.loads(metadata))
+                   for _, id_, text, metadata in rows]
+
+    def get_by_ids(self, ids):
+        with self._lock:
+            scored_rows = [(self._row_by_id[id_], 0.0) for id_ in ids if id_ in self._row_by_id]
+            return [doc for doc, _ in self._documents(scored_rows)]
+
+    def describe_index_stats(self):
+        """Index statistics shaped like Pinecone's describe_index_stats response"""
+        with self._lock:
+            live = self._count - int(self._deleted.sum())
+            float_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            return SimpleNamespace(
+                total_vector_count=live,
+                dimension=self.dimension,
+                namespaces={self.namespace: SimpleNamespace(vector_count=live)},
+                index_bytes=self._codes.nbytes if self._codes is not None else float_bytes,
+                float_bytes=float_bytes,
+                quantization=self.quantization
+            )
+
+    # ------------------------------------------------------------------ constructors
+
+    @classmethod
+    def from_existing_index(cls, index_name, embedding, namespace=None, **kwargs):
+        return cls(embedding, index_name=index_name, namespace=namespace, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, index_name="sanocare",
+                   namespace=None, **kwargs):
+        store = cls(embedding, index_name=index_name, namespace=namespace, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+def _blockwise_top_k(score_block, count, query_count, k, deleted, block_rows=4096):
+    """Top-k rows per query, best first, from a function scoring row blocks against all queries"""
+    best_rows = np.empty((query_count, 0), dtype=np.int64)
+    best_scores = np.empty((query_count, 0), dtype=np.float32)
+    for start in range(0, count, block_rows):
+        stop = min(start + block_rows, count)
+        scores = score_block(start, stop).T.astype(np.float32)
+        scores[:, deleted[start:stop]] = -np.inf
+        rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_rows = np.concatenate([best_rows, rows], axis=1)
+        keep = min(k, merged_scores.shape[1])
+        top = np.argpartition(-merged_scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_rows = np.take_along_axis(merged_rows, top, axis=1)
+    # argpartition leaves the kept rows unordered; callers slice the best of them
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1)
+
+def quantization_report(store, sample_queries=200, k=10, modes=("int8", "binary")):
+    """Memory use and recall@k of each quantized format against exact float32 search"""
+    import time
+
+    with store._lock:
+        count, dimension = store._count, store.dimension
+        live = np.flatnonzero(~store._deleted)
+        if not len(live):
+            return {}
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=min(sample_queries, len(live)), replace=False))
+        # Stored vectors with a little noise stand in for queries near the corpus
+        queries = _normalize_rows(np.asarray(store._vectors[sample])
+                                  + rng.normal(scale=0.05, size=(len(sample), dimension)).astype(np.float32))
+        vectors, deleted = store._vectors, store._deleted.copy()
+
+        start = time.perf_counter()
+        exact = _blockwise_top_k(lambda a, b: np.asarray(vectors[a:b]) @ queries.T,
+                                 count, len(queries), k, deleted)
+        report = {
+            "vectors": int(len(live)),
+            "dimension": dimension,
+            "k": k,
+            "queries": len(queries),
+            "float32": {
+                "bytes": count * dimension * 4,
+                "scan_ms_per_query": round((time.perf_counter() - start) * 1000 / len(queries), 3)
+            }
+        }
+
+        for mode in modes:
+            scales = _int8_scales(np.asarray(vectors[sample])) if mode == "int8" else None
+            codes = np.concatenate([
+                quantize(np.asarray(vectors[a:a + SCORE_BLOCK_ROWS]), mode, scales)
+                for a in range(0, count, SCORE_BLOCK_ROWS)
+            ])
+            if mode == "int8":
+                scaled_queries = (queries / scales).astype(np.float32)
+                score_block = lambda a, b: codes[a:b].astype(np.float32) @ scaled_queries.T
+            else:
+                query_bits = np.packbits(queries > 0, axis=1)
+                score_block = lambda a, b: -_POPCOUNT[
+                    np.bitwise_xor(codes[a:b, None, :], query_bits[None, :, :])
+                ].sum(axis=2, dtype=np.int32)
+
+            start = time.perf_counter()
+            candidates = _blockwise_top_k(score_block, count, len(queries), k * RESCORE_FACTORS[mode], deleted)
+            scan_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            raw_recall = []
+            rescored_recall = []
+            for query, query_candidates, truth in zip(queries, candidates, exact):
+                truth = set(truth.tolist())
+                raw_recall.append(len(truth & set(query_candidates[:k].tolist())) / len(truth))
+                rows = np.sort(query_candidates)
+                rescored = rows[np.argsort(-(np.asarray(vectors[rows]) @ query))[:k]]
+                rescored_recall.append(len(truth & set(rescored.tolist())) / len(truth))
+
+            report[mode] = {
+                "bytes": int(codes.nbytes),
+                "memory_ratio": round(codes.nbytes / (count * dimension * 4), 4),
+                "vectors_per_gb": int(2 ** 30 / codes[0].nbytes),
+                "recall_at_k_without_rescoring": round(float(np.mean(raw_recall)), 4),
+                "recall_at_k": round(float(np.mean(rescored_recall)), 4),
+                "rescore_candidates": k * RESCORE_FACTORS[mode],
+                "scan_ms_per_query": round(scan_ms, 3)
+            }
+        report["float32"]["vectors_per_gb"] = int(2 ** 30 / (dimension * 4))
+    return report
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare quantized vector formats against float32 search")
+    parser.add_argument("--index", default="sanocare")
+    parser.add_argument("--namespace")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    # Only stored vectors are used, so no embedding model is needed
+    store = LocalVectorStore(None, index_name=args.index, namespace=args.namespace, quantization="none")
+    print(json.dumps(quantization_report(store, sample_queries=args.queries, k=args.k), indent=2))
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+import numpy as np
+from src.cache_paths import CACHE_DIR, LOOKUP_CHUNK
+
+NEAR_DEDUP_DIR = os.getenv('NEAR_DEDUP_DIR', os.path.join(CACHE_DIR, 'near_dedup'))
+NEAR_DEDUP_ENABLED = os.getenv('NEAR_DEDUP_ENABLED', 'true').lower() == 'true'
+# Estimated Jaccard similarity of word shingles above which a chunk is a near duplicate
+NEAR_DEDUP_THRESHOLD = float(os.getenv('NEAR_DEDUP_THRESHOLD', '0.85'))
+NUM_PERM = 128
+# 16 bands of 8 rows put the LSH candidate threshold near (1/16)^(1/8) = 0.71
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.RandomState(1)
+# Fixed seed so signatures stay comparable with the persisted index
+_PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(text):
+    """NUM_PERM 32-bit MinHash values over the word shingles of a text"""
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+         for s in shingles(text)] or [0],
+        dtype=np.uint64
+    )
+    # Universal hashing (a * x + b) mod p, one row per permutation; uint64 overflow is intended
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+def band_keys(signature, bands=LSH_BANDS):
+    """One signed 64-bit bucket key per band"""
+    rows = len(signature) // bands
+    return [
+        int.from_bytes(hashlib.blake2b(signature[i * rows:(i + 1) * rows].tobytes(), digest_size=8).digest(),
+                       "little", signed=True)
+        for i in range(bands)
+    ]
+
+def estimated_similarity(a, b):
+    return float(np.mean(a == b))
+
+class NearDuplicateIndex:
+    """Persisted MinHash-LSH index over the chunks already written to one index namespace"""
+
+    def __init__(self, index_name="sanocare", namespace="", path=NEAR_DEDUP_DIR, threshold=NEAR_DEDUP_THRESHOLD,
+                 manifest=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, f"{index_name}.{namespace or 'default'}.sqlite")
+        self.threshold = threshold
+        # Ingest manifest that remembers dropped ids, so later runs skip them before hashing
+        self.manifest = manifest
+        # Signatures accepted in this run but not yet committed
+        self._pending = {}
+        self._pending_buckets = defaultdict(set)
+        self._seen = defaultdict(int)
+        self._dropped = defaultdict(int)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS signatures (
+                    id TEXT PRIMARY KEY,
+                    source TEXT,
+                    signature BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    id TEXT NOT NULL,
+                    PRIMARY KEY (band, bucket, id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS ix_buckets_id ON buckets (id);
+            """)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def _candidates(self, keys):
+        with self._lock:
+            persisted = {row[0] for row in self._conn.execute(
+                "SELECT DISTINCT id FROM buckets WHERE " + " OR ".join(["(band = ? AND bucket = ?)"] * len(keys)),
+                [value for band, key in enumerate(keys) for value in (band, key)]
+            )}
+            pending = set().union(*(self._pending_buckets[(band, key)] for band, key in enumerate(keys)))
+        return persisted, pending
+
+    def _signatures(self, ids):
+        ids = list(ids)
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                for id_, blob in self._conn.execute(
+                    f"SELECT id, signature FROM signatures WHERE id IN ({placeholders})", chunk
+                ):
+                    found[id_] = np.frombuffer(blob, dtype=np.uint32)
+        return found
+
+    def duplicate_of(self, signature, keys, exclude=None):
+        """Id of an indexed or pending chunk at least `threshold` similar, or None"""
+        persisted, pending = self._candidates(keys)
+        persisted.discard(exclude)
+        pending.discard(exclude)
+        for id_ in pending:
+            if estimated_similarity(signature, self._pending[id_][0]) >= self.threshold:
+                return id_
+        for id_, other in self._signatures(persisted).items():
+            if estimated_similarity(signature, other) >= self.threshold:
+                return id_
+        return None
+
+    def filter(self, source, ids, docs):
+        """Drop chunks that nearly duplicate the corpus or earlier chunks in this run; returns the kept ids"""
+        kept = []
+        dropped = []
+        for id_, doc in zip(ids, docs):
+            signature = minhash_signature(doc.page_content)
+            keys = band_keys(signature)
+            with self._lock:
+                self._seen[source] += 1
+                duplicate = self.duplicate_of(signature, keys, exclude=id_)
+                if duplicate is not None:
+                    self._dropped[source] += 1
+                    dropped.append((id_, duplicate))
+                    continue
+                self._pending[id_] = (signature, keys)
+                for band, key in enumerate(keys):
+                    self._pending_buckets[(band, key)].add(id_)
+            kept.append(id_)
+        if dropped and self.manifest is not None:
+            self.manifest.mark_duplicates(dropped, source)
+        return kept
+
+    def add(self, ids, docs, source=None):
+        """Persist signatures of committed chunks"""
+        rows = []
+        bucket_rows = []
+        with self._lock:
+            for id_, doc in zip(ids, docs):
+                signature, keys = self._pending.pop(id_, (None, None))
+                if signature is None:
+                    signature = minhash_signature(doc.page_content)
+                    keys = band_keys(signature)
+                for band, key in enumerate(keys):
+                    self._pending_buckets[(band, key)].discard(id_)
+                rows.append((id_, source, signature.tobytes()))
+                bucket_rows.extend((band, key, id_) for band, key in enumerate(keys))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO signatures (id, source, signature) VALUES (?, ?, ?)", rows
+                )
+                self._conn.executemany("INSERT OR IGNORE INTO buckets (band, bucket, id) VALUES (?, ?, ?)",
+                                       bucket_rows)
+
+    def discard(self, ids):
+        """Forget pending signatures of chunks that were not committed, and the duplicates dropped in their favour"""
+        with self._lock:
+            for id_ in ids:
+                signature, keys = self._pending.pop(id_, (None, ()))
+                for band, key in enumerate(keys):
+                    self._pending_buckets[(band, key)].discard(id_)
+        if self.manifest is not None:
+            self.manifest.remove_duplicates_of(ids)
+
+    def remove(self, ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM signatures WHERE id = ?", [(id_,) for id_ in ids])
+            self._conn.executemany("DELETE FROM buckets WHERE id = ?", [(id_,) for id_ in ids])
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM signatures")
+            self._conn.execute("DELETE FROM buckets")
+
+    def reset_report(self):
+        """Start counting seen and dropped chunks for a new run"""
+        with self._lock:
+            self._seen.clear()
+            self._dropped.clear()
+
+    def report(self):
+        """Seen and dropped chunk counts and dedup ratio per source for this run"""
+        return {
+            source: {
+                "seen": self._seen[source],
+                "dropped": self._dropped[source],
+                "ratio": round(self._dropped[source] / self._seen[source], 4) if self._seen[source] else 0.0
+            }
+            for source in self._seen
+        }
+
+    def print_report(self):
+        for source, counts in self.report().items():
+            print(f"Near duplicates in {source}: {counts['dropped']} of {counts['seen']} "
+                  f"({counts['ratio']:.1%})")
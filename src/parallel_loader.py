@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from src.parse_cache import PARSE_CACHE_ENABLED, get_parse_cache
+
+LOADER_WORKERS = int(os.getenv('LOADER_WORKERS', str(os.cpu_count() or 1)))
+# Files parsed ahead of the consumer; bounds how many parsed files sit in memory
+LOADER_MAX_PENDING = int(os.getenv('LOADER_MAX_PENDING', str(LOADER_WORKERS * 2)))
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx")
+# Parse cache entries only reuse chunk boundaries made with the same settings
+CHUNK_CONFIG = f"recursive:{CHUNK_SIZE}:{CHUNK_OVERLAP}"
+
+def discover_files(directory_path, extensions=SUPPORTED_EXTENSIONS):
+    """Supported files under a directory, in a stable order"""
+    paths = []
+    for root, _, files in os.walk(directory_path):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(extensions))
+    return sorted(paths)
+
+def _loader_for(path):
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+    extension = os.path.splitext(path)[1].lower()
+    return {".pdf": PyPDFLoader, ".txt": TextLoader, ".docx": Docx2txtLoader}[extension](path)
+
+def split_pages(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              length_function=len)
+    return splitter.split_documents(pages)
+
+def parse_and_chunk(path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Parse and split one file; runs inside a pool worker and never raises"""
+    start = time.perf_counter()
+    try:
+        pages = _loader_for(path).load()
+        chunks = split_pages(pages, chunk_size, chunk_overlap)
+        return {"path": path, "pages": pages, "chunks": chunks, "error": None, "cached": False,
+                "seconds": time.perf_counter() - start}
+    except Exception as e:
+        return {"path": path, "pages": [], "chunks": [], "error": f"{type(e).__name__}: {str(e)}",
+                "cached": False, "seconds": time.perf_counter() - start}
+
+def cached_result(path, cache):
+    """A parse_and_chunk result served from the parse cache, or None when the file changed"""
+    start = time.perf_counter()
+    try:
+        entry = cache.get(path, CHUNK_CONFIG)
+    except (OSError, ValueError) as e:
+        print(f"Error reading parse cache for {path}: {str(e)}")
+        return None
+    if entry is None:
+        return None
+    pages, chunks = entry
+    if chunks is None:
+        # Cached under another chunking configuration; only the parse is skipped
+        chunks = split_pages(pages)
+        cache.put(path, pages, chunks, CHUNK_CONFIG)
+    return {"path": path, "pages": pages, "chunks": chunks, "error": None, "cached": True,
+            "seconds": time.perf_counter() - start}
+
+class LoadReport:
+    """Per-file parse timings, chunk counts and failures of one load"""
+
+    def __init__(self):
+        self.files = []
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def add(self, result):
+        entry = {key: result[key] for key in ("path", "error", "cached", "seconds")}
+        entry["pages"] = len(result["pages"])
+        entry["chunks"] = len(result["chunks"])
+        self.files.append(entry)
+
+    @property
+    def failures(self):
+        return [f for f in self.files if f["error"]]
+
+    @property
+    def chunk_count(self):
+        return sum(f["chunks"] for f in self.files)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    def print_summary(self, slowest=5):
+        parse_seconds = sum(f["seconds"] for f in self.files)
+        cached = sum(1 for f in self.files if f["cached"])
+        print(f"Loaded {len(self.files)} files into {self.chunk_count} chunks in {self.seconds or 0:.2f}s "
+              f"({cached} from the parse cache, {parse_seconds:.2f}s of parsing, {len(self.failures)} failed)")
+        for f in sorted(self.files, key=lambda f: f["seconds"], reverse=True)[:slowest]:
+            print(f"  {f['seconds']:.2f}s  {f['pages']} pages  {f['chunks']} chunks  {f['path']}")
+        for f in self.failures:
+            print(f"  Failed to load {f['path']}: {f['error']}")
+
+def _ready(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+def iter_file_chunks(paths, workers=LOADER_WORKERS, max_pending=LOADER_MAX_PENDING, report=None,
+                     use_cache=PARSE_CACHE_ENABLED):
+    """Yield the chunks of each file in path order while later files are parsed in a process pool
+
+    Files unchanged since they were last parsed are served from the parse
+    cache without being sent to a worker.
+    """
+    cache = get_parse_cache() if use_cache else None
+
+    def finish(result):
+        if cache is not None and not result["cached"] and not result["error"]:
+            try:
+                cache.put(result["path"], result["pages"], result["chunks"], CHUNK_CONFIG)
+            except (OSError, ValueError) as e:
+                print(f"Error writing parse cache for {result['path']}: {str(e)}")
+        if report is not None:
+            report.add(result)
+        return result["chunks"]
+
+    def cached(path):
+        return cached_result(path, cache) if cache is not None else None
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield from finish(cached(path) or parse_and_chunk(path))
+        return
+
+    # Forking once the pipeline's embed and upsert threads are running can copy held locks
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        def submit(path):
+            result = cached(path)
+            return _ready(result) if result is not None else pool.submit(parse_and_chunk, path)
+
+        pending = deque()
+        remaining = iter(paths)
+        for path in remaining:
+            pending.append(submit(path))
+            if len(pending) >= max(max_pending, workers):
+                break
+        try:
+            while pending:
+                result = pending.popleft().result()
+                # Keep the pool busy while the consumer works through this file
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    pending.append(submit(next_path))
+                yield from finish(result)
+        finally:
+            # A consumer that stops early should not wait for files it will never read
+            for future in pending:
+                future.cancel()
+
+def iter_directory_chunks(directory_path, workers=LOADER_WORKERS, report=None, use_cache=PARSE_CACHE_ENABLED):
+    """Stream chunks of every supported file under a directory"""
+    yield from iter_file_chunks(discover_files(directory_path), workers=workers, report=report, use_cache=use_cache)
+    if use_cache:
+        get_parse_cache().prune(directory_path)
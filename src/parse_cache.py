@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from langchain_core.documents import Document
+from src.cache_paths import CACHE_DIR
+
+PARSE_CACHE_PATH = os.getenv('PARSE_CACHE_PATH', os.path.join(CACHE_DIR, 'parse_cache.sqlite'))
+PARSE_CACHE_ENABLED = os.getenv('PARSE_CACHE_ENABLED', 'true').lower() == 'true'
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_spans(pages, chunks):
+    """Chunks as [page, start, length] offsets into their page text, or [text, metadata] when not a substring"""
+    spans = []
+    page_index = 0
+    search_from = 0
+    for chunk in chunks:
+        # Chunks come out in page order, carrying their page's metadata
+        index, offset = page_index, search_from
+        while index < len(pages) and chunk.metadata != pages[index].metadata:
+            index += 1
+            offset = 0
+        start = pages[index].page_content.find(chunk.page_content, offset) if index < len(pages) else -1
+        if start < 0:
+            spans.append([chunk.page_content, chunk.metadata])
+            continue
+        spans.append([index, start, len(chunk.page_content)])
+        page_index, search_from = index, start + 1
+    return spans
+
+def _encode(pages, spans):
+    payload = {
+        "pages": [[page.page_content, page.metadata] for page in pages],
+        "chunks": spans
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8"), 6)
+
+def _decode(blob):
+    payload = json.loads(zlib.decompress(blob))
+    pages = [Document(page_content=text, metadata=metadata) for text, metadata in payload["pages"]]
+    chunks = None
+    if payload["chunks"] is not None:
+        chunks = []
+        for span in payload["chunks"]:
+            if len(span) == 2:
+                chunks.append(Document(page_content=span[0], metadata=span[1]))
+                continue
+            page = pages[span[0]]
+            text = page.page_content[span[1]:span[1] + span[2]]
+            chunks.append(Document(page_content=text, metadata=dict(page.metadata)))
+    return pages, chunks
+
+class ParseCache:
+    """Extracted pages and chunk boundaries of source files, keyed on path, size, mtime and content hash"""
+
+    def __init__(self, path=PARSE_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    chunk_config TEXT,
+                    payload BLOB NOT NULL,
+                    parsed_at TEXT NOT NULL
+                )
+            """)
+
+    def get(self, path, chunk_config=None):
+        """(pages, chunks) for an unchanged file, else None; chunks is None when cached for another chunk_config"""
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256, chunk_config, payload FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        size, mtime_ns, sha256, cached_config, payload = row
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            # Touched or copied files keep their entry when the bytes are unchanged
+            if stat.st_size != size or file_digest(path) != sha256:
+                self.misses += 1
+                return None
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE files SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, path))
+        self.hits += 1
+        pages, chunks = _decode(payload)
+        return pages, chunks if cached_config == chunk_config else None
+
+    def put(self, path, pages, chunks=None, chunk_config=None):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        spans = chunk_spans(pages, chunks) if chunks is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, chunk_config, payload, parsed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, file_digest(path),
+                 chunk_config if chunks is not None else None, _encode(pages, spans), datetime.now().isoformat())
+            )
+
+    def prune(self, directory_path=None):
+        """Drop entries for files that no longer exist, optionally only under one directory"""
+        prefix = os.path.join(os.path.abspath(directory_path), "") if directory_path else ""
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM files")]
+        stale = [path for path in paths if path.startswith(prefix) and not os.path.exists(path)]
+        if stale:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in stale])
+            print(f"Pruned {len(stale)} deleted files from the parse cache")
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            entries, payload_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM files"
+            ).fetchone()
+        return {"entries": entries, "payload_bytes": payload_bytes, "hits": self.hits, "misses": self.misses}
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache():
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache()
+        return _parse_cache
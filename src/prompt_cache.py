@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PROMPT_CACHE_TTL_SECONDS = int(os.getenv('PROMPT_CACHE_TTL_SECONDS', str(6 * 60 * 60)))
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv('PROMPT_CACHE_MAX_ENTRIES', '256'))
+# How often the index version is re-read; a change invalidates every cached prompt
+INDEX_VERSION_CHECK_SECONDS = int(os.getenv('INDEX_VERSION_CHECK_SECONDS', '300'))
+
+def canonical_preferences(preferences):
+    """Canonical, hashable form of a traditional medicine preference value"""
+    if not preferences:
+        return ()
+    if isinstance(preferences, dict):
+        practices = [name for name, enabled in preferences.items() if enabled]
+    elif isinstance(preferences, (list, tuple, set)):
+        practices = list(preferences)
+    else:
+        practices = str(preferences).split(",")
+    return tuple(sorted({str(p).strip().lower() for p in practices if str(p).strip()}))
+
+class PromptArtifactCache:
+    """LRU cache of generated prompt text keyed by preference profile, with TTL and index versioning"""
+
+    def __init__(self, ttl_seconds=PROMPT_CACHE_TTL_SECONDS, max_entries=PROMPT_CACHE_MAX_ENTRIES,
+                 version_fn=None, version_check_seconds=INDEX_VERSION_CHECK_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.version_check_seconds = version_check_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._version_checked_at = None
+        self._lock = threading.Lock()
+
+    def current_version(self):
+        """Index version, re-read from version_fn at most every version_check_seconds"""
+        if self.version_fn is None:
+            return None
+        now = time.monotonic()
+        if self._version_checked_at is None or now - self._version_checked_at >= self.version_check_seconds:
+            self._version_checked_at = now
+            try:
+                self._version = self.version_fn()
+            except Exception as e:
+                print(f"Error reading index version: {str(e)}")
+        return self._version
+
+    def get_or_build(self, key, builder):
+        """Cached artifact for key, rebuilt when missing, past its TTL or from an older index version"""
+        version = self.current_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, built_at, built_version = entry
+                if time.monotonic() - built_at < self.ttl_seconds and built_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self.expired += 1
+            self.misses += 1
+
+        value = builder()
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (value, time.monotonic(), version)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "index_version": self._version
+        }
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from src.bm25_index import content_key
+
+RERANK_ENABLED = os.getenv('RERANK_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RERANKER_MODEL = os.getenv('RERANKER_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+# Candidates retrieved per chunk that is finally passed to the LLM
+RERANK_OVERFETCH = int(os.getenv('RERANK_OVERFETCH', '4'))
+RERANK_CACHE_SIZE = int(os.getenv('RERANK_CACHE_SIZE', '20000'))
+
+def query_hash(query):
+    """Hash of a query with whitespace normalized"""
+    return hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()
+
+def chunk_id(doc):
+    return doc.id or content_key(doc.page_content)
+
+def overfetch(k):
+    """Number of candidates to retrieve so reranking can keep the best k"""
+    return k * RERANK_OVERFETCH if RERANK_ENABLED else k
+
+class CrossEncoderReranker:
+    """Scores (query, chunk) pairs with a small cross-encoder on CPU, caching scores"""
+
+    def __init__(self, model_name=RERANKER_MODEL, batch_size=32, max_length=512, cache_size=RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._model = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    print(f"Loading reranker model {self.model_name}...")
+                    self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def score(self, pairs):
+        """Scores for (query, Document) pairs; uncached pairs are scored in one batched call"""
+        keys = [(query_hash(query), chunk_id(doc)) for query, doc in pairs]
+        scores = [None] * len(pairs)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            positions = list(missing.values())
+            inputs = [(pairs[p[0]][0], pairs[p[0]][1].page_content) for p in positions]
+            predicted = self._get_model().predict(inputs, batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for key, indices, value in zip(missing, positions, predicted):
+                    value = float(value)
+                    for i in indices:
+                        scores[i] = value
+                    self._cache[key] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank_groups(self, groups):
+        """Rerank several (query, docs, top_n) groups with a single scoring pass"""
+        groups = [(query, _unique(docs), top_n) for query, docs, top_n in groups]
+        scores = iter(self.score([(query, doc) for query, docs, _ in groups for doc in docs]))
+        results = []
+        for query, docs, top_n in groups:
+            scored = sorted(((next(scores), i, doc) for i, doc in enumerate(docs)), key=lambda x: (-x[0], x[1]))
+            results.append([doc for _, _, doc in scored[:top_n]])
+        return results
+
+    def rerank(self, query, docs, top_n):
+        return self.rerank_groups([(query, docs, top_n)])[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None
+        }
+
+def _unique(docs):
+    unique = []
+    seen = set()
+    for doc in docs:
+        key = content_key(doc.page_content)
+        if key not in seen:
+            seen.add(key)
+            unique.append(doc)
+    return unique
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Shared cross-encoder reranker"""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
+
+def rerank_groups(groups):
+    """Rerank (query, docs, top_n) groups, keeping retrieval order if reranking is off or fails"""
+    if RERANK_ENABLED and any(docs for _, docs, _ in groups):
+        try:
+            return get_reranker().rerank_groups(groups)
+        except Exception as e:
+            print(f"Error reranking documents: {str(e)}")
+    return [_unique(docs)[:top_n] for _, docs, top_n in groups]
+
+def rerank(query, docs, top_n):
+    return rerank_groups([(query, docs, top_n)])[0]
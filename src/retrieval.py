@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from src.bm25_index import content_key, get_bm25_index
+
+# dense (vector similarity), sparse (BM25) or hybrid (both, fused with RRF)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+# Candidates fetched from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+# Rank damping constant from the original reciprocal rank fusion paper
+RRF_K = 60
+
+def document_key(doc):
+    """Key that identifies the same chunk across retrievers"""
+    return content_key(doc.page_content)
+
+def reciprocal_rank_fusion(result_lists, k=RRF_K, limit=None):
+    """Merge ranked document lists by summing 1 / (k + rank) per chunk"""
+    scores = {}
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    if limit is not None:
+        ranked = ranked[:limit]
+    return [documents[key] for key in ranked]
+
+def retrieve(docsearch, query, k=4, mode=None, filter=None, index_name="sanocare"):
+    """Retrieve the top-k chunks for a query with the configured retrieval mode"""
+    mode = mode or RETRIEVAL_MODE
+    if mode == "dense":
+        return docsearch.similarity_search(query, k=k, filter=filter)
+
+    bm25_index = get_bm25_index(index_name)
+    if mode == "sparse":
+        return bm25_index.similarity_search(query, k=k, filter=filter)
+    if mode != "hybrid":
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    candidates = max(k, HYBRID_CANDIDATES)
+    dense_docs = docsearch.similarity_search(query, k=candidates, filter=filter)
+    sparse_docs = bm25_index.similarity_search(query, k=candidates, filter=filter)
+    return reciprocal_rank_fusion([dense_docs, sparse_docs], limit=k)
+
+_search_executor = ThreadPoolExecutor(max_workers=int(os.getenv('MULTI_QUERY_WORKERS', '4')),
+                                      thread_name_prefix="multi-query")
+
+def multi_query_search(docsearch, specs):
+    """Run (label, query, filter, k) searches concurrently off one batched embedding call; returns {label: docs}"""
+    specs = [spec for spec in specs if spec[3] > 0]
+    if not specs:
+        return {}
+
+    # MiniLM uses the same encoding for queries and documents, so one
+    # embed_documents call covers every distinct query
+    queries = list(dict.fromkeys(query for _, query, _, _ in specs))
+    vectors = dict(zip(queries, docsearch.embeddings.embed_documents(queries)))
+
+    def run(spec):
+        _, query, filter, k = spec
+        results = docsearch.similarity_search_by_vector_with_score(vectors[query], k=k, filter=filter)
+        return [doc for doc, _ in results]
+
+    futures = [(spec[0], _search_executor.submit(run, spec)) for spec in specs]
+    labeled = {}
+    for label, future in futures:
+        try:
+            labeled[label] = future.result()
+        except Exception as e:
+            print(f"Error running '{label}' search: {str(e)}")
+            labeled[label] = []
+    return labeled
+
+def merge_unique(labeled, prioritize=None):
+    """Flatten labeled results in one pass, dropping repeated chunks and putting prioritized ones first"""
+    first = []
+    rest = []
+    seen = set()
+    for docs in labeled.values():
+        for doc in docs:
+            key = document_key(doc)
+            if key in seen:
+                continue
+            seen.add(key)
+            (first if prioritize and prioritize(doc) else rest).append(doc)
+    return first + rest
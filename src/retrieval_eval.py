@@ -0,0 +1,228 @@
+import argparse
+import json
+import math
+import os
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+from src.memory_usage import current_rss_mb
+
+DEFAULT_QUERY_SET = os.path.join("eval", "retrieval_queries_v1.json")
+DEFAULT_REPORT_DIR = os.path.join("eval", "reports")
+DEFAULT_K_VALUES = (1, 3, 5, 10)
+
+def load_query_set(path=DEFAULT_QUERY_SET):
+    with open(path) as f:
+        query_set = json.load(f)
+    if not query_set.get("queries"):
+        raise ValueError(f"Query set {path} has no queries")
+    return query_set
+
+def label_matches(doc, label):
+    """Whether a retrieved chunk satisfies one relevance label"""
+    if "contains" in label and label["contains"].lower() in doc.page_content.lower():
+        return True
+    if "source" in label and str(doc.metadata.get("source", "")).lower() == label["source"].lower():
+        return True
+    return False
+
+def judge(docs, labels):
+    """Per-rank gain and the set of label indices each rank satisfies"""
+    gains = []
+    matched = []
+    for doc in docs:
+        hits = {i for i, label in enumerate(labels) if label_matches(doc, label)}
+        gains.append(max((labels[i].get("grade", 1) for i in hits), default=0))
+        matched.append(hits)
+    return gains, matched
+
+def recall_at_k(matched, labels, k):
+    """Fraction of labels satisfied by at least one of the top-k chunks"""
+    if not labels:
+        return None
+    found = set().union(*matched[:k]) if matched[:k] else set()
+    return len(found) / len(labels)
+
+def reciprocal_rank(gains):
+    for rank, gain in enumerate(gains, start=1):
+        if gain > 0:
+            return 1.0 / rank
+    return 0.0
+
+def ndcg_at_k(matched, labels, k):
+    """Normalized DCG with the label grades as the ideal ranking; each label earns its grade once"""
+    dcg = 0.0
+    satisfied = set()
+    for rank, hits in enumerate(matched[:k], start=1):
+        # Later chunks matching only already-satisfied labels add nothing, as in the ideal ranking
+        new_hits = hits - satisfied
+        satisfied |= hits
+        gain = max((labels[i].get("grade", 1) for i in new_hits), default=0)
+        dcg += (2 ** gain - 1) / math.log2(rank + 1)
+    ideal_gains = sorted((label.get("grade", 1) for label in labels), reverse=True)[:k]
+    ideal = sum((2 ** gain - 1) / math.log2(rank + 1) for rank, gain in enumerate(ideal_gains, start=1))
+    return dcg / ideal if ideal else None
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return round(float(np.mean(values)), 4) if values else None
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def index_memory(docsearch, index_name):
+    """Bytes held by the vector and lexical indexes where they can be measured locally"""
+    from src.bm25_index import get_bm25_index
+    from src.helper import describe_vector_index
+
+    memory = {"process_rss_mb": round(current_rss_mb(), 1)}
+    try:
+        stats = describe_vector_index(docsearch, index_name)
+        memory["vector_count"] = stats.total_vector_count
+        memory["vector_index_bytes"] = getattr(stats, "index_bytes", None)
+    except Exception as e:
+        print(f"Error reading index stats: {str(e)}")
+    bm25_path = get_bm25_index(index_name).path
+    memory["bm25_index_bytes"] = os.path.getsize(bm25_path) if os.path.exists(bm25_path) else 0
+    return memory
+
+def evaluate(docsearch, query_set, k_values=DEFAULT_K_VALUES, mode=None, rerank=False,
+             repeats=3, index_name="sanocare"):
+    """Run every query in the set and compute accuracy and latency metrics"""
+    from src.retrieval import retrieve
+    from src.reranker import overfetch, rerank as rerank_docs
+
+    max_k = max(k_values)
+    fetch_k = overfetch(max_k) if rerank else max_k
+
+    def search(query):
+        docs = retrieve(docsearch, query, k=fetch_k, mode=mode, index_name=index_name)
+        return rerank_docs(query, docs, max_k) if rerank else docs[:max_k]
+
+    # One untimed pass loads models and warms connections
+    search(query_set["queries"][0]["query"])
+
+    per_query = []
+    latencies = []
+    for item in query_set["queries"]:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            docs = search(item["query"])
+            timings.append((time.perf_counter() - start) * 1000)
+        latencies.extend(timings)
+
+        labels = item["relevant"]
+        gains, matched = judge(docs, labels)
+        per_query.append({
+            "id": item["id"],
+            "query": item["query"],
+            "recall": {str(k): recall_at_k(matched, labels, k) for k in k_values},
+            "ndcg": {str(k): ndcg_at_k(matched, labels, k) for k in k_values},
+            "mrr": reciprocal_rank(gains),
+            "latency_ms": round(float(np.median(timings)), 2),
+            "retrieved": [
+                {"source": doc.metadata.get("source"), "gain": gain, "preview": doc.page_content[:120]}
+                for doc, gain in zip(docs, gains)
+            ]
+        })
+
+    return {
+        "recall": {str(k): _mean(q["recall"][str(k)] for q in per_query) for k in k_values},
+        "ndcg": {str(k): _mean(q["ndcg"][str(k)] for q in per_query) for k in k_values},
+        "mrr": _mean(q["mrr"] for q in per_query),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2),
+            "mean": round(float(np.mean(latencies)), 2)
+        },
+        "queries": per_query
+    }
+
+def run(query_set_path=DEFAULT_QUERY_SET, backend=None, mode=None, rerank=False, k_values=DEFAULT_K_VALUES,
+        repeats=3, index_name="sanocare", output=None):
+    """Evaluate retrieval against a backend and write a JSON report; returns the report"""
+    # The backend switch is read when helper is imported
+    if backend:
+        os.environ['VECTOR_STORE_BACKEND'] = backend
+    from src.embeddings import EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME
+    from src.helper import load_vector_store, VECTOR_STORE_BACKEND
+    from src.retrieval import RETRIEVAL_MODE
+
+    query_set = load_query_set(query_set_path)
+    docsearch = load_vector_store(index_name)
+    metrics = evaluate(docsearch, query_set, k_values=k_values, mode=mode, rerank=rerank,
+                       repeats=repeats, index_name=index_name)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "query_set": {"path": query_set_path, "version": query_set.get("version"),
+                      "queries": len(query_set["queries"])},
+        "config": {
+            "vector_store_backend": VECTOR_STORE_BACKEND,
+            "index_name": index_name,
+            "retrieval_mode": mode or RETRIEVAL_MODE,
+            "rerank": rerank,
+            "embedding_model": EMBEDDING_MODEL_NAME,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "k_values": list(k_values),
+            "repeats": repeats
+        },
+        "index_memory": index_memory(docsearch, index_name),
+        "metrics": metrics
+    }
+
+    if output is None:
+        os.makedirs(DEFAULT_REPORT_DIR, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{VECTOR_STORE_BACKEND}-{report['config']['retrieval_mode']}.json"
+        output = os.path.join(DEFAULT_REPORT_DIR, name)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    report["output"] = output
+    return report
+
+def print_summary(report):
+    config = report["config"]
+    metrics = report["metrics"]
+    print(f"\n=== Retrieval Evaluation ({report['query_set']['version']}, "
+          f"{config['vector_store_backend']}, {config['retrieval_mode']}"
+          f"{', reranked' if config['rerank'] else ''}) ===")
+    for k in config["k_values"]:
+        print(f"recall@{k}: {metrics['recall'][str(k)]}  nDCG@{k}: {metrics['ndcg'][str(k)]}")
+    print(f"MRR: {metrics['mrr']}")
+    print(f"Latency p50: {metrics['latency_ms']['p50']} ms, p95: {metrics['latency_ms']['p95']} ms")
+    print(f"Index memory: {report['index_memory']}")
+    print(f"Report written to {report['output']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval accuracy and latency over a fixed query set")
+    parser.add_argument("--queries", default=DEFAULT_QUERY_SET, help="Path to the versioned query set")
+    parser.add_argument("--backend", choices=["pinecone", "local"], help="Vector store backend (default: VECTOR_STORE_BACKEND)")
+    parser.add_argument("--mode", choices=["dense", "sparse", "hybrid"], help="Retrieval mode (default: RETRIEVAL_MODE)")
+    parser.add_argument("--rerank", action="store_true", help="Apply the cross-encoder reranker")
+    parser.add_argument("--k", default=",".join(str(k) for k in DEFAULT_K_VALUES), help="Comma-separated cutoffs")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query")
+    parser.add_argument("--index", default="sanocare", help="Index name")
+    parser.add_argument("--output", help="Report path (default: eval/reports/<timestamp>-<backend>-<mode>.json)")
+    args = parser.parse_args()
+
+    report = run(
+        query_set_path=args.queries,
+        backend=args.backend,
+        mode=args.mode,
+        rerank=args.rerank,
+        k_values=tuple(sorted(int(k) for k in args.k.split(","))),
+        repeats=args.repeats,
+        index_name=args.index,
+        output=args.output
+    )
+    print_summary(report)
+
+if __name__ == "__main__":
+    main()
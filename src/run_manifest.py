@@ -0,0 +1,312 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from langchain_core.documents import Document
+from src.cache_paths import CACHE_DIR
+
+RUN_MANIFEST_DIR = os.getenv('RUN_MANIFEST_DIR', os.path.join(CACHE_DIR, 'runs'))
+# Finished runs kept for inspection; older ones and their staged documents are dropped
+RUN_HISTORY = int(os.getenv('RUN_HISTORY', '10'))
+# Staged documents written and read back per transaction
+STAGED_PAGE_SIZE = 500
+
+class StageRecord:
+    """Counts reported by the code running inside one stage"""
+
+    def __init__(self):
+        self.count = 0
+        self.details = {}
+
+class RunManifest:
+    """Checkpoint log of one ingestion run: staged documents, planned batches and per-stage timings"""
+
+    def __init__(self, index_name="sanocare", namespace="", path=RUN_MANIFEST_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, f"{index_name}.{namespace or 'default'}.sqlite")
+        self.index_name = index_name
+        self.namespace = namespace
+        self.run_id = None
+        self.resumed = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS stages (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    seconds REAL,
+                    count INTEGER,
+                    details TEXT,
+                    PRIMARY KEY (run_id, stage)
+                );
+                CREATE TABLE IF NOT EXISTS documents (
+                    run_id TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    PRIMARY KEY (run_id, source, position)
+                );
+                CREATE TABLE IF NOT EXISTS batches (
+                    run_id TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    batch INTEGER NOT NULL,
+                    ids TEXT NOT NULL,
+                    committed_at TEXT,
+                    PRIMARY KEY (run_id, source, batch)
+                );
+            """)
+
+    def start(self, resume=False):
+        """Start a new run, or with resume continue the latest unfinished one"""
+        if resume:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT run_id FROM runs WHERE status != 'completed' ORDER BY started_at DESC LIMIT 1"
+                ).fetchone()
+            if row:
+                self.run_id = row[0]
+                self.resumed = True
+                self._set_status("running")
+                print(f"Resuming ingestion run {self.run_id}")
+                return self
+            print("No unfinished ingestion run to resume, starting a new one")
+
+        self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, status, started_at) VALUES (?, 'running', ?)",
+                (self.run_id, datetime.now().isoformat())
+            )
+        print(f"Started ingestion run {self.run_id}")
+        return self
+
+    def _set_status(self, status, finished=False):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                (status, datetime.now().isoformat() if finished else None, self.run_id)
+            )
+
+    def finish(self, status="completed"):
+        """Close the run; a run with uncommitted batches or failed stages stays resumable as incomplete"""
+        if status == "completed":
+            with self._lock:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM batches WHERE run_id = ? AND committed_at IS NULL", (self.run_id,)
+                ).fetchone()[0]
+                failed_stages = self._conn.execute(
+                    "SELECT COUNT(*) FROM stages WHERE run_id = ? AND status = 'failed'", (self.run_id,)
+                ).fetchone()[0]
+            if pending or failed_stages:
+                status = "incomplete"
+        self._set_status(status, finished=True)
+        self._prune()
+
+    def _prune(self):
+        with self._lock, self._conn:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT run_id FROM runs ORDER BY started_at DESC LIMIT -1 OFFSET ?", (RUN_HISTORY,)
+            )]
+            # Staged documents are only needed to resume; completed runs keep their timings
+            stale_documents = stale + [row[0] for row in self._conn.execute(
+                "SELECT run_id FROM runs WHERE status = 'completed'"
+            )]
+            for table in ("runs", "stages", "batches"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE run_id = ?", [(run_id,) for run_id in stale])
+            self._conn.executemany("DELETE FROM documents WHERE run_id = ?",
+                                   [(run_id,) for run_id in stale_documents])
+
+    def stage_completed(self, stage):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM stages WHERE run_id = ? AND stage = ?", (self.run_id, stage)
+            ).fetchone()
+        return row is not None and row[0] == "completed"
+
+    def record_stage(self, stage, status, seconds, count, details=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (run_id, stage, status, seconds, count, details) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.run_id, stage, status, round(seconds, 3), count, json.dumps(details or {}))
+            )
+
+    @contextmanager
+    def stage(self, stage):
+        """Time a stage and record its status and the count it reports"""
+        record = StageRecord()
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            yield record
+            status = "completed"
+        finally:
+            self.record_stage(stage, status, time.perf_counter() - start, record.count, record.details)
+
+    def staged_documents(self, source, loader):
+        """Documents for a source, loaded once per run and read back from the manifest on resume"""
+        if self.stage_completed(f"load:{source}"):
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT content, metadata FROM documents WHERE run_id = ? AND source = ? ORDER BY position",
+                    (self.run_id, source)
+                ).fetchall()
+            print(f"Reusing {len(rows)} staged {source} documents")
+            return [Document(page_content=content, metadata=json.loads(metadata)) for content, metadata in rows]
+
+        with self.stage(f"load:{source}") as record:
+            documents = loader() or []
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM documents WHERE run_id = ? AND source = ?", (self.run_id, source))
+                self._conn.executemany(
+                    "INSERT INTO documents (run_id, source, position, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [(self.run_id, source, position, doc.page_content, json.dumps(doc.metadata, default=str))
+                     for position, doc in enumerate(documents)]
+                )
+            record.count = len(documents)
+        return documents
+
+    def _read_staged(self, source, page_size=STAGED_PAGE_SIZE):
+        position = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT position, content, metadata FROM documents "
+                    "WHERE run_id = ? AND source = ? AND position > ? ORDER BY position LIMIT ?",
+                    (self.run_id, source, position, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for position, content, metadata in rows:
+                yield Document(page_content=content, metadata=json.loads(metadata))
+
+    def stream_documents(self, source, loader, page_size=STAGED_PAGE_SIZE):
+        """Streaming staged_documents: yields documents as they load, persisting them page by page"""
+        if self.stage_completed(f"load:{source}"):
+            print(f"Reusing staged {source} documents")
+            yield from self._read_staged(source, page_size)
+            return
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE run_id = ? AND source = ?", (self.run_id, source))
+        start = time.perf_counter()
+        position = 0
+        page = []
+
+        def save(page):
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO documents (run_id, source, position, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                    page
+                )
+
+        try:
+            for doc in loader() or []:
+                page.append((self.run_id, source, position, doc.page_content, json.dumps(doc.metadata, default=str)))
+                position += 1
+                if len(page) >= page_size:
+                    save(page)
+                    page = []
+                yield doc
+            save(page)
+        except BaseException:
+            self.record_stage(f"load:{source}", "failed", time.perf_counter() - start, position)
+            raise
+        # Includes the time the consumer spent between documents
+        self.record_stage(f"load:{source}", "completed", time.perf_counter() - start, position)
+
+    def record_batch(self, source, ids):
+        """Checkpoint a batch committed by a streaming writer"""
+        with self._lock, self._conn:
+            batch = self._conn.execute(
+                "SELECT COALESCE(MAX(batch) + 1, 0) FROM batches WHERE run_id = ? AND source = ?",
+                (self.run_id, source)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO batches (run_id, source, batch, ids, committed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, source, batch, json.dumps(ids), datetime.now().isoformat())
+            )
+
+    def planned_batches(self, source):
+        """[(batch, ids, committed)] planned for a source in this run, or None before planning"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT batch, ids, committed_at FROM batches WHERE run_id = ? AND source = ? ORDER BY batch",
+                (self.run_id, source)
+            ).fetchall()
+        if not rows and not self.stage_completed(f"plan:{source}"):
+            return None
+        return [(batch, json.loads(ids), committed_at is not None) for batch, ids, committed_at in rows]
+
+    def plan_batches(self, source, ids, batch_size):
+        """Fix the batch boundaries for a source so a resumed run continues at the same batch"""
+        with self.stage(f"plan:{source}") as record:
+            batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM batches WHERE run_id = ? AND source = ?", (self.run_id, source))
+                self._conn.executemany(
+                    "INSERT INTO batches (run_id, source, batch, ids) VALUES (?, ?, ?, ?)",
+                    [(self.run_id, source, number, json.dumps(batch)) for number, batch in enumerate(batches)]
+                )
+            record.count = len(ids)
+            record.details = {"batches": len(batches)}
+        return [(number, batch, False) for number, batch in enumerate(batches)]
+
+    def commit_batch(self, source, batch):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batches SET committed_at = ? WHERE run_id = ? AND source = ? AND batch = ?",
+                (datetime.now().isoformat(), self.run_id, source, batch)
+            )
+
+    def summary(self):
+        """Status, per-stage timings and counts, and batch progress of the current run"""
+        with self._lock:
+            status, started_at, finished_at = self._conn.execute(
+                "SELECT status, started_at, finished_at FROM runs WHERE run_id = ?", (self.run_id,)
+            ).fetchone()
+            stages = self._conn.execute(
+                "SELECT stage, status, seconds, count, details FROM stages WHERE run_id = ? ORDER BY rowid",
+                (self.run_id,)
+            ).fetchall()
+            batches = self._conn.execute(
+                "SELECT source, COUNT(*), COUNT(committed_at) FROM batches WHERE run_id = ? GROUP BY source",
+                (self.run_id,)
+            ).fetchall()
+        return {
+            "run_id": self.run_id,
+            "status": status,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "resumed": self.resumed,
+            "stages": [{"stage": stage, "status": stage_status, "seconds": seconds, "count": count,
+                        **json.loads(details or "{}")}
+                       for stage, stage_status, seconds, count, details in stages],
+            "batches": {source: {"planned": planned, "committed": committed}
+                        for source, planned, committed in batches}
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"\n=== Ingestion Run {summary['run_id']} ({summary['status']}"
+              f"{', resumed' if summary['resumed'] else ''}) ===")
+        for stage in summary["stages"]:
+            extra = {k: v for k, v in stage.items() if k not in ("stage", "status", "seconds", "count")}
+            print(f"{stage['stage']:<28} {stage['status']:<10} {stage['seconds']:>8.2f}s  count={stage['count']}"
+                  f"{'  ' + json.dumps(extra) if extra else ''}")
+        for source, progress in summary["batches"].items():
+            print(f"Batches committed for {source}: {progress['committed']}/{progress['planned']}")
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Recent turns kept per session
+SESSION_HISTORY_MAX_TURNS = int(os.getenv('SESSION_HISTORY_MAX_TURNS', '5'))
+# Idle time after which a session's history is dropped
+SESSION_HISTORY_TTL_SECONDS = int(os.getenv('SESSION_HISTORY_TTL_SECONDS', '1800'))
+# Global memory cap across all sessions, in bytes of stored text
+SESSION_HISTORY_MAX_BYTES = int(os.getenv('SESSION_HISTORY_MAX_BYTES', str(64 * 1024 * 1024)))
+
+def _text_size(text):
+    """Approximate memory used by a piece of stored text"""
+    return len(text.encode('utf-8')) if text else 0
+
+class SessionHistory:
+    """Recent turns and rolling summary cached for a single session"""
+    __slots__ = ("turns", "summary", "last_access", "size")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.summary = ""
+        self.last_access = time.monotonic()
+        self.size = 0
+
+    def recompute_size(self):
+        self.size = _text_size(self.summary) + sum(
+            _text_size(message) + _text_size(response) for message, response in self.turns
+        )
+
+class SessionHistoryCache:
+    """Bounded per-session ring buffer of recent turns with TTL and LRU eviction"""
+
+    def __init__(self, max_turns=SESSION_HISTORY_MAX_TURNS, ttl_seconds=SESSION_HISTORY_TTL_SECONDS,
+                 max_bytes=SESSION_HISTORY_MAX_BYTES):
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _is_expired(self, entry, now):
+        return now - entry.last_access > self.ttl_seconds
+
+    def _remove(self, session_id):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+    def _touch(self, session_id, entry, now):
+        entry.last_access = now
+        self._sessions.move_to_end(session_id)
+
+    def _resize(self, entry):
+        old_size = entry.size
+        entry.recompute_size()
+        self._total_bytes += entry.size - old_size
+
+    def _enforce_limits(self):
+        """Drop expired sessions at the cold end, then least recently used ones over the cap"""
+        now = time.monotonic()
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if self._is_expired(entry, now) or self._total_bytes > self.max_bytes:
+                self._remove(session_id)
+                self.evictions += 1
+            else:
+                break
+
+    def _get_or_create(self, session_id, now):
+        entry = self._sessions.get(session_id)
+        if entry is None or self._is_expired(entry, now):
+            self._remove(session_id)
+            entry = SessionHistory(self.max_turns)
+            self._sessions[session_id] = entry
+        return entry
+
+    def get(self, session_id, limit=None):
+        """Return (summary, turns) for a session, or None when it is not cached"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or self._is_expired(entry, now):
+                self._remove(session_id)
+                self.misses += 1
+                return None
+            self._touch(session_id, entry, now)
+            self.hits += 1
+            turns = list(entry.turns)
+            if limit is not None:
+                turns = turns[-limit:] if limit > 0 else []
+            return entry.summary, turns
+
+    def fill(self, session_id, turns, summary=""):
+        """Populate a session from the database after a cache miss"""
+        now = time.monotonic()
+        with self._lock:
+            self._remove(session_id)
+            entry = SessionHistory(self.max_turns)
+            entry.turns.extend(turns)
+            entry.summary = summary or ""
+            self._sessions[session_id] = entry
+            self._resize(entry)
+            self._touch(session_id, entry, now)
+            self._enforce_limits()
+
+    def append_turn(self, session_id, message, bot_response):
+        """Record a newly generated turn for a session"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._get_or_create(session_id, now)
+            entry.turns.append((message, bot_response))
+            self._resize(entry)
+            self._touch(session_id, entry, now)
+            self._enforce_limits()
+
+    def set_summary(self, session_id, summary):
+        """Update the cached rolling summary if the session is cached"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or self._is_expired(entry, now):
+                return
+            entry.summary = summary or ""
+            self._resize(entry)
+            self._enforce_limits()
+
+    def discard(self, session_id):
+        """Forget a session, e.g. on logout"""
+        with self._lock:
+            self._remove(session_id)
+
+    def stats(self):
+        """Report cache occupancy and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+# Shared cache used by the chat endpoint and the summary worker
+session_history = SessionHistoryCache()
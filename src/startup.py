@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Seconds to wait before retrying a component whose initialization failed
+RETRY_INTERVAL_SECONDS = 30
+
+class LazyResource:
+    """Thread-safe handle that initializes an expensive dependency on first use"""
+
+    def __init__(self, name, factory, required=True):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.state = "pending"
+        self.error = None
+        self.started_at = None
+        self.duration = None
+        self._value = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the initialized value, building it if needed; None if it failed"""
+        if self.state == "ready":
+            return self._value
+
+        with self._lock:
+            if self.state == "ready":
+                return self._value
+            if self.state == "failed" and time.monotonic() - self._failed_at < RETRY_INTERVAL_SECONDS:
+                return None
+
+            self.state = "initializing"
+            self.started_at = datetime.now()
+            start = time.perf_counter()
+            try:
+                print(f"Initializing {self.name}...")
+                self._value = self.factory()
+                self.error = None
+                self.state = "ready"
+                print(f"{self.name} ready in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                print(f"Error initializing {self.name}: {str(e)}")
+                self._value = None
+                self.error = str(e)
+                self.state = "failed"
+                self._failed_at = time.monotonic()
+            finally:
+                self.duration = time.perf_counter() - start
+            return self._value
+
+    def reset(self):
+        """Drop the current value so the next get() builds it again"""
+        with self._lock:
+            self._value = None
+            self.state = "pending"
+            self.error = None
+
+    @property
+    def is_ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        return {
+            "state": self.state,
+            "required": self.required,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_seconds": round(self.duration, 3) if self.duration is not None else None,
+            "error": self.error
+        }
+
+class StartupManager:
+    """Registry of lazily initialized components with background warm-up"""
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.components = {}
+        self._warm = []
+        self._warmup_started = False
+        self._warmup_finished_at = None
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, warm=True, required=True):
+        """Register a component; warm components are built in the background at startup"""
+        resource = LazyResource(name, factory, required=required)
+        self.components[name] = resource
+        if warm:
+            self._warm.append(resource)
+        return resource
+
+    def start_background_warmup(self, max_workers=4):
+        """Initialize all warm components in parallel without blocking import"""
+        with self._lock:
+            if self._warmup_started:
+                return
+            self._warmup_started = True
+
+        def warm_all():
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startup") as executor:
+                list(executor.map(lambda resource: resource.get(), self._warm))
+            self._warmup_finished_at = time.monotonic()
+            self.print_timing_report()
+
+        threading.Thread(target=warm_all, name="startup-warmup", daemon=True).start()
+
+    def is_ready(self):
+        return all(resource.is_ready for resource in self.components.values() if resource.required)
+
+    def report(self):
+        """Component states plus startup timings"""
+        return {
+            "ready": self.is_ready(),
+            "uptime_seconds": round(time.monotonic() - self.created_at, 3),
+            "warmup_seconds": round(self._warmup_finished_at - self.created_at, 3)
+                if self._warmup_finished_at else None,
+            "components": {name: resource.status() for name, resource in self.components.items()}
+        }
+
+    def print_timing_report(self):
+        print("\n=== Startup Timing ===")
+        for name, resource in self.components.items():
+            duration = f"{resource.duration:.2f}s" if resource.duration is not None else "-"
+            print(f"{name}: {resource.state} ({duration})")
+        if self._warmup_finished_at:
+            print(f"Warm-up finished {self._warmup_finished_at - self.created_at:.2f}s after startup")
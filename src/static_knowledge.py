@@ -0,0 +1,381 @@
+import re
+from langchain_core.documents import Document
+
+# Region-specific medical information
+REGIONAL_KNOWLEDGE = {
+    "India": {
+        "traditional_medicine": [
+            "Ayurveda principles and practices",
+            "Traditional Chinese Medicine (TCM) in India",
+            "Homeopathy in Indian context",
+            "Yoga and meditation practices",
+            "Siddha medicine",
+            "Unani medicine"
+        ],
+        "common_conditions": [
+            "Tropical diseases",
+            "Dengue fever",
+            "Malaria",
+            "Tuberculosis",
+            "Diabetes in Indian population",
+            "Cardiovascular diseases",
+            "Respiratory infections"
+        ],
+        "cultural_practices": [
+            "Dietary restrictions and preferences",
+            "Family-centric healthcare decisions",
+            "Religious considerations in treatment",
+            "Traditional healing methods",
+            "Fasting practices",
+            "Herbal remedies"
+        ]
+    },
+    "China": {
+        "traditional_medicine": [
+            "Traditional Chinese Medicine (TCM)",
+            "Acupuncture",
+            "Herbal medicine",
+            "Qigong",
+            "Tai Chi",
+            "Cupping therapy"
+        ],
+        "common_conditions": [
+            "Respiratory conditions",
+            "Digestive disorders",
+            "Traditional medicine syndromes",
+            "Chronic conditions",
+            "Mental health patterns"
+        ],
+        "cultural_practices": [
+            "Yin-Yang balance",
+            "Five elements theory",
+            "Seasonal health practices",
+            "Family-based care",
+            "Traditional dietary therapy"
+        ]
+    },
+    "Japan": {
+        "traditional_medicine": [
+            "Kampo medicine",
+            "Shiatsu massage",
+            "Reiki healing",
+            "Traditional herbal medicine",
+            "Zen medicine practices"
+        ],
+        "common_conditions": [
+            "Stress-related conditions",
+            "Longevity practices",
+            "Preventive medicine",
+            "Mental health approaches",
+            "Lifestyle diseases"
+        ],
+        "cultural_practices": [
+            "Mind-body connection",
+            "Preventive healthcare",
+            "Work-life balance",
+            "Traditional dietary practices",
+            "Community health practices"
+        ]
+    },
+    "Europe": {
+        "traditional_medicine": [
+            "Western herbal medicine",
+            "Homeopathy",
+            "Naturopathy",
+            "Traditional European medicine",
+            "Aromatherapy"
+        ],
+        "common_conditions": [
+            "Chronic diseases",
+            "Mental health conditions",
+            "Lifestyle-related diseases",
+            "Age-related conditions",
+            "Environmental health issues"
+        ],
+        "cultural_practices": [
+            "Evidence-based medicine",
+            "Preventive healthcare",
+            "Social healthcare systems",
+            "Holistic approaches",
+            "Traditional healing methods"
+        ]
+    },
+    "Hispanic": {
+        "traditional_medicine": [
+            "Curanderismo practices",
+            "Traditional herbal remedies",
+            "Folk medicine traditions",
+            "Spiritual healing practices",
+            "Traditional massage"
+        ],
+        "common_conditions": [
+            "Diabetes in Hispanic population",
+            "Hypertension patterns",
+            "Genetic conditions",
+            "Cultural health beliefs",
+            "Mental health patterns"
+        ],
+        "cultural_practices": [
+            "Family involvement in healthcare",
+            "Traditional dietary practices",
+            "Religious healing traditions",
+            "Language considerations",
+            "Community health practices"
+        ]
+    },
+    "American": {
+        "traditional_medicine": [
+            "Western medicine practices",
+            "Alternative medicine approaches",
+            "Evidence-based treatments",
+            "Modern healthcare systems",
+            "Integrative medicine"
+        ],
+        "common_conditions": [
+            "Chronic conditions",
+            "Mental health patterns",
+            "Lifestyle-related diseases",
+            "Insurance considerations",
+            "Preventive health"
+        ],
+        "cultural_practices": [
+            "Individual healthcare decisions",
+            "Modern dietary trends",
+            "Healthcare system navigation",
+            "Preventive care practices",
+            "Technology-based health"
+        ]
+    }
+}
+
+# Age-specific medical information
+AGE_GROUP_KNOWLEDGE = {
+    "child": {
+        "developmental_stages": [
+            "Infant development",
+            "Toddler health",
+            "School-age health",
+            "Growth and development",
+            "Early childhood nutrition",
+            "Physical activity needs"
+        ],
+        "common_conditions": [
+            "Childhood illnesses",
+            "Vaccination schedules",
+            "Nutritional needs",
+            "Physical development",
+            "Behavioral health",
+            "Learning disabilities"
+        ],
+        "care_approaches": [
+            "Child-friendly communication",
+            "Parent involvement",
+            "Play-based interventions",
+            "Safety considerations",
+            "Educational support",
+            "Family-centered care"
+        ]
+    },
+    "adolescent": {
+        "developmental_stages": [
+            "Puberty changes",
+            "Emotional development",
+            "Social development",
+            "Identity formation",
+            "Cognitive development",
+            "Physical growth"
+        ],
+        "common_conditions": [
+            "Acne",
+            "Mental health concerns",
+            "Nutritional needs",
+            "Physical development",
+            "Substance use",
+            "Reproductive health"
+        ],
+        "care_approaches": [
+            "Privacy considerations",
+            "Peer influence",
+            "Risk-taking behaviors",
+            "Future planning",
+            "Educational support",
+            "Mental health support"
+        ]
+    },
+    "adult": {
+        "health_concerns": [
+            "Work-life balance",
+            "Stress management",
+            "Preventive care",
+            "Chronic conditions",
+            "Reproductive health",
+            "Career health"
+        ],
+        "common_conditions": [
+            "Cardiovascular health",
+            "Mental health",
+            "Reproductive health",
+            "Lifestyle diseases",
+            "Occupational health",
+            "Family health"
+        ],
+        "care_approaches": [
+            "Evidence-based treatments",
+            "Lifestyle modifications",
+            "Preventive measures",
+            "Health maintenance",
+            "Workplace wellness",
+            "Family health management"
+        ]
+    },
+    "elderly": {
+        "health_concerns": [
+            "Age-related conditions",
+            "Mobility issues",
+            "Cognitive health",
+            "Social isolation",
+            "Nutritional needs",
+            "Medication management"
+        ],
+        "common_conditions": [
+            "Arthritis",
+            "Heart disease",
+            "Diabetes",
+            "Memory concerns",
+            "Vision problems",
+            "Hearing loss"
+        ],
+        "care_approaches": [
+            "Gentle communication",
+            "Fall prevention",
+            "Medication management",
+            "Quality of life",
+            "Social support",
+            "End-of-life care"
+        ]
+    }
+}
+
+# Alternative spellings of the regions above, matched case-insensitively
+REGION_ALIASES = {
+    "indian": "India",
+    "chinese": "China",
+    "japanese": "Japan",
+    "european": "Europe",
+    "mexico": "Hispanic",
+    "latin america": "Hispanic",
+    "latino": "Hispanic",
+    "america": "American",
+    "united states": "American",
+    "usa": "American",
+    "us": "American",
+}
+
+# Age groups produced by the chat user context map onto the broader knowledge groups
+AGE_GROUP_ALIASES = {
+    "young_adult": "adult",
+    "middle_adult": "adult",
+    "mature_adult": "adult",
+    "senior": "elderly",
+    "teen": "adolescent",
+    "teenager": "adolescent",
+}
+
+# Words too generic to tie a message to a knowledge topic
+MATCH_STOPWORDS = frozenset("""
+about after also been does from have health into medical more some than that their them they this
+what when which with your
+""".split())
+
+def _stems(text):
+    """Crude five-letter stems of the content words in a text, so diabetic matches Diabetes"""
+    return {
+        word[:5] for word in re.findall(r"[a-z]+", text.lower())
+        if len(word) > 3 and word not in MATCH_STOPWORDS
+    }
+
+def _regional_document(region, category, topic):
+    return Document(
+        page_content=f"Medical information for {region} region regarding {category}: {topic}",
+        metadata={
+            "region": region,
+            "category": category,
+            "type": "regional",
+            "topic": topic,
+            "source": "medical_knowledge_base"
+        }
+    )
+
+def _age_group_document(age_group, category, topic):
+    return Document(
+        page_content=f"Medical information for {age_group} age group regarding {category}: {topic}",
+        metadata={
+            "age_group": age_group,
+            "category": category,
+            "type": "age_specific",
+            "topic": topic,
+            "source": "medical_knowledge_base"
+        }
+    )
+
+def _compile(knowledge, make_document):
+    """Index documents by (key, category) and by (key, None) for all categories"""
+    table = {}
+    for key, categories in knowledge.items():
+        everything = []
+        for category, topics in categories.items():
+            documents = tuple(make_document(key, category, topic) for topic in topics)
+            table[(key, category)] = documents
+            everything.extend(documents)
+        table[(key, None)] = tuple(everything)
+    return table
+
+_REGIONAL_TABLE = _compile(REGIONAL_KNOWLEDGE, _regional_document)
+_AGE_GROUP_TABLE = _compile(AGE_GROUP_KNOWLEDGE, _age_group_document)
+_REGION_NAMES = {region.lower(): region for region in REGIONAL_KNOWLEDGE}
+_REGION_NAMES.update(REGION_ALIASES)
+
+def normalize_region(region):
+    """Map a user's region to a key of REGIONAL_KNOWLEDGE, or None"""
+    if not region:
+        return None
+    return _REGION_NAMES.get(region.strip().lower())
+
+def normalize_age_group(age_group):
+    """Map a user's age group to a key of AGE_GROUP_KNOWLEDGE, or None"""
+    if not age_group:
+        return None
+    age_group = age_group.strip().lower()
+    age_group = AGE_GROUP_ALIASES.get(age_group, age_group)
+    return age_group if age_group in AGE_GROUP_KNOWLEDGE else None
+
+def get_regional_knowledge(region, category=None):
+    """Templated knowledge documents for a region, optionally one category"""
+    return list(_REGIONAL_TABLE.get((normalize_region(region), category), ()))
+
+def get_age_group_knowledge(age_group, category=None):
+    """Templated knowledge documents for an age group, optionally one category"""
+    return list(_AGE_GROUP_TABLE.get((normalize_age_group(age_group), category), ()))
+
+def match_static_knowledge(documents, text, limit=1):
+    """Up to `limit` documents whose topic or category shares the most words with a text; none if nothing is shared"""
+    wanted = _stems(text)
+    if not wanted:
+        return []
+    scored = []
+    for position, document in enumerate(documents):
+        topic = f"{document.metadata['topic']} {document.metadata['category'].replace('_', ' ')}"
+        overlap = len(wanted & _stems(topic))
+        if overlap:
+            scored.append((-overlap, position, document))
+    return [document for _, _, document in sorted(scored)[:limit]]
+
+def all_static_knowledge_documents():
+    """Every templated regional and age-group document"""
+    return [
+        document
+        for table in (_REGIONAL_TABLE, _AGE_GROUP_TABLE)
+        for (key, category), documents in table.items()
+        if category is None
+        for document in documents
+    ]
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from src.bm25_index import get_bm25_index
+from src.embedding_registry import get_embedding_registry
+from src.ingest_manifest import IngestManifest
+from src.near_dedup import NEAR_DEDUP_ENABLED, NearDuplicateIndex
+
+# Pinecone accepts at most 1000 ids per delete request
+EXPIRY_PAGE_SIZE = int(os.getenv('EXPIRY_PAGE_SIZE', '1000'))
+DEFAULT_RETENTION_DAYS = 30
+# Days each source is kept after ingestion; None keeps it forever. Sources not
+# listed fall back to "default", which keeps the PDF corpus indefinitely.
+RETENTION_POLICY = {
+    "default": None,
+    "WHO": DEFAULT_RETENTION_DAYS,
+    "WHO Traditional Medicine": DEFAULT_RETENTION_DAYS,
+    "CDC": DEFAULT_RETENTION_DAYS,
+    "PubMed": DEFAULT_RETENTION_DAYS,
+    "SNOMED": DEFAULT_RETENTION_DAYS,
+    "ICD10": DEFAULT_RETENTION_DAYS,
+    "DrugBank": DEFAULT_RETENTION_DAYS,
+    "Clinical Guidelines": DEFAULT_RETENTION_DAYS
+}
+# JSON object overriding entries of RETENTION_POLICY, e.g. {"PubMed": 14}
+RETENTION_POLICY.update(json.loads(os.getenv('VECTOR_RETENTION_POLICY', '{}')))
+
+def retention_days(source, policy):
+    return policy.get(source, policy.get("default"))
+
+def _vector_deleter(index_name, namespace, vectorstore=None):
+    """Function deleting ids from the physical index, opened once per expiry run
+
+    Deleting through the app's own store keeps an in-process local index from
+    serving expired vectors until it is reloaded.
+    """
+    if vectorstore is not None and getattr(vectorstore, "registry_target", None) == (index_name, namespace):
+        return lambda ids: vectorstore.delete(ids=ids)
+    from src.helper import VECTOR_STORE_BACKEND
+    if VECTOR_STORE_BACKEND == 'local':
+        from src.local_vectorstore import LocalVectorStore
+        store = LocalVectorStore(None, index_name=index_name, namespace=namespace)
+        return lambda ids: store.delete(ids=ids)
+    from pinecone import Pinecone
+    index = Pinecone(api_key=os.getenv('PINECONE_API_KEY')).Index(index_name)
+    return lambda ids: index.delete(ids=ids, namespace=namespace)
+
+def expire_vectors(index_name="sanocare", policy=None, dry_run=True, page_size=EXPIRY_PAGE_SIZE, now=None,
+                   vectorstore=None):
+    """Delete vectors past their source's retention in pages; with dry_run only report what would go
+
+    Pass the app's vector store to delete through it, so a loaded local index drops the vectors at once.
+    """
+    policy = policy or RETENTION_POLICY
+    now = now or datetime.now()
+    index_name, namespace = get_embedding_registry().active_target(index_name)
+    manifest = IngestManifest(index_name, namespace)
+    near_duplicates = NearDuplicateIndex(index_name, namespace) if NEAR_DEDUP_ENABLED else None
+    delete_vectors = None
+
+    report = {
+        "index": index_name,
+        "namespace": namespace,
+        "dry_run": dry_run,
+        "checked_at": now.isoformat(),
+        "sources": {}
+    }
+    for source, (total, oldest) in sorted(manifest.source_counts().items(), key=lambda item: str(item[0])):
+        days = retention_days(source, policy)
+        entry = {"total": total, "oldest": oldest, "retention_days": days, "expired": 0}
+        report["sources"][source or "(none)"] = entry
+        if days is None:
+            continue
+        cutoff = (now - timedelta(days=days)).isoformat()
+        if dry_run:
+            entry["expired"] = manifest.count_indexed_before(source, cutoff)
+            continue
+
+        # Deleted ids leave the manifest, so each page starts again from the oldest
+        while True:
+            ids = manifest.indexed_before(source, cutoff, limit=page_size)
+            if not ids:
+                break
+            if delete_vectors is None:
+                delete_vectors = _vector_deleter(index_name, namespace, vectorstore)
+            delete_vectors(ids)
+            get_bm25_index(index_name).delete(ids=ids)
+            if near_duplicates is not None:
+                near_duplicates.remove(ids)
+            manifest.remove(ids)
+            entry["expired"] += len(ids)
+            print(f"Deleted {len(ids)} expired {source} vectors ({entry['expired']} so far)")
+
+    report["expired"] = sum(entry["expired"] for entry in report["sources"].values())
+    return report
+
+def _ingestion_date(metadata):
+    """ISO date from a chunk's date or timestamp metadata, or now when neither parses"""
+    for key in ("date", "timestamp"):
+        try:
+            return datetime.fromisoformat(str(metadata[key])).replace(tzinfo=None).isoformat()
+        except (KeyError, ValueError):
+            continue
+    return datetime.now().isoformat()
+
+def backfill_manifest(vectorstore, batch_size=100):
+    """Record vectors written before the manifest existed, dated by their date/timestamp metadata"""
+    from src.helper import get_ingest_manifest, iter_vector_store_documents
+    manifest = get_ingest_manifest(vectorstore)
+    added = 0
+    for documents in iter_vector_store_documents(vectorstore, batch_size):
+        by_id = {doc.id: doc for doc in documents if doc.id}
+        missing = manifest.missing(by_id)
+        if not missing:
+            continue
+        manifest.mark_indexed(
+            missing,
+            [by_id[id_].metadata.get("source") for id_ in missing],
+            [_ingestion_date(by_id[id_].metadata) for id_ in missing]
+        )
+        added += len(missing)
+    print(f"Backfilled {added} vectors into the ingestion manifest")
+    return added
+
+def print_report(report):
+    action = "Would delete" if report["dry_run"] else "Deleted"
+    print(f"\n=== Vector Expiry ({report['index']}/{report['namespace'] or 'default'}"
+          f"{', dry run' if report['dry_run'] else ''}) ===")
+    for source, entry in report["sources"].items():
+        retention = f"{entry['retention_days']}d" if entry["retention_days"] is not None else "keep"
+        print(f"{source:<28} {entry['total']:>8} vectors  retention {retention:<6} "
+              f"{action.lower()} {entry['expired']}  oldest {entry['oldest']}")
+    print(f"{action} {report['expired']} vectors in total")
+
+def start_expiry_schedule(interval_hours, index_name="sanocare", policy=None, get_vectorstore=None):
+    """Run expire_vectors every interval_hours on a daemon thread
+
+    get_vectorstore returns the app's live vector store, which the deletions go through.
+    """
+    def loop():
+        while True:
+            time.sleep(interval_hours * 3600)
+            try:
+                vectorstore = get_vectorstore() if get_vectorstore else None
+                print_report(expire_vectors(index_name, policy=policy, dry_run=False, vectorstore=vectorstore))
+            except Exception as e:
+                print(f"Error expiring vectors: {str(e)}")
+
+    thread = threading.Thread(target=loop, name="vector-expiry", daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Expire vectors past their source's retention period")
+    parser.add_argument("--index", default="sanocare", help="Logical index name")
+    parser.add_argument("--apply", action="store_true", help="Delete expired vectors (default: dry-run report)")
+    parser.add_argument("--policy", help='JSON retention overrides in days, e.g. \'{"PubMed": 14, "default": null}\'')
+    parser.add_argument("--max-age-days", type=int, help="Use one retention period for every listed source")
+    parser.add_argument("--backfill", action="store_true",
+                        help="First record vectors missing from the ingestion manifest")
+    args = parser.parse_args()
+
+    policy = dict(RETENTION_POLICY)
+    if args.max_age_days is not None:
+        policy = {source: (args.max_age_days if days is not None else None) for source, days in policy.items()}
+    if args.policy:
+        policy.update(json.loads(args.policy))
+    if args.backfill:
+        from src.helper import load_vector_store
+        backfill_manifest(load_vector_store(args.index))
+
+    report = expire_vectors(args.index, policy=policy, dry_run=not args.apply)
+    print_report(report)
+
+if __name__ == "__main__":
+    main()
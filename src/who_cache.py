@@ -0,0 +1,317 @@
+import os
+import sqlite3
+import threading
+import time
+from email.utils import formatdate
+from src.async_fetch import FetchError, fetch_many
+from src.cache_paths import CACHE_DIR
+
+WHO_API_BASE = "https://ghoapi.azureedge.net/api"
+WHO_CACHE_PATH = os.path.join(CACHE_DIR, 'who_gho.sqlite')
+# Cached responses younger than this are served without contacting the WHO API
+WHO_CACHE_MAX_AGE_SECONDS = int(os.getenv('WHO_CACHE_MAX_AGE_SECONDS', str(24 * 60 * 60)))
+REQUEST_TIMEOUT = 30
+
+# Indicators pulled into the knowledge base and answered locally
+DEFAULT_WHO_INDICATORS = [
+    "WHOSIS_000001",   # Life expectancy at birth (years)
+    "WHOSIS_000015",   # Life expectancy at age 60 (years)
+    "MDG_0000000001",  # Infant mortality rate (per 1000 live births)
+    "MDG_0000000026",  # Maternal mortality ratio (per 100 000 live births)
+    "MDG_0000000020",  # Incidence of tuberculosis (per 100 000 population per year)
+    "NCD_BMI_30A",     # Prevalence of obesity among adults
+]
+
+# GHO uses ISO 3166-1 alpha-3 codes for countries
+COUNTRY_CODES = {
+    "india": "IND",
+    "china": "CHN",
+    "japan": "JPN",
+    "mexico": "MEX",
+    "united states": "USA",
+    "usa": "USA",
+    "american": "USA",
+    "united kingdom": "GBR",
+    "germany": "DEU",
+    "france": "FRA",
+    "spain": "ESP",
+}
+
+SEX_LABELS = {
+    "SEX_BTSX": "both sexes",
+    "SEX_MLE": "male",
+    "SEX_FMLE": "female",
+}
+
+def to_country_code(country):
+    """Map a country or region name to the GHO country code"""
+    if not country:
+        return None
+    country = country.strip()
+    return COUNTRY_CODES.get(country.lower(), country.upper())
+
+class WHODataCache:
+    """Local SQLite copy of the WHO GHO catalogue and indicator values"""
+
+    def __init__(self, path=WHO_CACHE_PATH, max_age_seconds=WHO_CACHE_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._catalogue = None
+        self._lookup_cache = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS indicators (
+                    code TEXT PRIMARY KEY,
+                    name TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS indicator_values (
+                    indicator TEXT NOT NULL,
+                    country TEXT NOT NULL,
+                    year INTEGER,
+                    sex TEXT NOT NULL DEFAULT '',
+                    value TEXT,
+                    numeric_value REAL,
+                    PRIMARY KEY (indicator, country, year, sex)
+                );
+                CREATE INDEX IF NOT EXISTS ix_indicator_values_country
+                    ON indicator_values (country, indicator, year);
+                CREATE TABLE IF NOT EXISTS http_meta (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                );
+            """)
+
+    def _get_meta(self, url):
+        row = self._conn.execute(
+            "SELECT etag, last_modified, fetched_at FROM http_meta WHERE url = ?", (url,)
+        ).fetchone()
+        return row
+
+    def _conditional_headers(self, url, force=False):
+        """Request headers revalidating with ETag/If-Modified-Since, or None while the local copy is fresh"""
+        meta = self._get_meta(url)
+        if meta and not force and time.time() - meta[2] < self.max_age_seconds:
+            return None
+
+        headers = {'Accept': 'application/json'}
+        if meta:
+            etag, last_modified, fetched_at = meta
+            if etag:
+                headers['If-None-Match'] = etag
+            headers['If-Modified-Since'] = last_modified or formatdate(fetched_at, usegmt=True)
+        return headers
+
+    def _read_payload(self, url, response):
+        """JSON document of a fetched response; None if unchanged or unavailable"""
+        if isinstance(response, Exception):
+            raise response
+        if response.status_code == 304:
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE http_meta SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            return None
+        if response.status_code != 200:
+            print(f"WHO API returned status code: {response.status_code}")
+            print(f"Response content: {response.text[:500]}")
+            return None
+
+        payload = response.json()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_meta (url, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?)",
+                (url, response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time())
+            )
+        return payload
+
+    def _store_catalogue(self, payload):
+        rows = [
+            (item.get('IndicatorCode'), item.get('IndicatorName') or '')
+            for item in payload.get('value', [])
+            if item.get('IndicatorCode')
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO indicators (code, name) VALUES (?, ?)", rows)
+            self._catalogue = None
+            self._lookup_cache.clear()
+        print(f"Stored {len(rows)} WHO indicators in local cache")
+
+    def _store_indicator(self, code, payload):
+        rows = [
+            (
+                code,
+                item.get('SpatialDim'),
+                item.get('TimeDim'),
+                item.get('Dim1') or '',
+                item.get('Value'),
+                item.get('NumericValue')
+            )
+            for item in payload.get('value', [])
+            if item.get('SpatialDimType') == 'COUNTRY' and item.get('SpatialDim')
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM indicator_values WHERE indicator = ?", (code,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO indicator_values "
+                "(indicator, country, year, sex, value, numeric_value) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._lookup_cache.clear()
+        print(f"Stored {len(rows)} values for WHO indicator {code}")
+
+    def _refresh_specs(self, codes, include_catalogue, force=False):
+        """Requests for the stale catalogue and indicator documents, and the code each URL stores"""
+        # None stands for the catalogue
+        targets = {f"{WHO_API_BASE}/Indicator": None} if include_catalogue else {}
+        targets.update({f"{WHO_API_BASE}/{code}": code for code in codes})
+        specs = []
+        for url, code in targets.items():
+            headers = self._conditional_headers(url, force)
+            if headers is not None:
+                specs.append((url, {'headers': headers}))
+        return targets, specs
+
+    def _store_responses(self, targets, specs, responses):
+        """Store fetched documents, reporting failures per document; returns what was stored"""
+        stored = set()
+        for (url, _), response in zip(specs, responses):
+            code = targets[url]
+            try:
+                payload = self._read_payload(url, response)
+                if payload is None:
+                    continue
+                if code is None:
+                    self._store_catalogue(payload)
+                else:
+                    self._store_indicator(code, payload)
+                stored.add(code)
+            except (FetchError, ValueError) as e:
+                print(f"Error refreshing WHO {'catalogue' if code is None else 'indicator ' + code}: {str(e)}")
+        return stored
+
+    def _refresh(self, codes, include_catalogue, force=False):
+        """Fetch the stale catalogue and indicator documents over one session; returns what was stored"""
+        targets, specs = self._refresh_specs(codes, include_catalogue, force)
+        if not specs:
+            return set()
+        return self._store_responses(targets, specs, fetch_many(specs, timeout=REQUEST_TIMEOUT))
+
+    def refresh_catalogue(self, force=False):
+        """Refresh the indicator catalogue; returns True if new data was stored"""
+        return None in self._refresh([], True, force=force)
+
+    def refresh_indicator(self, code, force=False):
+        """Refresh the values of one indicator; returns True if new data was stored"""
+        return code in self._refresh([code], False, force=force)
+
+    def refresh(self, indicators=None, force=False):
+        """Refresh the catalogue and the given indicators in one batch of requests, tolerating errors"""
+        self._refresh(indicators or DEFAULT_WHO_INDICATORS, True, force=force)
+
+    async def refresh_with(self, fetcher, indicators=None, force=False):
+        """Like refresh, over a fetcher session shared with other loaders"""
+        targets, specs = self._refresh_specs(indicators or DEFAULT_WHO_INDICATORS, True, force)
+        if specs:
+            self._store_responses(targets, specs, await fetcher.fetch_all(specs))
+
+    def indicator_names(self):
+        """Indicator code to name mapping, held in memory"""
+        if self._catalogue is None:
+            with self._lock:
+                self._catalogue = dict(self._conn.execute("SELECT code, name FROM indicators"))
+        return self._catalogue
+
+    def search_indicators(self, term, limit=20):
+        """Find indicators whose name contains the term"""
+        term = term.lower()
+        matches = [
+            {"code": code, "name": name}
+            for code, name in self.indicator_names().items()
+            if term in name.lower()
+        ]
+        return matches[:limit]
+
+    def get_country_values(self, country, indicators=None, latest_only=True):
+        """Indicator values for a country, newest year first"""
+        code = to_country_code(country)
+        key = ("country", code, tuple(indicators) if indicators else None, latest_only)
+        if key in self._lookup_cache:
+            return self._lookup_cache[key]
+
+        query = ("SELECT indicator, country, year, sex, value, numeric_value FROM indicator_values "
+                 "WHERE country = ?")
+        params = [code]
+        if indicators:
+            query += f" AND indicator IN ({', '.join('?' * len(indicators))})"
+            params.extend(indicators)
+        query += " ORDER BY indicator, sex, year DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        values = self._format_rows(rows, latest_only)
+        self._lookup_cache[key] = values
+        return values
+
+    def get_indicator_values(self, indicator, countries=None, latest_only=True):
+        """Values of one indicator across countries"""
+        codes = tuple(to_country_code(c) for c in countries) if countries else None
+        key = ("indicator", indicator, codes, latest_only)
+        if key in self._lookup_cache:
+            return self._lookup_cache[key]
+
+        query = ("SELECT indicator, country, year, sex, value, numeric_value FROM indicator_values "
+                 "WHERE indicator = ?")
+        params = [indicator]
+        if codes:
+            query += f" AND country IN ({', '.join('?' * len(codes))})"
+            params.extend(codes)
+        query += " ORDER BY country, sex, year DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        values = self._format_rows(rows, latest_only)
+        self._lookup_cache[key] = values
+        return values
+
+    def _format_rows(self, rows, latest_only):
+        names = self.indicator_names()
+        values = []
+        seen = set()
+        for indicator, country, year, sex, value, numeric_value in rows:
+            # Rows are ordered newest first within each series
+            series = (indicator, country, sex)
+            if latest_only and series in seen:
+                continue
+            seen.add(series)
+            values.append({
+                "indicator": indicator,
+                "name": names.get(indicator, indicator),
+                "country": country,
+                "year": year,
+                "sex": SEX_LABELS.get(sex, sex.lower() if sex else "all"),
+                "value": value,
+                "numeric_value": numeric_value
+            })
+        return values
+
+_who_cache = None
+_who_cache_lock = threading.Lock()
+
+def get_who_cache():
+    """Shared WHO data cache"""
+    global _who_cache
+    with _who_cache_lock:
+        if _who_cache is None:
+            _who_cache = WHODataCache()
+        return _who_cache
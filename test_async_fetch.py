@@ -0,0 +1,151 @@
+import asyncio
+import tempfile
+import time
+from aiohttp import web
+from src.async_fetch import AsyncFetcher, FetchError
+from src.http_cache import HTTPCache
+
+async def start_stub_server():
+    """Local stand-in for the external medical APIs"""
+    state = {"flaky": 0, "esummary_calls": 0, "in_flight": 0, "max_in_flight": 0, "guideline_calls": 0,
+             "not_modified": 0}
+
+    async def flaky(request):
+        state["flaky"] += 1
+        if state["flaky"] <= 2:
+            return web.Response(status=503)
+        return web.json_response({"ok": True})
+
+    async def throttled(request):
+        return web.Response(status=429, headers={"Retry-After": "0"})
+
+    async def slow(request):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.2)
+        state["in_flight"] -= 1
+        return web.json_response({"id": request.query.get("id")})
+
+    async def esummary(request):
+        state["esummary_calls"] += 1
+        ids = request.query["id"].split(",")
+        result = {"uids": ids}
+        result.update({id_: {"title": f"Article {id_}", "pubdate": "2024"} for id_ in ids})
+        return web.json_response({"result": result})
+
+    async def guidelines(request):
+        state["guideline_calls"] += 1
+        if request.headers.get("If-None-Match") == '"v1"':
+            state["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.json_response({"guidelines": ["hypertension"]}, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/flaky", flaky)
+    app.router.add_get("/throttled", throttled)
+    app.router.add_get("/slow", slow)
+    app.router.add_get("/esummary", esummary)
+    app.router.add_get("/guidelines", guidelines)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", state
+
+async def run_cache_checks(base, state, cache_dir):
+    print("\nChecking the HTTP cache...")
+    cache = HTTPCache(cache_dir, mode="cache", ttl={}, default_ttl=3600)
+    async with AsyncFetcher(default_rate=1000, http_cache=cache) as fetcher:
+        first = await fetcher.fetch(f"{base}/guidelines", params={"api_key": "secret", "q": "bp"})
+        second = await fetcher.fetch(f"{base}/guidelines", params={"q": "bp", "api_key": "other"})
+        assert first.json() == second.json() == {"guidelines": ["hypertension"]}
+        assert state["guideline_calls"] == 1 and fetcher.stats()["cache_hits"] == 1
+    print("✓ Fresh response served from the cache, credentials left out of the key")
+
+    stale = HTTPCache(cache_dir, mode="cache", ttl={}, default_ttl=0)
+    async with AsyncFetcher(default_rate=1000, http_cache=stale) as fetcher:
+        response = await fetcher.fetch(f"{base}/guidelines", params={"q": "bp"})
+        assert response.ok and response.json() == {"guidelines": ["hypertension"]}
+        assert state["guideline_calls"] == 2 and state["not_modified"] == 1
+        assert stale.stats()["revalidated"] == 1
+    print("✓ Stale entry revalidated with If-None-Match and refreshed on 304")
+
+    replay = HTTPCache(cache_dir, mode="replay")
+    async with AsyncFetcher(default_rate=1000, http_cache=replay) as fetcher:
+        response = await fetcher.fetch(f"{base}/guidelines", params={"q": "bp"})
+        assert response.json() == {"guidelines": ["hypertension"]}
+        assert state["guideline_calls"] == 2
+        try:
+            await fetcher.fetch(f"{base}/guidelines", params={"q": "diabetes"})
+            raise AssertionError("Replay mode went to the network")
+        except FetchError:
+            pass
+    print("✓ Replay served the recording and failed unrecorded requests without network access")
+
+async def run_checks():
+    runner, base, state = await start_stub_server()
+    cache_dir = tempfile.mkdtemp()
+    # The retry and rate limit checks must reach the stub server every time
+    no_cache = HTTPCache(cache_dir, mode="off")
+    try:
+        async with AsyncFetcher(per_host=4, default_rate=1000, retries=3, backoff=0.01,
+                                http_cache=no_cache) as fetcher:
+            print("Checking retries on 5xx...")
+            response = await fetcher.fetch(f"{base}/flaky")
+            assert response.ok and response.json() == {"ok": True}
+            assert state["flaky"] == 3
+            print("✓ Retried 503 responses until success")
+
+            print("\nChecking 429 handling...")
+            response = await fetcher.fetch(f"{base}/throttled")
+            assert response.status_code == 429
+            print("✓ Returned the last 429 after exhausting retries")
+
+            print("\nChecking per-host concurrency and pooling...")
+            start = time.perf_counter()
+            responses = await fetcher.fetch_all([(f"{base}/slow", {"params": {"id": i}}) for i in range(16)])
+            elapsed = time.perf_counter() - start
+            assert [r.json()["id"] for r in responses] == [str(i) for i in range(16)]
+            assert state["max_in_flight"] <= 4
+            # 16 requests at 0.2s each, 4 at a time, instead of 3.2s sequentially
+            assert elapsed < 2.0, f"Concurrent fetch took {elapsed:.2f}s"
+            print(f"✓ 16 requests in {elapsed:.2f}s with at most {state['max_in_flight']} in flight")
+
+            print("\nChecking batched PubMed summaries...")
+            import src.async_fetch as async_fetch
+            original_url = async_fetch.PUBMED_ESUMMARY_URL
+            async_fetch.PUBMED_ESUMMARY_URL = f"{base}/esummary"
+            try:
+                summaries = await fetcher.pubmed_summaries([str(i) for i in range(250)], batch_size=100)
+            finally:
+                async_fetch.PUBMED_ESUMMARY_URL = original_url
+            assert len(summaries) == 250 and summaries["42"]["title"] == "Article 42"
+            assert state["esummary_calls"] == 3
+            print("✓ 250 ids fetched in 3 esummary requests")
+
+        print("\nChecking rate limiting...")
+        async with AsyncFetcher(per_host=16, default_rate=10, retries=0, http_cache=no_cache) as fetcher:
+            start = time.perf_counter()
+            await fetcher.fetch_all([(f"{base}/esummary", {"params": {"id": "1"}}) for _ in range(20)])
+            elapsed = time.perf_counter() - start
+            # A 10-token burst, then 10 more at 10 per second
+            assert elapsed >= 0.9, f"Rate limit not applied ({elapsed:.2f}s)"
+            print(f"✓ 20 requests at 10/s took {elapsed:.2f}s")
+
+        print("\nChecking connection failures...")
+        async with AsyncFetcher(retries=1, backoff=0.01, timeout=2, http_cache=no_cache) as fetcher:
+            results = await fetcher.fetch_all([("http://127.0.0.1:9/unreachable", {})])
+            assert isinstance(results[0], FetchError)
+            assert fetcher.stats()["failures"] == 1
+            print("✓ Unreachable host surfaced as FetchError after retries")
+
+        await run_cache_checks(base, state, cache_dir)
+    finally:
+        await runner.cleanup()
+
+def test_async_fetch():
+    asyncio.run(run_checks())
+
+if __name__ == "__main__":
+    test_async_fetch()
@@ -0,0 +1,45 @@
+import numpy as np
+from src.embeddings import create_embeddings
+
+PARITY_TEXTS = [
+    "What are the early symptoms of dengue fever?",
+    "I have had a throbbing headache behind my left eye for three days.",
+    "Is metformin safe to take with ibuprofen?",
+    "Ayurvedic remedies for seasonal allergies",
+    "How much sleep does a teenager need?",
+    "chest pain and shortness of breath after climbing stairs",
+]
+
+# Minimum cosine similarity between the PyTorch and ONNX vectors of the same text
+MIN_COSINE = {
+    "onnx": 0.999,
+    "onnx-int8": 0.98,
+}
+
+def _cosine_rows(a, b):
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+def test_embedding_parity():
+    print("Loading PyTorch reference embeddings...")
+    reference = create_embeddings("torch")
+    reference_docs = reference.embed_documents(PARITY_TEXTS)
+    reference_query = reference.embed_query(PARITY_TEXTS[0])
+
+    for backend, min_cosine in MIN_COSINE.items():
+        print(f"\nChecking {backend} backend...")
+        model = create_embeddings(backend)
+
+        doc_cosines = _cosine_rows(reference_docs, model.embed_documents(PARITY_TEXTS))
+        query_cosine = _cosine_rows([reference_query], [model.embed_query(PARITY_TEXTS[0])])[0]
+        print(f"Minimum document cosine: {doc_cosines.min():.5f}")
+        print(f"Query cosine: {query_cosine:.5f}")
+
+        assert len(model.embed_query("dimension check")) == len(reference_query)
+        assert doc_cosines.min() >= min_cosine, f"{backend} document vectors drifted from PyTorch"
+        assert query_cosine >= min_cosine, f"{backend} query vector drifted from PyTorch"
+        print(f"✓ {backend} matches PyTorch vectors")
+
+if __name__ == "__main__":
+    test_embedding_parity()
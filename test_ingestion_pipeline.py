@@ -0,0 +1,77 @@
+import time
+from langchain_core.documents import Document
+from src.ingestion_pipeline import IngestionPipeline
+
+def make_documents(source, count, consumed):
+    for i in range(count):
+        consumed.append(i)
+        yield Document(page_content=f"{source} chunk {i}", metadata={"source": source})
+
+def test_streaming_pipeline():
+    consumed = []
+    written = []
+    committed = []
+    max_read_ahead = 0
+
+    def embed(texts):
+        time.sleep(0.01)
+        return [[float(len(text))] for text in texts]
+
+    def write(ids, docs, vectors):
+        nonlocal max_read_ahead
+        written.extend(doc.page_content for doc in docs)
+        max_read_ahead = max(max_read_ahead, len(consumed) - len(written))
+        if "documents chunk 250" in [doc.page_content for doc in docs]:
+            raise RuntimeError("simulated upsert failure")
+
+    already_indexed = set()
+    pipeline = IngestionPipeline(
+        embed=embed,
+        write=write,
+        keep=lambda ids: [id_ for id_ in ids if id_ not in already_indexed],
+        on_commit=lambda source, ids, docs: committed.append((source, len(ids))),
+        embed_batch=10,
+        upsert_batch=25,
+        queue_size=2
+    )
+    duplicated = list(make_documents("realtime", 5, [])) * 2
+    added, skipped, failed = pipeline.run([
+        ("realtime", iter(duplicated)),
+        ("documents", make_documents("documents", 400, consumed))
+    ])
+    pipeline.print_summary()
+
+    print("Checking counts...")
+    assert added == 405 - 25, added
+    assert skipped == 5
+    assert failed == 25
+    print("✓ Duplicates skipped and a failed batch counted without stopping the run")
+
+    print("\nChecking ordering and batching...")
+    assert written[:5] == [f"realtime chunk {i}" for i in range(5)]
+    assert written[5:] == [f"documents chunk {i}" for i in range(400)]
+    assert committed[0] == ("realtime", 5)
+    assert all(source == "documents" and count <= 25 for source, count in committed[1:])
+    print("✓ Sources stay in order and batches never mix sources")
+
+    print("\nChecking bounded memory...")
+    # Two queues of two micro-batches, one batch per stage and one partial upsert batch
+    assert max_read_ahead <= 10 * (2 + 2 + 3) + 25, max_read_ahead
+    print(f"✓ Loader ran at most {max_read_ahead} chunks ahead of the writer")
+
+def test_stage_failure_stops_pipeline():
+    def embed(texts):
+        raise ValueError("embedding model unavailable")
+
+    pipeline = IngestionPipeline(embed=embed, write=lambda ids, docs, vectors: None, embed_batch=10, queue_size=1)
+    try:
+        pipeline.run([("documents", make_documents("documents", 1000, []))])
+    except ValueError as e:
+        assert "unavailable" in str(e)
+        print("✓ An embedding failure stops every stage and is re-raised")
+    else:
+        raise AssertionError("Pipeline swallowed the embedding failure")
+
+if __name__ == "__main__":
+    test_streaming_pipeline()
+    test_stage_failure_stops_pipeline()
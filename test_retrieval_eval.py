@@ -0,0 +1,28 @@
+from langchain_core.documents import Document
+from src.retrieval_eval import judge, ndcg_at_k, recall_at_k
+
+def chunks(*texts):
+    return [Document(page_content=text, metadata={"source": "test"}) for text in texts]
+
+def test_ndcg_bounds():
+    labels = [{"contains": "insulin", "grade": 1}]
+
+    print("Checking repeated matches of one label...")
+    gains, matched = judge(chunks("insulin dosing", "insulin storage", "insulin pumps"), labels)
+    assert ndcg_at_k(matched, labels, 3) == 1.0
+    print("✓ Three chunks matching one label score 1.0, not above it")
+
+    print("\nChecking partial and late matches...")
+    labels = [{"contains": "insulin", "grade": 2}, {"contains": "metformin", "grade": 1}]
+    for texts in [("diet", "insulin", "insulin"), ("metformin", "insulin"), ("diet", "exercise"),
+                  ("insulin and metformin", "metformin", "insulin")]:
+        gains, matched = judge(chunks(*texts), labels)
+        for k in (1, 3, 5):
+            score = ndcg_at_k(matched, labels, k)
+            assert 0.0 <= score <= 1.0, f"nDCG@{k} of {texts} is {score}"
+    gains, matched = judge(chunks("insulin", "metformin"), labels)
+    assert ndcg_at_k(matched, labels, 2) == 1.0 and recall_at_k(matched, labels, 2) == 1.0
+    print("✓ nDCG stays within [0, 1] and reaches 1.0 for the ideal ranking")
+
+if __name__ == "__main__":
+    test_ndcg_bounds()